@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Archive Buffers
+Loads the bytes needed to verify a ZIP archive once, so worker threads can
+test candidates from memory instead of reopening the archive on disk.
+"""
+
+import bisect
+import hashlib
+import io
+import mmap
+import os
+import struct
+import zipfile
+from pathlib import Path
+
+# Archives up to this size are read into memory in full
+DEFAULT_PRELOAD_LIMIT = 64 * 1024 * 1024
+
+# ZIP record layouts (see APPNOTE.TXT and the zipfile module)
+LOCAL_HEADER_FORMAT = '<4s5HI2I2H'
+LOCAL_HEADER_SIZE = struct.calcsize(LOCAL_HEADER_FORMAT)
+CENTRAL_DIR_FORMAT = '<4s4B4HL2L5H2L'
+END_RECORD_FORMAT = '<4s4H2LH'
+ZIP64_EXTRA_ID = 0x0001
+ZIP32_LIMIT = 0xFFFFFFFF
+
+# Bytes hashed from each end of an archive for its fingerprint
+FINGERPRINT_SPAN = 1024 * 1024
+
+# Entry encryption classes, in the order they are cheapest to verify. AES keys
+# come from 1000 PBKDF2-SHA1 rounds per 20 bytes of key material, so longer
+# keys cost more; strong encryption is not supported by any reader here.
+CIPHER_COSTS = {
+    'zipcrypto': 0,
+    'aes128': 1,
+    'aes192': 2,
+    'aes256': 3,
+    'strong': 4,
+    'none': 5,
+}
+AES_EXTRA_ID = 0x9901
+AES_STRENGTHS = {1: 'aes128', 2: 'aes192', 3: 'aes256'}
+WINZIP_AES_METHOD = 99
+
+
+def archive_fingerprint(archive_path):
+    """Return a hex digest identifying an archive's contents without reading all of it
+
+    Hashes the size and the first and last megabyte. For ZIP archives the
+    tail holds the central directory, so every member's name, size and CRC
+    feeds into it.
+    """
+    digest = hashlib.sha256()
+    with open(archive_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        digest.update(str(size).encode('ascii'))
+        digest.update(f.read(FINGERPRINT_SPAN))
+        if size > FINGERPRINT_SPAN:
+            f.seek(max(FINGERPRINT_SPAN, size - FINGERPRINT_SPAN))
+            digest.update(f.read(FINGERPRINT_SPAN))
+    return digest.hexdigest()
+
+
+def classify_entry(info):
+    """Return how a ZipInfo entry is encrypted: one of the CIPHER_COSTS keys"""
+    if not info.flag_bits & 0x1:
+        return 'none'
+    if info.flag_bits & 0x40:
+        return 'strong'
+    if info.compress_type == WINZIP_AES_METHOD:
+        view = memoryview(info.extra)
+        pos = 0
+        while pos + 4 <= len(view):
+            block_id, block_length = struct.unpack_from('<2H', view, pos)
+            # AES extra data: version, vendor id 'AE', strength, actual method
+            if block_id == AES_EXTRA_ID and block_length >= 5:
+                return AES_STRENGTHS.get(view[pos + 8], 'aes256')
+            pos += 4 + block_length
+        return 'aes256'
+    return 'zipcrypto'
+
+
+def verification_order(members):
+    """Sort file members cheapest to verify first: by cipher, then by size"""
+    candidates = [info for info in members if not info.is_dir()]
+    return sorted(candidates, key=lambda info: (CIPHER_COSTS[classify_entry(info)], info.compress_size))
+
+
+def choose_verification_member(members):
+    """Pick the cheapest member to verify: cheapest cipher first, then smallest"""
+    ordered = verification_order(members)
+    return ordered[0] if ordered else None
+
+
+def strip_extra_field(extra, field_id):
+    """Return extra data without any blocks of the given header id"""
+    result = bytearray()
+    view = memoryview(extra)
+    pos = 0
+    while pos + 4 <= len(view):
+        block_id, block_length = struct.unpack_from('<2H', view, pos)
+        end = pos + 4 + block_length
+        if block_id != field_id:
+            result += view[pos:end]
+        pos = end
+    return bytes(result)
+
+
+def dos_date_time(info):
+    """Return the DOS (date, time) words stored for a ZipInfo entry"""
+    year, month, day, hour, minute, second = info.date_time
+    dos_date = (year - 1980) << 9 | month << 5 | day
+    dos_time = getattr(info, '_raw_time', hour << 11 | minute << 5 | second // 2)
+    return dos_date, dos_time
+
+
+def member_zip_segments(source, info):
+    """Lay one member of an archive out as a minimal standalone ZIP, without copying it
+
+    Returns the member's local header and data as a memoryview slice of
+    source, followed by a fresh central directory and end record; read end
+    to end (see SegmentReader) they can be opened with zipfile directly.
+    """
+    start = info.header_offset
+    fields = struct.unpack_from(LOCAL_HEADER_FORMAT, source, start)
+    if fields[0] != b'PK\x03\x04':
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    name_length, extra_length = fields[-2], fields[-1]
+    end = start + LOCAL_HEADER_SIZE + name_length + extra_length + info.compress_size
+    local_record = memoryview(source)[start:end]
+
+    filename = info.orig_filename.encode('utf-8' if info.flag_bits & 0x800 else 'cp437')
+    extra = strip_extra_field(info.extra, ZIP64_EXTRA_ID)
+    dos_date, dos_time = dos_date_time(info)
+    central_record = struct.pack(
+        CENTRAL_DIR_FORMAT, b'PK\x01\x02',
+        info.create_version, info.create_system, info.extract_version, info.reserved,
+        info.flag_bits, info.compress_type, dos_time, dos_date,
+        info.CRC, info.compress_size, info.file_size,
+        len(filename), len(extra), 0, 0, info.internal_attr, info.external_attr, 0
+    ) + filename + extra
+    end_record = struct.pack(END_RECORD_FORMAT, b'PK\x05\x06', 0, 0, 1, 1,
+                             len(central_record), len(local_record), 0)
+    return local_record, central_record + end_record
+
+
+class SegmentReader(io.RawIOBase):
+    """Read-only file over buffers laid end to end, read through memoryview slices instead of joining them"""
+
+    def __init__(self, segments):
+        super().__init__()
+        self.segments = [memoryview(segment) for segment in segments]
+        self.starts = []  # offset of each segment in the file
+        self.size = 0
+        for segment in self.segments:
+            self.starts.append(self.size)
+            self.size += len(segment)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def readinto(self, target):
+        target = memoryview(target).cast('B')
+        written = 0
+        while written < len(target) and self.position < self.size:
+            index = bisect.bisect_right(self.starts, self.position) - 1
+            segment = self.segments[index]
+            offset = self.position - self.starts[index]
+            count = min(len(target) - written, len(segment) - offset)
+            target[written:written + count] = segment[offset:offset + count]
+            written += count
+            self.position += count
+        return written
+
+
+class ArchiveBuffer:
+    """The bytes needed to verify passwords for one ZIP archive, held in memory or mapped
+
+    Small archives are read into memory whole. Larger ones are mapped and
+    only the verification member is read through the mapping, so only its
+    pages become resident; the mapping stays open for the life of the buffer.
+    """
+
+    def __init__(self, archive_path, preload_limit=DEFAULT_PRELOAD_LIMIT):
+        self.archive_path = archive_path
+        self.size = os.path.getsize(archive_path)
+        self.mode = None  # 'memory' (whole file) or 'member' (verification member only)
+        self.data = b''  # the whole archive in 'memory' mode
+        self.segments = ()  # the member's standalone ZIP in 'member' mode, see member_zip_segments()
+        self.member_names = []  # members to verify from this buffer
+        self.cipher = 'none'  # encryption of the verification member, see classify_entry()
+        self.others = False  # True if the archive has other members a hit must be confirmed against
+        self.partial = False  # True if those other members exist only on disk
+
+        with open(archive_path, 'rb') as f:
+            if self.size <= preload_limit:
+                self.data = f.read()
+                self.mode = 'memory'
+                with zipfile.ZipFile(io.BytesIO(self.data)) as zip_file:
+                    member = choose_verification_member(zip_file.infolist())
+                    others = [info for info in zip_file.infolist() if not info.is_dir() and info is not member]
+            else:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                with zipfile.ZipFile(f) as zip_file:
+                    member = choose_verification_member(zip_file.infolist())
+                    others = [info for info in zip_file.infolist() if not info.is_dir() and info is not member]
+                if member is not None:
+                    if member.compress_size >= ZIP32_LIMIT or member.file_size >= ZIP32_LIMIT:
+                        mapped.close()
+                        raise zipfile.LargeZipFile("Verification member is too large to buffer")
+                    self.segments = member_zip_segments(mapped, member)
+                self.mode = 'member'
+
+        if member is not None:
+            self.member_names = [member.filename]
+            self.cipher = classify_entry(member)
+            self.others = bool(others)
+            # A whole archive in memory confirms hits from the buffer as well
+            self.partial = self.others and self.mode == 'member'
+
+    def open(self):
+        """Return a new file-like reader over the buffer (no copy, no file open)"""
+        if self.mode == 'member':
+            return SegmentReader(self.segments)
+        return io.BytesIO(self.data)
+
+
+def load_archive_buffer(archive_path, preload_limit=DEFAULT_PRELOAD_LIMIT):
+    """Return an ArchiveBuffer for a ZIP archive, or None if it cannot be buffered"""
+    if Path(archive_path).suffix.lower() != '.zip':
+        return None
+    try:
+        return ArchiveBuffer(archive_path, preload_limit)
+    except (OSError, ValueError, zipfile.BadZipFile, zipfile.LargeZipFile, struct.error):
+        return None
+
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Run Budgets and Checkpoints
+Limits a run by wall-clock time, candidates or CPU seconds, and records
+which parts of the keyspace a run fully tested as ranges, so a later run
+can pick up where it stopped. A range is [start, end) in the unit of its
+source: candidate positions for lists, masks and streams, byte offsets for
+text lists that workers read by range. A checkpoint also records the
+sources and settings its ranges are positions in, and is refused when a
+later run uses different ones.
+"""
+
+import bisect
+import json
+import os
+import threading
+
+CHECKPOINT_VERSION = 2
+
+# Coverage key of a single list, mask or stream; ranged lists use their pass name
+# ('original', 'variations') and interleaved sources their source name
+CANDIDATES_KEY = 'candidates'
+
+# Stop reasons of a run that ran out of budget, by RunBudget field
+BUDGET_REASONS = {
+    'seconds': 'time_limit',
+    'candidates': 'candidate_limit',
+    'cpu_seconds': 'cpu_limit'
+}
+
+
+class RunBudget:
+    """Upper bounds for one run; None means unbounded
+
+    When a bound is reached the engine stops handing out work and lets
+    the workers finish what they hold, so everything that was started is
+    either fully tested or never counted as covered.
+    """
+
+    def __init__(self, seconds=None, candidates=None, cpu_seconds=None):
+        self.seconds = seconds
+        self.candidates = candidates
+        self.cpu_seconds = cpu_seconds
+
+    def __bool__(self):
+        return any(bound is not None for bound in (self.seconds, self.candidates, self.cpu_seconds))
+
+    def exceeded(self, elapsed, tested, cpu_seconds):
+        """Return the stop reason of the first bound reached, or None"""
+        if self.seconds is not None and elapsed >= self.seconds:
+            return BUDGET_REASONS['seconds']
+        if self.candidates is not None and tested >= self.candidates:
+            return BUDGET_REASONS['candidates']
+        if self.cpu_seconds is not None and cpu_seconds >= self.cpu_seconds:
+            return BUDGET_REASONS['cpu_seconds']
+        return None
+
+    def to_dict(self):
+        """Plain dict of the bounds"""
+        return {'seconds': self.seconds, 'candidates': self.candidates, 'cpu_seconds': self.cpu_seconds}
+
+
+def keyspace_identity(specs, candidate_filter=None):
+    """What coverage ranges are positions in: the sources, their files, enhancement and the candidate filter
+
+    specs are SourceSpec tuples. A list file is identified by its size and
+    modification time, so editing or replacing it invalidates the checkpoint.
+    """
+    sources = []
+    for spec in specs:
+        source = {'kind': spec.kind, 'value': spec.value, 'rules': spec.rules}
+        if spec.kind == 'list':
+            stat = os.stat(spec.value)
+            source.update(value=os.path.abspath(spec.value), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        sources.append(source)
+    return {'sources': sources, 'filter': candidate_filter.to_dict() if candidate_filter is not None else None}
+
+
+class KeyspaceCoverage:
+    """Merged [start, end) ranges of fully tested work, per source key
+
+    Workers finish in any order, so ranges arrive out of order and are
+    merged as they come in. Coverage loaded from a checkpoint is kept and
+    extended, so the saved ranges always describe every run so far.
+    """
+
+    def __init__(self, ranges=None, identity=None):
+        self.lock = threading.Lock()
+        self.identity = identity  # keyspace_identity() the ranges belong to, saved with them
+        self.starts = {}  # key -> sorted range starts
+        self.ends = {}  # key -> the matching range ends
+        for key, key_ranges in (ranges or {}).items():
+            for start, end in key_ranges:
+                self.add(key, start, end)
+
+    def add(self, key, start, end):
+        """Record [start, end) of a key as covered"""
+        if end <= start:
+            return
+        with self.lock:
+            starts = self.starts.setdefault(key, [])
+            ends = self.ends.setdefault(key, [])
+            # Absorb every range that overlaps or touches the new one
+            first = bisect.bisect_left(ends, start)
+            last = bisect.bisect_right(starts, end)
+            if first < last:
+                start = min(start, starts[first])
+                end = max(end, ends[last - 1])
+            starts[first:last] = [start]
+            ends[first:last] = [end]
+
+    def uncovered(self, key, start, end):
+        """Return the parts of [start, end) not covered yet, as (start, end) pairs"""
+        with self.lock:
+            starts = self.starts.get(key, ())
+            ends = self.ends.get(key, ())
+            gaps = []
+            index = bisect.bisect_right(ends, start)
+            position = start
+            while index < len(starts) and starts[index] < end:
+                if starts[index] > position:
+                    gaps.append((position, starts[index]))
+                position = max(position, ends[index])
+                index += 1
+            if position < end:
+                gaps.append((position, end))
+            return gaps
+
+    def count(self, key=None):
+        """Total length of the covered ranges of a key, or of all keys"""
+        with self.lock:
+            keys = [key] if key is not None else list(self.starts)
+            return sum(end - start for key in keys
+                       for start, end in zip(self.starts.get(key, ()), self.ends.get(key, ())))
+
+    def ranges(self):
+        """Covered ranges as {key: [[start, end], ...]}"""
+        with self.lock:
+            return {key: [[start, end] for start, end in zip(self.starts[key], self.ends[key])]
+                    for key in self.starts if self.starts[key]}
+
+    def save(self, path, **details):
+        """Write the ranges (and any details, such as the stop reason) as a JSON checkpoint"""
+        record = {'version': CHECKPOINT_VERSION, 'identity': self.identity, 'ranges': self.ranges()}
+        record.update(details)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, identity=None):
+        """Read a checkpoint written by save(); a missing file means nothing is covered yet
+
+        With an identity given, a checkpoint written for other sources or
+        settings is refused, since its ranges would mark the wrong
+        candidates as tested.
+        """
+        if not os.path.exists(path):
+            return cls(identity=identity)
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        if record.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version in {path}")
+        # Compare as JSON, the way the saved identity reads back
+        if identity is not None and record.get('identity') != json.loads(json.dumps(identity)):
+            raise ValueError(f"{path} was written for other sources, list files or enhance/filter settings")
+        return cls(record.get('ranges'), identity)
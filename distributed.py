@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Distributed Recovery
+A coordinator leases byte ranges of a shared password list to worker nodes
+over TCP. Nodes test their ranges locally, send heartbeats while working and
+report completion or a hit. Leases that stop heartbeating expire and are
+re-issued; the first confirmed hit stops every node.
+
+Protocol: one JSON object per line. Every node message gets exactly one reply.
+The tested count a node sends is the running total for its current lease.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+
+from engine import ArchiveVerifier, PasswordEnhancer
+from wordlist import iter_wordlist_range, plan_chunks
+
+DEFAULT_PORT = 7878
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_LEASE_TIMEOUT = 15.0
+DEFAULT_HEARTBEAT_INTERVAL = 2.0
+
+
+def send_message(stream, message):
+    """Write one JSON message line and flush it"""
+    stream.write(json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n')
+    stream.flush()
+
+
+def receive_message(stream):
+    """Read one JSON message line, or None if the peer closed the connection"""
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class LeaseCoordinator:
+    """Hands out wordlist byte ranges to nodes and tracks leases until a hit or exhaustion"""
+
+    def __init__(self, archive_path, wordlist_path, host='127.0.0.1', port=DEFAULT_PORT,
+                 chunk_size=DEFAULT_CHUNK_SIZE, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                 heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL, enhance_passwords=True, token=None,
+                 on_event=None):
+        self.archive_path = archive_path
+        self.wordlist_path = wordlist_path
+        self.host = host
+        self.port = port
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.enhance_passwords = enhance_passwords
+        self.token = token
+        self.on_event = on_event
+
+        self.wordlist_size = os.path.getsize(wordlist_path)
+        self.chunks = plan_chunks(self.wordlist_size, chunk_size)
+        self.pending = deque(range(len(self.chunks)))  # chunk ids waiting for a lease
+        self.leases = {}  # lease id -> {'chunk', 'node', 'deadline', 'tested'}
+        self.completed = {}  # chunk id -> candidates tested by the lease that completed it
+        self.password = None
+        self.stop_reason = None
+
+        self._lock = threading.Lock()
+        self._next_lease_id = 1
+        self._done = threading.Event()
+        self._server = None
+        self._threads = []
+
+    @property
+    def tested(self):
+        """Candidates tested: every completed chunk once, plus what live leases reported so far"""
+        with self._lock:
+            live = sum(lease['tested'] for lease in self.leases.values() if lease['chunk'] not in self.completed)
+            return sum(self.completed.values()) + live
+
+    def emit(self, event_type, **fields):
+        """Report a coordinator event to the caller"""
+        if self.on_event:
+            self.on_event(dict(type=event_type, **fields))
+
+    def start(self):
+        """Start listening for nodes and expiring stale leases"""
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                coordinator.serve_node(self.rfile, self.wfile, self.client_address)
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._server = Server((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+
+        if not self.chunks:
+            self.finish('exhausted')
+
+        for target in (self._server.serve_forever, self.expire_leases):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.emit('listening', host=self.host, port=self.port, chunks=len(self.chunks))
+
+    def wait(self, timeout=None):
+        """Block until a hit or until every chunk is tested; return the password or None"""
+        self._done.wait(timeout)
+        return self.password
+
+    def stop(self):
+        """Stop the coordinator; connected nodes are told to stop on their next message"""
+        self.finish('stopped')
+        if self._server:
+            # Give nodes one heartbeat interval to collect their stop message
+            time.sleep(min(self.heartbeat_interval, 1.0))
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def finish(self, reason):
+        """Record why the run ended, once"""
+        with self._lock:
+            if self.stop_reason is None:
+                self.stop_reason = reason
+        self._done.set()
+
+    def expire_leases(self):
+        """Re-queue chunks whose lease holders stopped heartbeating"""
+        while not self._done.wait(min(1.0, self.lease_timeout / 2)):
+            now = time.monotonic()
+            with self._lock:
+                expired = [lease_id for lease_id, lease in self.leases.items() if lease['deadline'] < now]
+                for lease_id in expired:
+                    lease = self.leases.pop(lease_id)
+                    if lease['chunk'] not in self.completed:
+                        self.pending.appendleft(lease['chunk'])
+            for lease_id in expired:
+                self.emit('lease_expired', lease=lease_id)
+
+    def serve_node(self, rfile, wfile, address):
+        """Answer one node connection until it disconnects or is told to stop"""
+        node = f"{address[0]}:{address[1]}"
+        try:
+            while True:
+                message = receive_message(rfile)
+                if message is None:
+                    break
+                reply = self.handle_message(node, message)
+                send_message(wfile, reply)
+                if reply['type'] in ('stop', 'error'):
+                    break
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.emit('node_disconnected', node=node)
+
+    def handle_message(self, node, message):
+        """Apply one node message to the lease state and return the reply"""
+        message_type = message.get('type')
+
+        if message_type == 'hello':
+            if self.token is not None and message.get('token') != self.token:
+                return {'type': 'error', 'message': "Invalid token"}
+            self.emit('node_connected', node=node, name=message.get('node'))
+            return {
+                'type': 'welcome',
+                'wordlist_size': self.wordlist_size,
+                'enhance': self.enhance_passwords,
+                'heartbeat': self.heartbeat_interval
+            }
+
+        if message_type == 'found':
+            return self.report_found(node, message)
+
+        with self._lock:
+            lease = self.leases.get(message.get('lease'))
+            if lease is not None:
+                lease['deadline'] = time.monotonic() + self.lease_timeout
+                lease['tested'] = message.get('tested', lease['tested'])
+
+            if message_type == 'done':
+                self.leases.pop(message.get('lease'), None)
+                chunk_id = lease['chunk'] if lease else message.get('chunk')
+                # A chunk counts once, for whichever lease finishes it first; an
+                # expired lease that still finishes counts if the chunk is not done yet
+                if chunk_id is not None and chunk_id not in self.completed:
+                    self.completed[chunk_id] = message.get('tested', 0)
+                    if chunk_id in self.pending:
+                        self.pending.remove(chunk_id)
+                if len(self.completed) == len(self.chunks):
+                    self.stop_reason = self.stop_reason or 'exhausted'
+                    self._done.set()
+
+            if self._done.is_set():
+                return {'type': 'stop', 'reason': self.stop_reason}
+
+            if message_type == 'heartbeat':
+                return {'type': 'ack'}
+
+            if message_type in ('lease', 'done'):
+                if not self.pending:
+                    # Everything is leased out; ask the node to retry in case a lease expires
+                    return {'type': 'wait', 'seconds': self.heartbeat_interval}
+                chunk_id = self.pending.popleft()
+                lease_id = self._next_lease_id
+                self._next_lease_id += 1
+                self.leases[lease_id] = {
+                    'chunk': chunk_id,
+                    'node': node,
+                    'deadline': time.monotonic() + self.lease_timeout,
+                    'tested': 0
+                }
+                start, end = self.chunks[chunk_id]
+
+        if message_type in ('lease', 'done'):
+            self.emit('lease_issued', lease=lease_id, chunk=chunk_id, node=node, start=start, end=end)
+            return {'type': 'lease', 'lease': lease_id, 'chunk': chunk_id, 'start': start, 'end': end}
+
+        return {'type': 'error', 'message': f"Unknown message type: {message_type}"}
+
+    def report_found(self, node, message):
+        """Confirm a reported hit locally before stopping every node"""
+        password = message.get('password', '')
+        verifier = ArchiveVerifier()
+        try:
+            confirmed = verifier.test_password(password, self.archive_path)
+        finally:
+            verifier.close()
+
+        if not confirmed:
+            self.emit('hit_rejected', node=node)
+            return {'type': 'ack'}
+
+        with self._lock:
+            lease = self.leases.get(message.get('lease'))
+            if lease is not None:
+                lease['tested'] = message.get('tested', lease['tested'])
+            if self.password is None:
+                self.password = password
+                self.stop_reason = 'found'
+        self._done.set()
+        self.emit('found', node=node, lease=message.get('lease'))
+        return {'type': 'stop', 'reason': 'found'}
+
+
+class NodeWorker:
+    """Connects to a coordinator and tests leased wordlist ranges until told to stop"""
+
+    def __init__(self, host, port, archive_path, wordlist_path, name=None, token=None, archive_buffers=None):
+        self.host = host
+        self.port = port
+        self.archive_path = archive_path
+        self.wordlist_path = wordlist_path
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        self.token = token
+        self.verifier = ArchiveVerifier(archive_buffers)
+        self.tested_in_lease = 0
+        self.found_password = None
+
+    def run(self):
+        """Work until the coordinator stops this node; return the stop reason"""
+        with socket.create_connection((self.host, self.port)) as sock:
+            stream = sock.makefile('rwb')
+            try:
+                return self.work(stream)
+            finally:
+                stream.close()
+                self.verifier.close()
+
+    def request(self, stream, message):
+        """Send a message and return the coordinator's reply"""
+        send_message(stream, message)
+        reply = receive_message(stream)
+        if reply is None:
+            raise ConnectionError("Coordinator closed the connection")
+        return reply
+
+    def work(self, stream):
+        """Main node loop: lease, test, report"""
+        welcome = self.request(stream, {'type': 'hello', 'node': self.name, 'token': self.token})
+        if welcome['type'] != 'welcome':
+            return welcome.get('message', welcome['type'])
+        if os.path.getsize(self.wordlist_path) != welcome['wordlist_size']:
+            return "Local password list differs from the coordinator's"
+
+        enhance = welcome['enhance']
+        heartbeat_interval = welcome['heartbeat']
+        reply = self.request(stream, {'type': 'lease'})
+
+        while True:
+            if reply['type'] == 'stop':
+                return reply.get('reason', 'stopped')
+            if reply['type'] == 'wait':
+                time.sleep(reply.get('seconds', heartbeat_interval))
+                reply = self.request(stream, {'type': 'lease'})
+                continue
+            if reply['type'] != 'lease':
+                return reply.get('message', reply['type'])
+
+            lease_id = reply['lease']
+            outcome = self.test_range(stream, lease_id, reply['start'], reply['end'], enhance, heartbeat_interval)
+            if outcome is not None:
+                reply = outcome
+                continue
+
+            reply = self.request(stream, {'type': 'done', 'lease': lease_id, 'chunk': reply['chunk'],
+                                          'tested': self.tested_in_lease})
+
+    def test_range(self, stream, lease_id, start, end, enhance, heartbeat_interval):
+        """Test one leased range; return a coordinator reply that ends it early, or None"""
+        passwords = list(iter_wordlist_range(self.wordlist_path, start, end))
+        if enhance:
+            passwords = PasswordEnhancer.enhance_password_list(passwords)
+
+        self.tested_in_lease = 0
+        next_heartbeat = time.monotonic() + heartbeat_interval
+        for password in passwords:
+            self.tested_in_lease += 1
+            if self.verifier.test_password(password, self.archive_path):
+                self.found_password = password
+                return self.request(stream, {'type': 'found', 'lease': lease_id, 'password': password,
+                                             'tested': self.tested_in_lease})
+
+            if time.monotonic() >= next_heartbeat:
+                reply = self.request(stream, {'type': 'heartbeat', 'lease': lease_id,
+                                              'tested': self.tested_in_lease})
+                if reply['type'] == 'stop':
+                    return reply
+                next_heartbeat = time.monotonic() + heartbeat_interval
+        return None
+
+
+def run_node(host, port, archive_path, wordlist_path, threads=1, token=None, archive_buffers=None):
+    """Run several node workers in this process; return their stop reasons"""
+    workers = [NodeWorker(host, port, archive_path, wordlist_path, token=token, archive_buffers=archive_buffers)
+               for _ in range(threads)]
+    reasons = [None] * len(workers)
+
+    def run_worker(index):
+        try:
+            reasons[index] = workers[index].run()
+        except (OSError, ValueError) as e:
+            reasons[index] = f"error: {e}"
+
+    worker_threads = [threading.Thread(target=run_worker, args=(i,)) for i in range(len(workers))]
+    for thread in worker_threads:
+        thread.start()
+    for thread in worker_threads:
+        thread.join()
+    return reasons
@@ -0,0 +1,1583 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Password Testing Engine
+Qt-free building blocks shared by the GUI, the CLI and remote worker nodes:
+password list loading and enhancement, archive password verification and a
+multi-threaded (or multi-process) engine with cooperative cancellation and
+an asyncio interface.
+"""
+
+import asyncio
+import multiprocessing
+import queue
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+import rarfile
+
+from archive import (DEFAULT_PRELOAD_LIMIT, choose_verification_member, classify_entry, load_archive_buffer,
+                     verification_order)
+from checkpoint import CANDIDATES_KEY, BUDGET_REASONS, KeyspaceCoverage, RunBudget
+from ledger import PasswordLedger
+from wordlist import (CompiledWordlist, RangedWordlist, StreamingWordlist, WordlistRange, compression_format,
+                      is_compiled_wordlist, write_compiled_wordlist)
+from metrics import RunMetrics
+from sharedring import DEFAULT_SLOT_SIZE, CandidateRing, StopFlag
+from sources import CandidateBatch, CandidateSource, MaskSource, SourceScheduler, parse_source_spec
+import zipcrypto
+
+# Orders compile_wordlist() can put the original passwords in
+COMPILE_SORT_ORDERS = ('input', 'frequency', 'length')
+
+# Sources read through iter_batches() as the run goes, with an estimated total
+STREAMING_SOURCES = (StreamingWordlist, SourceScheduler)
+
+# Code pages older ZIP tools encode passwords in, tried after UTF-8 (DOS and Windows defaults)
+LEGACY_ENCODINGS = ('cp437', 'cp1252')
+
+try:
+    import pyzipper
+    PYZIPPER_AVAILABLE = True
+except ImportError:
+    PYZIPPER_AVAILABLE = False
+
+
+class PasswordEnhancer:
+    """Enhances password lists by generating variations with common substitutions"""
+
+    # Common character substitutions used in passwords
+    SUBSTITUTIONS = {
+        'a': ['@', '4'],
+        'e': ['3'],
+        'i': ['1', '!'],
+        'o': ['0'],
+        's': ['$', '5'],
+        't': ['7'],
+        'l': ['1'],
+        'g': ['9'],
+        'b': ['6'],
+        'A': ['@', '4'],
+        'E': ['3'],
+        'I': ['1', '!'],
+        'O': ['0'],
+        'S': ['$', '5'],
+        'T': ['7'],
+        'L': ['1'],
+        'G': ['9'],
+        'B': ['6']
+    }
+
+    @staticmethod
+    def generate_variations(password, max_variations=10):
+        """Generate password variations using character substitutions"""
+        # A dict keeps insertion order, so the variations kept are the same in every
+        # process and run (a set's order depends on the hash seed)
+        variations = {}
+        variations[password] = None  # Include original
+
+        # Single character substitutions
+        for i, char in enumerate(password):
+            if char in PasswordEnhancer.SUBSTITUTIONS:
+                for replacement in PasswordEnhancer.SUBSTITUTIONS[char]:
+                    new_password = password[:i] + replacement + password[i+1:]
+                    variations[new_password] = None
+                    if len(variations) >= max_variations:
+                        break
+                if len(variations) >= max_variations:
+                    break
+
+        # Common endings (years, numbers)
+        base_variations = list(variations)
+        for base_pwd in base_variations[:5]:  # Limit to avoid explosion
+            for suffix in ['123', '!', '1', '12', '2023', '2024', '01']:
+                variations[base_pwd + suffix] = None
+                if len(variations) >= max_variations:
+                    break
+            if len(variations) >= max_variations:
+                break
+
+        # Capitalize first letter variations
+        for base_pwd in list(variations)[:5]:
+            if base_pwd and base_pwd[0].islower():
+                variations[base_pwd.capitalize()] = None
+            if len(variations) >= max_variations:
+                break
+
+        return list(variations)[:max_variations]
+
+    @staticmethod
+    def enhance_password_list(passwords, enhancement_factor=3):
+        """Enhance a list of passwords with variations added to the end"""
+        # Start with all original passwords
+        enhanced_passwords = list(passwords)
+
+        # Collect all variations
+        all_variations = []
+        for password in passwords:
+            variations = PasswordEnhancer.generate_variations(password, enhancement_factor)
+            for variation in variations:
+                if variation != password:  # Don't duplicate original
+                    all_variations.append(variation)
+
+        # Add variations to the end, removing duplicates
+        seen = set(enhanced_passwords)  # Track originals
+        for variation in all_variations:
+            if variation not in seen:
+                seen.add(variation)
+                enhanced_passwords.append(variation)
+
+        return enhanced_passwords
+
+    @staticmethod
+    def estimate_enhanced_count(original_count, enhancement_factor=3):
+        """Upper bound on the enhanced list size, computed without generating candidates"""
+        # generate_variations() returns at most enhancement_factor strings per
+        # password with the original among them, so each password adds at most
+        # enhancement_factor - 1 variations to itself; the list never shrinks
+        return original_count * max(1, enhancement_factor)
+
+
+def encoding_variants(password, encodings=LEGACY_ENCODINGS, seen=None):
+    """Return the distinct byte strings a ZIP password is tried as: UTF-8, then each legacy encoding that differs
+
+    ASCII encodes the same in all of them, so only non-ASCII candidates get
+    more than one variant. Their variants are also skipped if they are in
+    seen (and added to it), so a batch never tests the same bytes twice.
+    Encodings that cannot represent the candidate are left out.
+    """
+    if password.isascii():
+        return [password.encode('ascii')]
+    variants = []
+    for encoding in ('utf-8',) + tuple(encodings):
+        try:
+            encoded = password.encode(encoding)
+        except UnicodeEncodeError:
+            continue
+        if encoded in variants or (seen is not None and encoded in seen):
+            continue
+        variants.append(encoded)
+        if seen is not None:
+            seen.add(encoded)
+    return variants
+
+
+class TimedDecompressor:
+    """Stands in for a ZIP member's decompressor and times inflate apart from decryption"""
+
+    def __init__(self, decompressor):
+        self.decompressor = decompressor
+        self.seconds = 0.0
+
+    def decompress(self, *args):
+        started = time.perf_counter()
+        try:
+            return self.decompressor.decompress(*args)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def flush(self, *args):
+        started = time.perf_counter()
+        try:
+            return self.decompressor.flush(*args)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def __getattr__(self, name):
+        # eof, unconsumed_tail and the rest come from the real decompressor
+        return getattr(self.decompressor, name)
+
+
+class ArchiveVerifier:
+    """Tests passwords against archives, keeping parsed handles open between candidates
+
+    Not thread-safe: every worker thread owns its own verifier.
+    """
+
+    def __init__(self, archive_buffers=None, metrics=None):
+        self.archive_buffers = archive_buffers or {}  # archive path -> ArchiveBuffer loaded by the coordinator
+        self.metrics = metrics
+        self.fast_reject = False  # set when the last candidate failed the cheap header check
+        self.inconclusive = False  # set when the last test failed for a reason other than the password
+        self.zip_handles = {}  # archive path -> (open zip file, members to verify)
+        self.key_cache = zipcrypto.PrefixKeyCache()  # ZipCrypto key states of the last candidate's prefixes
+
+    def add_stage_time(self, stage, started):
+        """Record time spent in a verification stage since started"""
+        if self.metrics:
+            self.metrics.add_stage_time(stage, time.perf_counter() - started)
+
+    def test_password(self, password, archive_path):
+        """Test one password against an archive, dispatching on its extension
+
+        ZIP passwords may be given as bytes in a specific encoding; a str is
+        encoded as UTF-8. RAR derives its keys from the Unicode password.
+        """
+        archive_ext = Path(archive_path).suffix.lower()
+        self.fast_reject = False
+        self.inconclusive = False
+        try:
+            if archive_ext == '.zip':
+                return self.test_zip_password(password, archive_path)
+            elif archive_ext == '.rar':
+                return self.test_rar_password(password, archive_path)
+        except Exception:
+            # Continue with next password on error
+            pass
+        self.inconclusive = True
+        return False
+
+    @staticmethod
+    def zip_class_for(members):
+        """Pick the reader for a set of members: pyzipper only where AES needs it"""
+        if PYZIPPER_AVAILABLE and any(classify_entry(info).startswith('aes') for info in members):
+            return pyzipper.AESZipFile
+        return zipfile.ZipFile
+
+    def get_zip_file(self, archive_path):
+        """Return the open handle and members to verify for a ZIP archive"""
+        handle = self.zip_handles.get(archive_path)
+        if handle is None:
+            buffer = self.archive_buffers.get(archive_path)
+            # Read from the shared in-memory copy if there is one: no file opens in the hot loop
+            source = buffer.open() if buffer is not None else archive_path
+            with zipfile.ZipFile(source, 'r') as zip_file:
+                if buffer is not None:
+                    members = [zip_file.getinfo(name) for name in buffer.member_names]
+                else:
+                    # Cheapest entries first, so most candidates fail on the first one
+                    members = verification_order(zip_file.infolist())
+
+            zip_class = self.zip_class_for(members)
+            zip_file = zip_class(buffer.open() if buffer is not None else archive_path, 'r')
+            members = [zip_file.getinfo(info.filename) for info in members]
+            handle = self.zip_handles[archive_path] = (zip_file, members)
+        return handle
+
+    def confirm_zip_password(self, password, source):
+        """Check a password that passed the buffered member against the whole archive, on disk or in memory"""
+        try:
+            with zipfile.ZipFile(source, 'r') as zip_file:
+                zip_class = self.zip_class_for(zip_file.infolist())
+            with zip_class(source, 'r') as zip_file:
+                zip_file.setpassword(password if isinstance(password, bytes) else password.encode('utf-8'))
+                for info in zip_file.infolist():
+                    cipher = classify_entry(info)
+                    if info.is_dir() or cipher == 'strong' or (cipher.startswith('aes') and not PYZIPPER_AVAILABLE):
+                        continue  # no reader available, so these entries cannot veto the hit
+                    with zip_file.open(info) as member:
+                        while member.read(1 << 20):
+                            pass
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        """Close all archive handles opened by this verifier"""
+        for zip_file, _ in self.zip_handles.values():
+            try:
+                zip_file.close()
+            except Exception:
+                pass
+        self.zip_handles.clear()
+
+    def test_zip_password(self, password, archive_path):
+        """Test password against ZIP file"""
+        if PYZIPPER_AVAILABLE:
+            zip_errors = (pyzipper.BadZipFile, pyzipper.LargeZipFile, RuntimeError)
+        else:
+            zip_errors = (RuntimeError, zipfile.BadZipFile, zipfile.LargeZipFile)
+
+        try:
+            zip_file, members = self.get_zip_file(archive_path)
+        except Exception:
+            # The archive could not be opened, which says nothing about the password
+            self.inconclusive = True
+            return False
+
+        try:
+            pwd = password if isinstance(password, bytes) else password.encode('utf-8')
+            for info in members:
+                # Opening a member derives the key and checks the encryption header
+                started = time.perf_counter()
+                try:
+                    member = zip_file.open(info, pwd=pwd)
+                except RuntimeError:
+                    self.fast_reject = True
+                    raise
+                finally:
+                    self.add_stage_time('kdf', started)
+
+                # Reading decrypts, decompresses and verifies the CRC in one pass; the
+                # member's decompressor is wrapped so inflate is timed on its own
+                decompressor = None
+                if getattr(member, '_decompressor', None) is not None:
+                    decompressor = member._decompressor = TimedDecompressor(member._decompressor)
+                started = time.perf_counter()
+                try:
+                    with member:
+                        while member.read(1 << 20):
+                            pass
+                finally:
+                    if self.metrics:
+                        inflate = decompressor.seconds if decompressor is not None else 0.0
+                        self.metrics.add_stage_time('decompress', inflate)
+                        self.metrics.add_stage_time('decrypt', time.perf_counter() - started - inflate)
+
+            buffer = self.archive_buffers.get(archive_path)
+            if buffer is not None and buffer.others:
+                # Only runs on a hit, so reading the other members here is off the hot path
+                return self.confirm_zip_password(password, archive_path if buffer.partial else buffer.open())
+            return True
+        except zip_errors:
+            return False
+        except (UnicodeEncodeError, zipfile.BadZipFile):
+            return False
+        except Exception:
+            return False
+
+    def test_rar_password(self, password, archive_path):
+        """Test password against RAR file"""
+        try:
+            with rarfile.RarFile(archive_path, 'r') as rar_file:
+                # A wrong password on a header-encrypted archive raises here
+                rar_file.setpassword(password)
+
+                names = rar_file.namelist()
+                if not names:
+                    return False
+
+                started = time.perf_counter()
+                try:
+                    with rar_file.open(names[0]) as f:
+                        f.read(1)
+                    return True
+                except rarfile.RarCannotExec:
+                    raise
+                except:
+                    return False
+                finally:
+                    self.add_stage_time('decrypt', started)
+
+        except (rarfile.RarWrongPassword, rarfile.BadRarFile):
+            return False
+        except (rarfile.RarCannotExec, OSError):
+            # No UnRAR tool or an unreadable archive, not a wrong password
+            self.inconclusive = True
+            return False
+        except Exception:
+            return False
+
+
+def load_password_list(password_list_path, enhance_passwords=True, metrics=None, ranged=False):
+    """Read a password list (one per line), optionally enhanced, recording stage times
+
+    Compiled wordlists are memory-mapped and returned as a CompiledWordlist
+    as they are; enhancement is applied when they are compiled. Compressed
+    wordlists are returned as a StreamingWordlist that the engine reads
+    while it runs. With ranged=True a plain text list is not read here at
+    all: it is returned as a RangedWordlist whose byte ranges the workers
+    read and enhance themselves.
+    """
+    started = time.perf_counter()
+    if compression_format(password_list_path):
+        # Decompressed and enhanced block by block while the run goes on
+        enhance = PasswordEnhancer.enhance_password_list if enhance_passwords else None
+        return StreamingWordlist(password_list_path, enhance)
+
+    if is_compiled_wordlist(password_list_path):
+        passwords = CompiledWordlist(password_list_path)
+        if metrics:
+            metrics.add_stage_time('generation', time.perf_counter() - started)
+        return passwords
+
+    if ranged:
+        enhance = PasswordEnhancer.enhance_password_list if enhance_passwords else None
+        return RangedWordlist(password_list_path, enhance)
+
+    with open(password_list_path, 'r', encoding='utf-8', errors='ignore') as f:
+        original_passwords = [line.strip() for line in f if line.strip()]
+    if metrics:
+        metrics.add_stage_time('generation', time.perf_counter() - started)
+
+    if not original_passwords or not enhance_passwords:
+        return original_passwords
+
+    started = time.perf_counter()
+    enhanced_passwords = PasswordEnhancer.enhance_password_list(original_passwords)
+    if metrics:
+        metrics.add_stage_time('enhancement', time.perf_counter() - started)
+    return enhanced_passwords
+
+
+def load_candidate_sources(specs, enhance_passwords=True, metrics=None):
+    """Load several source specs (see sources.parse_source_spec) into one SourceScheduler
+
+    Lists load as load_password_list() would load them alone, masks are
+    generated by index; enhance_passwords is the default for lists that
+    do not say rules=on or rules=off.
+    """
+    sources = []
+    for text in specs:
+        spec = parse_source_spec(text, enhance_passwords)
+        if spec.kind == 'mask':
+            passwords = MaskSource(spec.value)
+        else:
+            passwords = load_password_list(spec.value, spec.rules, metrics)
+        sources.append(CandidateSource(f"{spec.kind}={spec.value}", passwords, spec.priority, spec.limit,
+                                       spec.seconds))
+    return SourceScheduler(sources)
+
+
+def compile_wordlist(password_list_path, output_path, enhance_passwords=False, sort='input'):
+    """Compile a text password list into the binary wordlist format; return the entry count
+
+    sort orders the original passwords before enhancement: 'input' keeps
+    the file order, 'frequency' puts the most repeated passwords first and
+    'length' the shortest first. Enhanced variations always follow the
+    originals, as in load_password_list().
+    """
+    if sort not in COMPILE_SORT_ORDERS:
+        raise ValueError(f"Unknown sort order: {sort}")
+
+    occurrences = {}  # insertion-ordered, so 'input' needs no sort
+    if compression_format(password_list_path):
+        for password in StreamingWordlist(password_list_path).iter_passwords():
+            occurrences[password] = occurrences.get(password, 0) + 1
+    else:
+        with open(password_list_path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                password = line.strip()
+                if password:
+                    occurrences[password] = occurrences.get(password, 0) + 1
+
+    passwords = list(occurrences)
+    if sort == 'frequency':
+        passwords.sort(key=lambda password: -occurrences[password])
+    elif sort == 'length':
+        passwords.sort(key=len)
+    if enhance_passwords:
+        passwords = PasswordEnhancer.enhance_password_list(passwords)
+    return write_compiled_wordlist(passwords, output_path)
+
+
+class CancellationToken:
+    """Cooperative stop flag shared between an engine run and its caller"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        """True once cancel() has been called"""
+        return self._event.is_set()
+
+    def cancel(self, reason='cancelled'):
+        """Request a stop; the first reason given wins"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """Call callback on cancellation (immediately if already cancelled)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, timeout=None):
+        """Block until cancelled or the timeout expires"""
+        return self._event.wait(timeout)
+
+
+class EngineProgress:
+    """Progress report produced by CrackingEngine runs"""
+
+    def __init__(self, tested, total, current_password='', password=None, finished=False, stop_reason=None,
+                 error=None, hits=None, solved=None, unsolved=None, coverage=None):
+        self.tested = tested
+        self.total = total
+        self.current_password = current_password
+        self.password = password  # the first successful password, once found
+        self.finished = finished
+        self.stop_reason = stop_reason  # 'found', 'exhausted', 'error' or the cancellation reason
+        self.error = error
+        self.hits = hits or []  # (archive path, password) pairs found since the last report
+        self.solved = solved or {}  # archive path -> password, final report only
+        self.unsolved = unsolved or []  # archives left unsolved, final report only
+        self.coverage = coverage or {}  # key -> fully tested [start, end) ranges, final report only
+
+    def __repr__(self):
+        return (f"EngineProgress(tested={self.tested}, total={self.total}, finished={self.finished}, "
+                f"stop_reason={self.stop_reason!r})")
+
+
+class CrackingEngine:
+    """Qt-free multi-threaded password tester
+
+    Candidates are handed to worker threads in batches over a blocking
+    queue. The coordinator blocks on the result queue and workers block on
+    the work queue, so nothing polls; shutdown is one sentinel per worker.
+    Workers check the cancellation token between candidates, so a hit or a
+    stop request ends every worker within one batch. Use run_sync() from a
+    thread or iterate run() from asyncio code.
+
+    With processes=True the workers are separate processes instead, so
+    verification is not bound to one core by the GIL. Batches then travel
+    through a shared-memory CandidateRing: the coordinator packs a slot and
+    sends its number, and the worker returns a small result record.
+
+    A CandidateFilter is pushed into the source before the run: lists are
+    filtered up front or as they stream, masks are pruned by position.
+    Whatever the source cannot guarantee (a compiled list, a required
+    class or regex on a mask) is checked per batch before verification,
+    and the candidates dropped there count as tested.
+
+    A RunBudget bounds the run by time, candidates or CPU seconds: once one
+    runs out no more work is handed out, the workers finish what they hold
+    and the run stops with the budget's reason. Every work item that was
+    fully tested is recorded in a KeyspaceCoverage, and ranges it already
+    holds (from a checkpoint of an earlier run) are skipped.
+    """
+
+    DEFAULT_BATCH_SIZE = 64
+
+    # Batches a streaming wordlist may run ahead of the workers
+    STREAM_QUEUE_BATCHES = 64
+
+    # Minimum batch size while ZipCrypto headers are checked as NumPy arrays,
+    # so each batch has enough passwords of one length to vectorize
+    VECTOR_BATCH_SIZE = 4096
+
+    # Ring slots per worker process: one being tested, one packed and waiting
+    RING_SLOTS_PER_WORKER = 2
+
+    # Seconds between checks that worker processes are still alive
+    PROCESS_LIVENESS_INTERVAL = 1.0
+
+    def __init__(self, archive_path, passwords, worker_count=4, batch_size=DEFAULT_BATCH_SIZE, metrics=None,
+                 profiler=None, preload_limit=DEFAULT_PRELOAD_LIMIT, ledger_dir=None, processes=False, budget=None,
+                 coverage=None, candidate_filter=None, legacy_encodings=LEGACY_ENCODINGS):
+        self.archive_paths = [archive_path]
+        self.passwords = passwords
+        self.worker_count = max(1, worker_count)
+        self.batch_size = max(1, batch_size)
+        self.metrics = metrics or RunMetrics()
+        self.profiler = profiler
+        self.preload_limit = preload_limit
+        self.ledger_dir = ledger_dir  # None disables the already-tried ledger
+        self.processes = processes  # run workers as processes; the profiler only covers threads
+        self.ledgers = {}  # archive path -> PasswordLedger of candidates rejected in earlier runs
+        self.archive_buffers = {}  # archive path -> ArchiveBuffer shared by all workers
+        self.archive_ciphers = {}  # archive path -> encryption of the entry used for verification
+        self.zipcrypto_headers = {}  # archive path -> encryption headers for the shared key check
+        self.vectorize = False  # check ZipCrypto headers for whole batches at once
+        self.pending = []  # archives not solved yet
+        self.pending_lock = threading.Lock()
+        self.errors = []  # archives that could not be prepared
+        self.budget = budget or RunBudget()
+        self.coverage = coverage if coverage is not None else KeyspaceCoverage()
+        self.resumed = self.coverage.count()  # units covered by earlier runs
+        self.issued = 0  # candidates handed out under the candidate budget
+        self.total_upper_bound = False  # the last estimate_total() may be more than the run will test
+        self.issue_lock = threading.Lock()  # worker threads issue ranged candidates themselves
+        self.draining = threading.Event()  # set once a budget ran out: no new work goes out
+        self.budget_reason = None  # stop reason of the budget that ran out
+        self.withheld = False  # work was left untested because of the budget
+        self.candidate_filter = candidate_filter
+        self.residual_filter = None  # the part of the filter the source cannot guarantee, checked per batch
+        self.legacy_encodings = tuple(legacy_encodings)  # tried on ZIP archives after UTF-8, see encoding_variants()
+
+    def prepare_archives(self):
+        """Parse every archive once before the workers start, skipping those that cannot be tested"""
+        for archive_path in self.archive_paths:
+            try:
+                error = self.prepare_archive(archive_path)
+            except Exception as e:
+                error = f"Cannot open {archive_path}: {str(e)}"
+            if error:
+                self.errors.append(error)
+            else:
+                self.pending.append(archive_path)
+
+    def prepare_archive(self, archive_path):
+        """Load one archive and pick how to verify it; return an error message or None"""
+        archive_ext = Path(archive_path).suffix.lower()
+        if archive_ext == '.rar':
+            with rarfile.RarFile(archive_path, 'r') as rar_file:
+                rar_file.namelist()
+            self.archive_ciphers[archive_path] = 'rar'
+            return None
+        if archive_ext != '.zip':
+            return f"Unsupported archive type: {archive_path}"
+
+        buffer = load_archive_buffer(archive_path, self.preload_limit)
+        if buffer is not None:
+            self.archive_buffers[archive_path] = buffer
+            cipher = buffer.cipher
+        else:
+            with zipfile.ZipFile(archive_path, 'r') as zip_file:
+                member = choose_verification_member(zip_file.infolist())
+            cipher = classify_entry(member) if member is not None else 'none'
+        self.archive_ciphers[archive_path] = cipher
+
+        if cipher == 'strong':
+            return f"{archive_path} uses PKWARE strong encryption, which is not supported"
+        if cipher.startswith('aes') and not PYZIPPER_AVAILABLE:
+            return f"{archive_path} is AES-encrypted; install pyzipper to test it"
+        if cipher == 'zipcrypto':
+            # The cheapest check there is: derive the key state once per candidate
+            # and test it against the encryption headers before opening anything
+            data = buffer.data if buffer is not None and buffer.mode == 'memory' else None
+            headers = zipcrypto.read_headers(archive_path, data=data)
+            if headers:
+                self.zipcrypto_headers[archive_path] = headers
+        return None
+
+    def open_ledgers(self):
+        """Open the already-tried ledger of every pending archive"""
+        if self.ledger_dir is None:
+            return
+        for archive_path in self.pending:
+            try:
+                self.ledgers[archive_path] = PasswordLedger.for_archive(archive_path, self.ledger_dir)
+            except (OSError, ValueError):
+                # An unusable ledger only costs the skipping, never the run
+                continue
+
+    def close_ledgers(self):
+        """Write the candidates rejected in this run to the ledgers"""
+        for ledger in self.ledgers.values():
+            try:
+                ledger.close()
+            except OSError:
+                continue
+        self.ledgers.clear()
+
+    def run_sync(self, token=None, on_progress=None):
+        """Test all candidates in worker threads; return the final EngineProgress"""
+        token = token or CancellationToken()
+        self.push_down_filter()
+        streaming = isinstance(self.passwords, STREAMING_SOURCES)
+        ranged = isinstance(self.passwords, RangedWordlist)
+        total = self.estimate_total()
+        self.metrics.set_total(total, self.total_upper_bound)
+
+        self.prepare_archives()
+        if not self.pending:
+            # Nothing left to test; preparation errors are listed in self.errors
+            return EngineProgress(0, total, finished=True, stop_reason='error' if self.errors else 'exhausted')
+        self.open_ledgers()
+
+        # With NumPy, batches of ZipCrypto-only runs are checked as arrays
+        self.vectorize = zipcrypto.NUMPY_AVAILABLE and all(
+            archive_path in self.zipcrypto_headers for archive_path in self.pending)
+        batch_size = max(self.batch_size, self.VECTOR_BATCH_SIZE) if self.vectorize else self.batch_size
+        if self.processes:
+            return self.run_processes(token, on_progress, total, batch_size)
+
+        result_queue = queue.SimpleQueue()
+        feeder = None
+        if streaming:
+            # A bounded queue keeps the decompressing feeder only a few batches ahead
+            work_queue = queue.Queue(maxsize=max(self.STREAM_QUEUE_BATCHES, 2 * self.worker_count))
+            feeder = threading.Thread(target=self.feed_stream, args=(work_queue, result_queue, token, batch_size),
+                                      name='zirar-feeder', daemon=True)
+        else:
+            work_queue = queue.SimpleQueue()
+            started = time.perf_counter()
+            if ranged:
+                # Byte ranges only; workers read and enhance their own candidates
+                for descriptor in self.plan_ranges():
+                    work_queue.put(descriptor)
+            else:
+                # Queue index slices only; workers slice their own batch, which for a
+                # compiled wordlist decodes just those entries from the mapped file
+                for start, stop in self.plan_slices(batch_size):
+                    work_queue.put(slice(start, stop))
+            # One sentinel per worker ends the run once the queue is drained...
+            for _ in range(self.worker_count):
+                work_queue.put(None)
+            self.metrics.add_stage_time('queueing', time.perf_counter() - started)
+        self.metrics.set_queue(work_queue)
+
+        def wake_workers():
+            # ...and on cancellation idle workers are woken the same way. A full
+            # bounded queue needs no sentinels: every worker gets an item and
+            # sees the cancelled token.
+            for _ in range(self.worker_count):
+                try:
+                    work_queue.put_nowait(None)
+                except queue.Full:
+                    break
+        token.add_callback(wake_workers)
+
+        def drain(reason):
+            # A budget ran out: workers finish their current item and exit
+            self.start_drain(reason)
+            wake_workers()
+        deadline = None
+        if self.budget.seconds is not None:
+            deadline = threading.Timer(self.budget.seconds, drain, args=(BUDGET_REASONS['seconds'],))
+            deadline.daemon = True
+            deadline.start()
+        if feeder is not None:
+            feeder.start()
+
+        threads = []
+        for worker_id in range(self.worker_count):
+            verifier = ArchiveVerifier(self.archive_buffers, self.metrics)
+            thread = threading.Thread(target=self.run_worker,
+                                      args=(worker_id, verifier, work_queue, result_queue, token, batch_size),
+                                      name=f"zirar-worker-{worker_id}", daemon=True)
+            threads.append(thread)
+            thread.start()
+
+        tested = 0
+        current_password = ''
+        solved = {}
+        error = None
+        live_workers = len(threads)
+        started = time.monotonic()
+        cpu_started = time.process_time()
+        while live_workers:
+            record = result_queue.get()
+            kind = record[0]
+            if kind == 'batch':
+                _, count, current_password, hits, covered = record
+                tested += count
+                if covered is not None:
+                    self.coverage.add(*covered)
+                for archive_path, password in hits:
+                    solved.setdefault(archive_path, password)
+                if streaming or ranged:
+                    total = self.estimate_total()
+                    self.metrics.set_total(total, self.total_upper_bound)
+                if self.budget and not self.draining.is_set():
+                    reason = self.budget.exceeded(time.monotonic() - started, tested,
+                                                  time.process_time() - cpu_started)
+                    if reason:
+                        drain(reason)
+                if on_progress:
+                    first = next(iter(solved.values()), None)
+                    on_progress(EngineProgress(tested, total, current_password, first, hits=hits))
+            elif kind == 'error':
+                error = error or record[1]
+                token.cancel('error')
+            elif kind == 'exit':
+                live_workers -= 1
+
+        for thread in threads:
+            thread.join()
+        if deadline is not None:
+            deadline.cancel()
+        if feeder is not None:
+            # After cancellation the feeder puts at most one more batch before it
+            # sees the token, so one drain always unblocks it
+            while True:
+                try:
+                    work_queue.get_nowait()
+                except queue.Empty:
+                    break
+            feeder.join()
+            total = self.estimate_total()
+            # A read error reported after the workers exited is still the run's error
+            while not result_queue.empty():
+                record = result_queue.get()
+                if record[0] == 'error':
+                    error = error or record[1]
+        if ranged:
+            total = self.estimate_total()
+            self.metrics.set_total(total, self.total_upper_bound)
+        return self.finish_run(token, tested, total, current_password, solved, error)
+
+    def push_down_filter(self):
+        """Apply the candidate filter inside the source, leaving only what it cannot guarantee for the workers"""
+        if not self.candidate_filter:
+            return
+        started = time.perf_counter()
+        if isinstance(self.passwords, SourceScheduler):
+            exact = True
+            for source in self.passwords.sources:
+                source.passwords, source_exact = self.filter_source(source.passwords)
+                exact = exact and source_exact
+        else:
+            self.passwords, exact = self.filter_source(self.passwords)
+        self.metrics.add_stage_time('filtering', time.perf_counter() - started)
+        self.residual_filter = None if exact else self.candidate_filter
+
+    def filter_source(self, source):
+        """Push the candidate filter into one source; return the source to use and whether it is fully filtered"""
+        if isinstance(source, MaskSource):
+            return source, source.restrict(self.candidate_filter)
+        if isinstance(source, (StreamingWordlist, RangedWordlist)):
+            # Filtered block by block or range by range, right after enhancement
+            source.candidate_filter = self.candidate_filter
+            return source, True
+        # In-memory lists are checked per batch rather than filtered here, so coverage keeps
+        # their own positions; a compiled wordlist is only ever decoded slice by slice anyway
+        return source, False
+
+    def estimate_total(self):
+        """Candidates this run is expected to test: the source less earlier coverage, within the budget"""
+        source = self.passwords
+        self.total_upper_bound = False
+        if isinstance(source, RangedWordlist):
+            total = source.estimated_total()  # covered ranges are bytes here, not candidates
+            self.total_upper_bound = source.bounded
+        else:
+            total = source.estimated_total() if isinstance(source, STREAMING_SOURCES) else len(source)
+            total = max(0, total - self.resumed)
+        if self.budget.candidates is not None:
+            total = min(total, self.budget.candidates)
+        return total
+
+    def start_drain(self, reason):
+        """Stop handing out work because a budget ran out"""
+        if self.budget_reason is None:
+            self.budget_reason = reason
+        self.draining.set()
+
+    def issue(self, count):
+        """Return how many of count candidates may still be handed out under the candidate budget"""
+        if self.budget.candidates is None:
+            return count
+        with self.issue_lock:
+            allowed = max(0, min(count, self.budget.candidates - self.issued))
+            self.issued += allowed
+        if allowed < count:
+            # Work past the budget is simply never planned; what was planned still runs
+            self.budget_reason = self.budget_reason or BUDGET_REASONS['candidates']
+            self.withheld = True
+        return allowed
+
+    def plan_slices(self, batch_size):
+        """Indexed source: (start, stop) index ranges still to test, in order and within the budget"""
+        for gap_start, gap_end in self.coverage.uncovered(CANDIDATES_KEY, 0, len(self.passwords)):
+            for start in range(gap_start, gap_end, batch_size):
+                count = self.issue(min(batch_size, gap_end - start))
+                if not count:
+                    return
+                yield start, start + count
+
+    def plan_ranges(self):
+        """Ranged source: the descriptors still to test, without the byte ranges earlier runs covered"""
+        for descriptor in self.passwords.plan():
+            for start, end in self.coverage.uncovered(descriptor.rules, descriptor.start, descriptor.end):
+                # A range cut short by an earlier run resumes after the candidates it tested
+                skip = self.coverage.count(self.partial_key(WordlistRange(start, end, descriptor.rules)))
+                yield WordlistRange(start, end, descriptor.rules, skip)
+
+    def partial_key(self, descriptor):
+        """Coverage key of the candidates tested so far of a range that was cut short"""
+        return f"{descriptor.rules}:{descriptor.start}-{descriptor.end}"
+
+    def partial_range(self, descriptor, finished):
+        """Return the (key, start, end) to record when only the first finished candidates of a range were tested"""
+        return self.partial_key(descriptor), 0, descriptor.skip + finished
+
+    def item_range(self, item):
+        """Return the (key, start, end) a work item covers once it is fully tested"""
+        if isinstance(item, WordlistRange):
+            return item.rules, item.start, item.end
+        if isinstance(item, slice):
+            return CANDIDATES_KEY, item.start, item.stop
+        return item.key, item.start, item.start + len(item.passwords)
+
+    def finish_run(self, token, tested, total, current_password, solved, error):
+        """Close the ledgers and build the final EngineProgress of a run"""
+        self.close_ledgers()
+        with self.pending_lock:
+            unsolved = list(self.pending)
+        if solved and not unsolved:
+            stop_reason = 'found'
+        elif token.cancelled:
+            stop_reason = token.reason
+        elif self.withheld:
+            # A budget that ran out after the last work item was handed out stopped nothing
+            stop_reason = self.budget_reason
+        else:
+            stop_reason = 'exhausted'
+        return EngineProgress(tested, total, current_password, next(iter(solved.values()), None),
+                              finished=True, stop_reason=stop_reason, error=error, solved=solved,
+                              unsolved=unsolved, coverage=self.coverage.ranges())
+
+    def run_processes(self, token, on_progress, total, batch_size):
+        """Test all candidates in worker processes
+
+        Work goes out as small items over a process queue, at most
+        RING_SLOTS_PER_WORKER per worker at a time. A ranged wordlist is
+        sent as WordlistRange descriptors that the workers expand
+        themselves; other sources are generated here and packed into a slot
+        of a shared-memory CandidateRing. Workers look candidates up in
+        their own read-only view of the ledgers and send back the hashes
+        they rejected, so only the coordinator writes the ledger files.
+
+        Stopping goes through a StopFlag byte in shared memory: a worker that
+        solves the last pending archive sets it itself, so its peers stop
+        within one candidate without a round trip through the coordinator.
+        Workers always exit on their own and are joined, never terminated.
+        """
+        context = multiprocessing.get_context('spawn')
+        source = self.passwords
+        ranged = isinstance(source, RangedWordlist)
+        estimated = ranged or isinstance(source, STREAMING_SOURCES)
+        slot_count = self.worker_count * self.RING_SLOTS_PER_WORKER
+        ring = None if ranged else CandidateRing(slot_count, DEFAULT_SLOT_SIZE)
+        work_queue = context.SimpleQueue()
+        result_queue = context.Queue()
+        stop_flag = StopFlag()
+        config = {
+            'archive_paths': list(self.pending),
+            'preload_limit': self.preload_limit,
+            'vectorize': self.vectorize,
+            'legacy_encodings': self.legacy_encodings,
+            'batch_size': batch_size,
+            'ledger_paths': {archive_path: ledger.path for archive_path, ledger in self.ledgers.items()},
+            'ring': (ring.name, ring.slot_count, ring.slot_size) if ring else None,
+            'wordlist': (source.path, source.enhance, source.range_size, source.candidate_filter) if ranged else None,
+            'residual_filter': self.residual_filter,
+            'stop_flag': stop_flag.name
+        }
+        processes = []
+        for worker_id in range(self.worker_count):
+            self.metrics.register_worker(worker_id)
+            processes.append(context.Process(target=run_worker_process,
+                                             args=(worker_id, config, work_queue, result_queue),
+                                             name=f"zirar-worker-{worker_id}", daemon=True))
+
+        def stop_workers():
+            # Workers see the flag between candidates; the record wakes the coordinator
+            stop_flag.set(token.reason)
+            result_queue.put(('cancel',))
+        token.add_callback(stop_workers)
+
+        work = self.plan_ranges() if ranged else self.iter_batches(batch_size)
+        free_slots = list(range(slot_count))
+        in_flight = {}  # slot -> (WordlistRange or None for a packed ring slot, the (key, start, end) it covers,
+        #                  candidates granted to a range under the candidate budget or None)
+        waiting = None  # CandidateBatch of candidates not packed yet, or a WordlistRange not sent yet
+        reserved = 0  # candidates granted to ranges in flight, not yet issued
+        cut_short = []  # the untested rest of ranges that produced more than their grant
+        recorded = set()  # partial keys of the ranges whose candidate count the source has noted
+        exhausted = False
+        tested = 0
+        current_password = ''
+        solved = {}
+        error = None
+        live_workers = len(processes)
+        started = time.monotonic()
+        cpu_started = time.process_time()
+        worker_cpu = 0.0  # CPU seconds the worker processes reported
+        try:
+            for process in processes:
+                process.start()
+            while True:
+                while (free_slots and not token.cancelled and not stop_flag.is_set()
+                       and not self.draining.is_set()):
+                    if not waiting and cut_short:
+                        waiting = cut_short.pop(0)
+                    if not waiting:
+                        if exhausted:
+                            break
+                        try:
+                            item = next(work, None)
+                        except Exception as e:
+                            error = f"Could not read password list: {str(e)}"
+                            token.cancel('error')
+                            break
+                        if item is None:
+                            exhausted = True
+                            break
+                        waiting = item if ranged or item.passwords else None
+                        continue
+                    if ranged:
+                        # A range's candidate count is only known once it is expanded, so under a
+                        # candidate budget each range is granted a share of what is not issued yet
+                        grant = None
+                        if self.budget.candidates is not None:
+                            available = self.budget.candidates - self.issued - reserved
+                            if available <= 0:
+                                break
+                            grant = -(-available // len(free_slots))
+                            reserved += grant
+                        slot = free_slots.pop()
+                        in_flight[slot] = (waiting, self.item_range(waiting), grant)
+                        waiting = None
+                    else:
+                        slot = free_slots.pop()
+                        count = ring.pack(slot, waiting.passwords)
+                        in_flight[slot] = (None, (waiting.key, waiting.start, waiting.start + count), None)
+                        rest = waiting.passwords[count:]
+                        waiting = CandidateBatch(waiting.key, waiting.start + count, rest) if rest else None
+                    work_queue.put((slot, in_flight[slot][0], tuple(solved), in_flight[slot][2]))
+                left = not exhausted or waiting or cut_short
+                if left and (self.draining.is_set() or (ranged and not in_flight)):
+                    self.withheld = True
+                    if not self.draining.is_set():
+                        # The last grant came back and the budget is spent with ranges left
+                        self.budget_reason = self.budget_reason or BUDGET_REASONS['candidates']
+                if not in_flight or not live_workers:
+                    break
+
+                try:
+                    record = result_queue.get(timeout=self.PROCESS_LIVENESS_INTERVAL)
+                except queue.Empty:
+                    crashed = [process for process in processes if process.exitcode not in (None, 0)]
+                    if crashed:
+                        error = error or f"Worker process exited with code {crashed[0].exitcode}"
+                        token.cancel('error')
+                        break
+                    record = ('tick',)
+
+                kind = record[0]
+                if kind == 'batch':
+                    (_, worker_id, slot, count, current_password, hits, counts, rejected, produced, finished,
+                     complete) = record
+                    self.metrics.add_counts(worker_id, counts)
+                    worker_cpu += counts['cpu']
+                    descriptor, covered, grant = in_flight.pop(slot)
+                    free_slots.append(slot)
+                    if grant is not None:
+                        reserved -= grant
+                        self.issue(min(produced, grant))
+                        if produced > grant and finished == grant:
+                            # The rest of the range goes out again while the budget lasts
+                            cut_short.append(descriptor._replace(skip=descriptor.skip + finished))
+                    if complete:
+                        self.coverage.add(*covered)
+                    elif descriptor is not None and finished:
+                        # A range cut short by its grant or a stop records the candidates it did test
+                        self.coverage.add(*self.partial_range(descriptor, finished))
+                    if descriptor is not None and self.partial_key(descriptor) not in recorded:
+                        # A range that goes out again after being cut short was counted the first time round
+                        recorded.add(self.partial_key(descriptor))
+                        source.record_range(descriptor, descriptor.skip + produced)
+                    for archive_path, hashes in rejected.items():
+                        if archive_path in self.ledgers:
+                            self.ledgers[archive_path].add_hashes(hashes)
+                    tested += count
+                    new_hits = []
+                    for archive_path, password in hits:
+                        if archive_path not in solved:
+                            solved[archive_path] = password
+                            new_hits.append((archive_path, password))
+                    with self.pending_lock:
+                        self.pending = [archive_path for archive_path in self.pending if archive_path not in solved]
+                        all_solved = not self.pending
+                    if all_solved:
+                        token.cancel('found')
+                    if estimated:
+                        total = self.estimate_total()
+                        self.metrics.set_total(total, self.total_upper_bound)
+                    if on_progress:
+                        first = next(iter(solved.values()), None)
+                        on_progress(EngineProgress(tested, total, current_password, first, hits=new_hits))
+                elif kind == 'error':
+                    _, message, slot = record
+                    error = error or message
+                    if slot in in_flight:
+                        reserved -= in_flight.pop(slot)[2] or 0
+                        free_slots.append(slot)
+                    token.cancel('error')
+                elif kind == 'exit':
+                    live_workers -= 1
+                if self.budget and not exhausted and not self.draining.is_set():
+                    # Checked on every record and at least every liveness interval
+                    reason = self.budget.exceeded(time.monotonic() - started, tested,
+                                                  time.process_time() - cpu_started + worker_cpu)
+                    if reason:
+                        self.start_drain(reason)
+        finally:
+            # All workers are told to stop before any is joined, so they exit in parallel
+            if not token.cancelled and stop_flag.is_set():
+                token.cancel(stop_flag.reason)
+            stop_flag.set('stopped')
+            for _ in processes:
+                work_queue.put(None)
+            for process in processes:
+                if process.pid is not None:
+                    process.join()
+            if not ranged:
+                work.close()
+            result_queue.close()
+            if ring is not None:
+                ring.close()
+            stop_flag.close()
+
+        if estimated:
+            total = self.estimate_total()
+            self.metrics.set_total(total, self.total_upper_bound)
+        return self.finish_run(token, tested, total, current_password, solved, error)
+
+    def iter_batches(self, batch_size):
+        """Yield the CandidateBatch items of a streaming or indexed source in order
+
+        Ranges covered by earlier runs are cut out and the candidate budget
+        is applied, so every item yielded is work this run still has to do.
+        """
+        source = self.passwords
+        if not isinstance(source, STREAMING_SOURCES):
+            for start, stop in self.plan_slices(batch_size):
+                yield CandidateBatch(CANDIDATES_KEY, start, source[start:stop])
+            return
+
+        if isinstance(source, SourceScheduler):
+            batches = source.iter_batches(batch_size)
+        else:
+            batches = self.number_batches(source.iter_batches(batch_size))
+        try:
+            while True:
+                started = time.perf_counter()
+                batch = next(batches, None)
+                self.metrics.add_stage_time('generation', time.perf_counter() - started)
+                if batch is None:
+                    return
+                self.metrics.set_total(self.estimate_total(), self.total_upper_bound)
+                for piece in self.uncovered_pieces(batch):
+                    count = self.issue(len(piece.passwords))
+                    if not count:
+                        return
+                    yield piece if count == len(piece.passwords) else piece._replace(passwords=piece.passwords[:count])
+        finally:
+            batches.close()
+
+    def number_batches(self, batches):
+        """Key the plain batches of a single streamed list by their position in it"""
+        position = 0
+        try:
+            for batch in batches:
+                yield CandidateBatch(CANDIDATES_KEY, position, batch)
+                position += len(batch)
+        finally:
+            batches.close()
+
+    def uncovered_pieces(self, batch):
+        """Return the parts of a CandidateBatch not covered by earlier runs"""
+        end = batch.start + len(batch.passwords)
+        gaps = self.coverage.uncovered(batch.key, batch.start, end) if self.resumed else [(batch.start, end)]
+        if gaps == [(batch.start, end)]:
+            return [batch]
+        return [CandidateBatch(batch.key, start, batch.passwords[start - batch.start:stop - batch.start])
+                for start, stop in gaps]
+
+    def feed_stream(self, work_queue, result_queue, token, batch_size):
+        """Feeder thread: decompress a streaming wordlist (or interleave sources) into the bounded work queue"""
+        batches = self.iter_batches(batch_size)
+        try:
+            for batch in batches:
+                if token.cancelled:
+                    break
+                if self.draining.is_set():
+                    self.withheld = True
+                    break
+                work_queue.put(batch)
+        except Exception as e:
+            result_queue.put(('error', f"Could not read password list: {str(e)}"))
+            token.cancel('error')
+            return
+        finally:
+            batches.close()
+            self.metrics.set_total(self.estimate_total(), self.total_upper_bound)
+
+        # End of stream: one sentinel per worker, unless a stop came meanwhile
+        for _ in range(self.worker_count):
+            if token.cancelled or self.draining.is_set():
+                break
+            work_queue.put(None)
+
+    def run_worker(self, worker_id, verifier, work_queue, result_queue, token, batch_size):
+        """Thread entry point, optionally under the profiler"""
+        try:
+            if self.profiler:
+                self.profiler.run(f"worker-{worker_id}", self.process_batches,
+                                  worker_id, verifier, work_queue, result_queue, token, batch_size)
+            else:
+                self.process_batches(worker_id, verifier, work_queue, result_queue, token, batch_size)
+        except Exception as e:
+            # The profiler failed before the worker loop ran; the loop posts its own errors
+            result_queue.put(('error', f"Worker error: {str(e)}"))
+        finally:
+            # The coordinator waits for one exit record per worker, however the worker ended
+            verifier.close()
+            result_queue.put(('exit', worker_id))
+
+    def process_batches(self, worker_id, verifier, work_queue, result_queue, token, batch_size):
+        """Worker loop: block on the queue, test each batch, stop on a sentinel, cancellation or drain"""
+        self.metrics.register_worker(worker_id)
+        try:
+            while True:
+                item = work_queue.get()
+                if item is None or token.cancelled:
+                    break
+                if self.draining.is_set():
+                    self.withheld = True
+                    break
+                batches, produced = self.load_batches(item, batch_size)
+                remaining = produced
+                finished = 0  # candidates of the batches tested in full, which are always the leading ones
+                covered = self.item_range(item) if not remaining else None
+                for batch in batches:
+                    if token.cancelled:
+                        break
+                    tested, password, hits = self.test_batch(worker_id, verifier, batch, token)
+                    remaining -= tested
+                    if tested == len(batch):
+                        finished += tested
+                    # The item counts as covered with its last batch, and only if nothing was skipped or cut;
+                    # a range that ends early records the candidates it did test
+                    covered = None
+                    if batch is batches[-1] and not remaining:
+                        covered = self.item_range(item)
+                    elif isinstance(item, WordlistRange) and finished and (batch is batches[-1] or token.cancelled):
+                        covered = self.partial_range(item, finished)
+                    result_queue.put(('batch', tested, password, hits, covered))
+                if not batches:
+                    result_queue.put(('batch', 0, '', [], covered))
+        except Exception as e:
+            result_queue.put(('error', f"Worker error: {str(e)}"))
+
+    def load_batches(self, item, batch_size, grant=None):
+        """Return (batches, produced): the candidate batches a work queue item stands for and its candidate count
+
+        A ranged item is cut to what the candidate budget still allows, or to
+        grant when the coordinator reserved its share up front; the batches
+        then hold fewer than produced candidates and the range stays uncovered.
+        """
+        if isinstance(item, WordlistRange):
+            # Ranged sources queue descriptors; the worker generates the candidates
+            candidates = self.passwords.generate(item, self.metrics)
+            produced = len(candidates)
+            self.passwords.record_range(item, item.skip + produced)
+            candidates = candidates[:self.issue(produced) if grant is None else min(grant, produced)]
+            return [candidates[start:start + batch_size] for start in range(0, len(candidates), batch_size)], produced
+        # Indexed sources queue slices; streamed ones queue the batch itself
+        batch = self.passwords[item] if isinstance(item, slice) else item.passwords
+        return [batch], len(batch)
+
+    def test_batch(self, worker_id, verifier, batch, token):
+        """Test one batch until it is done or the token is cancelled; return (tested, last password, hits)"""
+        candidates = batch
+        if self.residual_filter is not None:
+            started = time.perf_counter()
+            candidates = self.residual_filter.apply(batch)
+            self.metrics.record_filtered(len(batch) - len(candidates), time.perf_counter() - started)
+        remaining = candidates
+        if self.vectorize and len(candidates) >= zipcrypto.VECTOR_MIN_GROUP:
+            remaining = self.precheck_batch(worker_id, verifier, candidates, token)
+        if self.zipcrypto_headers:
+            # Sorted batches share longer prefixes, so the key cache skips more bytes
+            remaining = sorted(remaining)
+
+        tested = len(batch) - len(remaining)
+        hits = []
+        password = batch[-1] if batch else ''
+        seen = set() if self.legacy_encodings else None  # non-ASCII encodings tried in this batch
+        for password in remaining:
+            if token.cancelled:
+                break
+            solved = self.test_candidate(worker_id, verifier, password, seen)
+            tested += 1
+            if solved:
+                hits.extend((archive_path, password) for archive_path in solved)
+                with self.pending_lock:
+                    all_solved = not self.pending
+                if all_solved:
+                    # Cancel from the worker itself so peers stop without a round trip
+                    token.cancel('found')
+                    break
+        return tested, password, hits
+
+    def precheck_batch(self, worker_id, verifier, batch, token):
+        """Run the ZipCrypto header check over a whole batch as NumPy arrays
+
+        Candidates every pending archive rejects are recorded here in bulk.
+        Returns the rest for the per-candidate path: passwords that passed a
+        header check, and those with too few others of the same length. The
+        token is checked between length groups; once it is cancelled, the
+        groups not checked yet are returned as they are.
+        """
+        started = time.perf_counter()
+        with self.pending_lock:
+            targets = list(self.pending)
+        if not targets or not all(archive_path in self.zipcrypto_headers for archive_path in targets):
+            return batch
+
+        encoded = []
+        remaining = []
+        for password in batch:
+            variants = encoding_variants(password, self.legacy_encodings)
+            if len(variants) == 1:
+                encoded.append(variants[0])
+            else:
+                # Several encodings to try (or none that works): one candidate at a time
+                remaining.append(password)
+                encoded.append(b'')  # length 0 is never vectorized
+        groups, rest = zipcrypto.group_by_length(encoded)
+        if not groups:
+            return batch
+        remaining.extend(batch[index] for index in rest if encoded[index])
+
+        rejected = []
+        for length, indices in groups.items():
+            if token.cancelled:
+                # Left to the per-candidate loop, which stops before testing any of them
+                remaining.extend(batch[index] for index in indices)
+                continue
+            kdf_started = time.perf_counter()
+            keys = zipcrypto.derive_keys_array([encoded[index] for index in indices], length)
+            verifier.add_stage_time('kdf', kdf_started)
+            check_started = time.perf_counter()
+            passed = None
+            for archive_path in targets:
+                archive_passed = zipcrypto.check_headers_array(keys, self.zipcrypto_headers[archive_path])
+                passed = archive_passed if passed is None else passed | archive_passed
+            verifier.add_stage_time('decrypt', check_started)
+            for index, survived in zip(indices, passed.tolist()):
+                if survived:
+                    remaining.append(batch[index])
+                else:
+                    rejected.append(encoded[index])
+
+        # Same accounting as test_candidate, one candidate at a time only when ledgers are open.
+        # Vectorized candidates have a single encoding, so the ledger is keyed by those bytes
+        fast_rejects = len(rejected)
+        ledger_skips = 0
+        ledgers = [self.ledgers[archive_path] for archive_path in targets if archive_path in self.ledgers]
+        if ledgers:
+            fast_rejects = 0
+            for pwd in rejected:
+                skipped = 0
+                for ledger in ledgers:
+                    if pwd in ledger:
+                        skipped += 1
+                    else:
+                        ledger.add(pwd)
+                if skipped == len(targets):
+                    ledger_skips += 1
+                elif not skipped:
+                    fast_rejects += 1
+        self.metrics.record_batch(worker_id, len(rejected), time.perf_counter() - started,
+                                  fast_rejects, ledger_skips)
+        return remaining
+
+    def test_candidate(self, worker_id, verifier, password, seen=None):
+        """Test one candidate against every pending archive; return the archives it solved
+
+        ZIP archives are tried with each byte encoding encoding_variants()
+        returns, RAR archives with the password itself. seen carries the
+        encodings already tried in this batch. The ledger is keyed by what
+        was actually tried, so each ZIP encoding is skipped and recorded on
+        its own: a run with fewer legacy encodings never hides the others.
+        """
+        started = time.perf_counter()
+        with self.pending_lock:
+            targets = list(self.pending)
+
+        # The ZipCrypto key state depends only on the password bytes, so derive it once per encoding
+        variants = encoding_variants(password, self.legacy_encodings, seen)
+        keys = {}
+        if self.zipcrypto_headers:
+            for variant in variants:
+                keys[variant] = verifier.key_cache.derive(variant)
+            verifier.add_stage_time('kdf', started)
+
+        solved = []
+        fast_rejects = 0
+        ledger_skips = 0
+        for archive_path in targets:
+            ledger = self.ledgers.get(archive_path)
+            attempts = [password] if self.archive_ciphers.get(archive_path) == 'rar' else variants
+            if ledger is not None:
+                untried = [attempt for attempt in attempts if attempt not in ledger]
+                if attempts and not untried:
+                    ledger_skips += 1
+                    continue
+                attempts = untried
+
+            headers = self.zipcrypto_headers.get(archive_path)
+            rejected_fast = 0
+            found = False
+            for attempt in attempts:
+                if headers and attempt in keys:
+                    check_started = time.perf_counter()
+                    passed = zipcrypto.check_headers(keys[attempt], headers)
+                    verifier.add_stage_time('decrypt', check_started)
+                    if not passed:
+                        rejected_fast += 1
+                        if ledger is not None:
+                            ledger.add(attempt)
+                        continue
+
+                if verifier.test_password(attempt, archive_path):
+                    found = True
+                    break
+                if verifier.fast_reject:
+                    rejected_fast += 1
+                if ledger is not None and not verifier.inconclusive:
+                    ledger.add(attempt)
+
+            if found:
+                # Only the first worker to solve an archive reports it
+                with self.pending_lock:
+                    if archive_path in self.pending:
+                        self.pending.remove(archive_path)
+                        solved.append(archive_path)
+                continue
+
+            if attempts and rejected_fast == len(attempts):
+                fast_rejects += 1
+
+        all_fast = bool(targets) and fast_rejects == len(targets)
+        all_skipped = bool(targets) and ledger_skips == len(targets)
+        self.metrics.record_result(worker_id, time.perf_counter() - started, all_fast, all_skipped)
+        return solved
+
+    async def run(self, token=None):
+        """Async generator yielding EngineProgress updates, ending with the final result
+
+        Closing the generator early (or cancelling the consuming task)
+        cancels the run and waits for the workers to exit.
+        """
+        token = token or CancellationToken()
+        loop = asyncio.get_running_loop()
+        updates = asyncio.Queue()
+
+        def on_progress(progress):
+            loop.call_soon_threadsafe(updates.put_nowait, progress)
+
+        future = loop.run_in_executor(None, self.run_sync, token, on_progress)
+        future.add_done_callback(lambda _: updates.put_nowait(None))
+        try:
+            while True:
+                progress = await updates.get()
+                if progress is None:
+                    break
+                yield progress
+            yield await future
+        finally:
+            if not future.done():
+                token.cancel('cancelled')
+                await asyncio.shield(future)
+
+
+class BatchEngine(CrackingEngine):
+    """Streams one candidate list against several archives; solved archives drop out"""
+
+    def __init__(self, archive_paths, passwords, worker_count=4, batch_size=CrackingEngine.DEFAULT_BATCH_SIZE,
+                 metrics=None, profiler=None, preload_limit=DEFAULT_PRELOAD_LIMIT, ledger_dir=None, processes=False,
+                 budget=None, coverage=None, candidate_filter=None, legacy_encodings=LEGACY_ENCODINGS):
+        super().__init__(None, passwords, worker_count, batch_size, metrics, profiler, preload_limit, ledger_dir,
+                         processes, budget, coverage, candidate_filter, legacy_encodings)
+        self.archive_paths = list(dict.fromkeys(archive_paths))
+
+
+class ProcessWorkerToken:
+    """Cancellation token of a worker process, backed by the run's shared StopFlag
+
+    Cancelling it sets the flag for every process: a worker that solves
+    the last pending archive stops all its peers directly.
+    """
+
+    def __init__(self, stop_flag):
+        self.stop_flag = stop_flag
+
+    @property
+    def cancelled(self):
+        """True once any process has stopped the run"""
+        return self.stop_flag.is_set()
+
+    @property
+    def reason(self):
+        """Why the run was stopped, or None"""
+        return self.stop_flag.reason
+
+    def cancel(self, reason='cancelled'):
+        """Stop every worker process of the run"""
+        self.stop_flag.set(reason)
+
+
+def run_worker_process(worker_id, config, work_queue, result_queue):
+    """Entry point of a worker process: test the work items the coordinator sends
+
+    Every item is answered with one record, even after cancellation, so
+    the coordinator always gets its slots back.
+    """
+    slot = None
+    ring = None
+    verifier = None
+    engine = None
+    stop_flag = None
+    try:
+        stop_flag = StopFlag(config['stop_flag'])
+        engine = BatchEngine(config['archive_paths'], None, preload_limit=config['preload_limit'])
+        engine.prepare_archives()
+        engine.vectorize = config['vectorize']
+        engine.legacy_encodings = config['legacy_encodings']
+        engine.residual_filter = config['residual_filter']
+        for archive_path, ledger_path in config['ledger_paths'].items():
+            # Lookups only: rejected hashes go back to the coordinator, which writes the file
+            engine.ledgers[archive_path] = PasswordLedger(ledger_path)
+        if config['ring'] is not None:
+            ring_name, slot_count, slot_size = config['ring']
+            ring = CandidateRing(slot_count, slot_size, name=ring_name)
+        if config['wordlist'] is not None:
+            engine.passwords = RangedWordlist(*config['wordlist'])
+        engine.metrics.register_worker(worker_id)
+        verifier = ArchiveVerifier(engine.archive_buffers, engine.metrics)
+        token = ProcessWorkerToken(stop_flag)
+        while True:
+            item = work_queue.get()
+            if item is None:
+                break
+            slot, descriptor, solved_elsewhere, grant = item
+            with engine.pending_lock:
+                engine.pending = [archive_path for archive_path in engine.pending
+                                  if archive_path not in solved_elsewhere]
+
+            cpu_started = time.process_time()
+            tested, password, hits, produced, finished, complete = 0, '', [], 0, 0, False
+            if not token.cancelled:
+                if descriptor is None:
+                    batches = [ring.read(slot)]
+                    produced = len(batches[0])
+                else:
+                    batches, produced = engine.load_batches(descriptor, config['batch_size'], grant)
+                for batch in batches:
+                    if token.cancelled:
+                        break
+                    count, password, batch_hits = engine.test_batch(worker_id, verifier, batch, token)
+                    tested += count
+                    hits.extend(batch_hits)
+                    if count == len(batch):
+                        finished += count
+                complete = tested == produced
+            rejected = {archive_path: ledger.take_pending() for archive_path, ledger in engine.ledgers.items()}
+            counts = engine.metrics.take_counts()
+            counts['cpu'] = time.process_time() - cpu_started
+            result_queue.put(('batch', worker_id, slot, tested, password, hits, counts, rejected, produced,
+                              finished, complete))
+            slot = None
+    except Exception as e:
+        result_queue.put(('error', f"Worker error: {str(e)}", slot))
+    finally:
+        if verifier is not None:
+            verifier.close()
+        if engine is not None:
+            for ledger in engine.ledgers.values():
+                ledger.close(flush=False)
+        if ring is not None:
+            ring.close()
+        if stop_flag is not None:
+            stop_flag.close()
+        result_queue.put(('exit', worker_id))
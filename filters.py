@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Candidate Filters
+Length, character class and regex constraints on the candidates a run
+tests. The engine pushes them into the sources where it can: lists and
+enhanced variations are filtered as they are generated, and a mask's
+charsets are pruned so candidates it cannot match are never produced.
+Whatever the source cannot guarantee is checked per batch before
+verification.
+"""
+
+import re
+
+# Character classes a filter can require or forbid; 'special' is anything that
+# is not an ASCII letter or digit, which includes every ?s mask character
+CHARACTER_CLASSES = {
+    'lower': re.compile('[a-z]'),
+    'upper': re.compile('[A-Z]'),
+    'digit': re.compile('[0-9]'),
+    'special': re.compile('[^A-Za-z0-9]')
+}
+
+
+def parse_classes(text):
+    """Parse a comma-separated list of character class names"""
+    names = [name.strip() for name in text.split(',') if name.strip()]
+    unknown = [name for name in names if name not in CHARACTER_CLASSES]
+    if unknown:
+        raise ValueError(f"Unknown character class {unknown[0]!r}; use {', '.join(CHARACTER_CLASSES)}")
+    return tuple(dict.fromkeys(names))
+
+
+class CandidateFilter:
+    """Constraints every tested candidate must meet
+
+    A candidate passes if its length is within [min_length, max_length],
+    it contains at least one character of every required class, none of
+    any forbidden class, and pattern (if given) is found in it by
+    re.search, so anchor the pattern to match the whole candidate.
+    """
+
+    def __init__(self, min_length=0, max_length=None, require=(), forbid=(), pattern=None):
+        self.min_length = min_length
+        self.max_length = max_length
+        self.require = tuple(require)
+        self.forbid = tuple(forbid)
+        try:
+            self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+        except re.error as e:
+            raise ValueError(f"Invalid candidate pattern {pattern!r}: {e}")
+        if set(self.require) & set(self.forbid):
+            raise ValueError("A character class cannot be both required and forbidden")
+        if max_length is not None and max_length < min_length:
+            raise ValueError("Maximum length is below the minimum length")
+
+        # One search per required class; the forbidden classes share a single search
+        self.required = [CHARACTER_CLASSES[name] for name in self.require]
+        self.forbidden = None
+        if self.forbid:
+            self.forbidden = re.compile('|'.join(CHARACTER_CLASSES[name].pattern for name in self.forbid))
+
+    def __bool__(self):
+        return bool(self.min_length or self.max_length is not None or self.require or self.forbid
+                    or self.pattern is not None)
+
+    def accepts(self, password):
+        """True if a candidate meets every constraint"""
+        length = len(password)
+        if length < self.min_length or (self.max_length is not None and length > self.max_length):
+            return False
+        if self.forbidden is not None and self.forbidden.search(password):
+            return False
+        for required in self.required:
+            if not required.search(password):
+                return False
+        return self.pattern is None or self.pattern.search(password) is not None
+
+    def apply(self, passwords):
+        """Return the candidates that pass, in order"""
+        return list(filter(self.accepts, passwords))
+
+    def restrict_charsets(self, charsets):
+        """Prune the per-position charsets of a mask to what the filter allows
+
+        Returns (charsets, exact): the pruned charsets, all empty if no
+        candidate of the mask can pass, and whether every candidate they
+        produce passes, so no per-batch check is needed.
+        """
+        length = len(charsets)
+        if length < self.min_length or (self.max_length is not None and length > self.max_length):
+            return [''] * length, True
+        if self.forbidden is not None:
+            charsets = [''.join(char for char in charset if not self.forbidden.match(char))
+                        for charset in charsets]
+        if not all(charsets):
+            return [''] * length, True
+
+        exact = self.pattern is None
+        for required in self.required:
+            if not any(required.search(charset) for charset in charsets):
+                return [''] * length, True
+            # Guaranteed only if some position draws from this class alone
+            if not any(all(required.match(char) for char in charset) for charset in charsets):
+                exact = False
+        return charsets, exact
+
+    def to_dict(self):
+        """Plain dict of the constraints"""
+        return {
+            'min_length': self.min_length,
+            'max_length': self.max_length,
+            'require': list(self.require),
+            'forbid': list(self.forbid),
+            'pattern': self.pattern.pattern if self.pattern is not None else None
+        }
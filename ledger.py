@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Tried-Password Ledger
+Remembers which candidates were already rejected for an archive so later
+runs with another list or other rules can skip them. Each archive has one
+file of sorted 64-bit candidate hashes, named after its fingerprint and
+memory-mapped for binary search.
+"""
+
+import array
+import bisect
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import threading
+
+from archive import archive_fingerprint
+
+DEFAULT_LEDGER_DIR = os.path.join(os.path.expanduser('~'), '.zirar', 'ledger')
+
+# File layout: magic, entry count, then the sorted hashes (native byte order)
+LEDGER_MAGIC = b'ZRLEDG01'
+LEDGER_HEADER_FORMAT = '=8sQ'
+LEDGER_HEADER_SIZE = struct.calcsize(LEDGER_HEADER_FORMAT)
+
+# Hashes collected in memory before they are merged into the file
+FLUSH_THRESHOLD = 1 << 22
+
+# Hashes written per block when merging
+WRITE_BLOCK = 1 << 16
+
+
+def candidate_hash(password):
+    """Return the 64-bit ledger hash of a candidate password
+
+    A str is hashed as its UTF-8 bytes, so a ZIP password tried in another
+    encoding is recorded by the bytes that were actually tested.
+    """
+    if not isinstance(password, bytes):
+        password = password.encode('utf-8', 'surrogatepass')
+    digest = hashlib.blake2b(password, digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class PasswordLedger:
+    """On-disk set of candidates already rejected for one archive
+
+    Lookups binary-search the mapped file without locking; new hashes are
+    buffered and merged into a fresh file on flush(), which replaces the
+    old one atomically. At 64 bits per hash a false match (a skipped
+    candidate that was never tested) stays below one in a billion until
+    the ledger holds billions of entries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = array.array('Q')
+        self._mapped = None  # (mmap, view) of the ledger file
+        self._hashes = memoryview(array.array('Q'))
+        self._retired = []  # earlier mappings that concurrent lookups may still hold
+        self._load()
+
+    @classmethod
+    def for_archive(cls, archive_path, ledger_dir=DEFAULT_LEDGER_DIR):
+        """Open the ledger belonging to an archive's current contents"""
+        os.makedirs(ledger_dir, exist_ok=True)
+        return cls(os.path.join(ledger_dir, f"{archive_fingerprint(archive_path)}.ledger"))
+
+    def _load(self):
+        """Map the ledger file, if there is one"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            header = f.read(LEDGER_HEADER_SIZE)
+            if len(header) < LEDGER_HEADER_SIZE:
+                raise ValueError(f"Truncated ledger file: {self.path}")
+            magic, count = struct.unpack(LEDGER_HEADER_FORMAT, header)
+            if magic != LEDGER_MAGIC:
+                raise ValueError(f"Not a ZiRar ledger file: {self.path}")
+            if count == 0:
+                return
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(mapped)
+        hashes = view[LEDGER_HEADER_SIZE:LEDGER_HEADER_SIZE + count * 8].cast('Q')
+        if self._mapped is not None:
+            self._retired.append((self._mapped, self._hashes))
+        self._mapped = (mapped, view)
+        self._hashes = hashes
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, password):
+        hashes = self._hashes
+        value = candidate_hash(password)
+        index = bisect.bisect_left(hashes, value)
+        return index < len(hashes) and hashes[index] == value
+
+    def add(self, password):
+        """Record a rejected candidate; merged into the file on the next flush"""
+        with self._lock:
+            self._pending.append(candidate_hash(password))
+            full = len(self._pending) >= FLUSH_THRESHOLD
+        if full:
+            self.flush()
+
+    def take_pending(self):
+        """Return and clear the hashes buffered since the last flush"""
+        with self._lock:
+            pending, self._pending = self._pending, array.array('Q')
+        return pending
+
+    def add_hashes(self, hashes):
+        """Record candidate hashes gathered elsewhere, such as by take_pending() in a worker process"""
+        with self._lock:
+            self._pending.extend(hashes)
+            full = len(self._pending) >= FLUSH_THRESHOLD
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Merge the buffered hashes into the ledger file"""
+        with self._lock:
+            pending, self._pending = self._pending, array.array('Q')
+            if not pending:
+                return
+            pending = sorted(set(pending))
+
+            # Merge with the file as it is on disk now, in case another run updated it
+            current = PasswordLedger(self.path) if os.path.exists(self.path) else None
+            existing = current._hashes if current is not None else ()
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            count = 0
+            try:
+                with open(temp_path, 'wb') as f:
+                    f.write(struct.pack(LEDGER_HEADER_FORMAT, LEDGER_MAGIC, 0))
+                    block = array.array('Q')
+                    last = None
+                    for value in heapq.merge(existing, pending):
+                        if value == last:
+                            continue
+                        block.append(value)
+                        last = value
+                        if len(block) >= WRITE_BLOCK:
+                            block.tofile(f)
+                            count += len(block)
+                            block = array.array('Q')
+                    block.tofile(f)
+                    count += len(block)
+                    f.seek(0)
+                    f.write(struct.pack(LEDGER_HEADER_FORMAT, LEDGER_MAGIC, count))
+            finally:
+                if current is not None:
+                    current.close()
+            os.replace(temp_path, self.path)
+            self._load()
+
+    def close(self, flush=True):
+        """Flush buffered hashes (unless flush is False) and release the file mapping"""
+        if flush:
+            self.flush()
+        retired = self._retired + [(self._mapped, self._hashes)]
+        self._retired = []
+        self._mapped = None
+        self._hashes = memoryview(array.array('Q'))
+        for mapping, hashes in retired:
+            hashes.release()
+            if mapping is not None:
+                mapped, view = mapping
+                view.release()
+                mapped.close()
@@ -6,13 +6,24 @@ A secure PySide6 desktop application for testing passwords against password-prot
 
 import sys
 import os
-import zipfile
 import rarfile
-import threading
-import queue
+import json
+import argparse
+import codecs
 import multiprocessing
+import time
 from pathlib import Path
 
+from metrics import RunMetrics, MetricsServer
+from profiling import RunProfiler
+from archive import DEFAULT_PRELOAD_LIMIT, load_archive_buffer
+from ledger import DEFAULT_LEDGER_DIR
+from checkpoint import KeyspaceCoverage, RunBudget, keyspace_identity
+from filters import CHARACTER_CLASSES, CandidateFilter, parse_classes
+from report import DEFAULT_REPORT_DIR, RateTimeline, build_run_report, write_report
+from distributed import (LeaseCoordinator, run_node, DEFAULT_PORT, DEFAULT_CHUNK_SIZE, DEFAULT_LEASE_TIMEOUT,
+                         DEFAULT_HEARTBEAT_INTERVAL)
+
 # Configure rarfile to look for UnRAR in common locations
 def setup_rarfile():
     """Setup rarfile with common UnRAR executable paths"""
@@ -45,16 +56,16 @@ RAR_AVAILABLE = setup_rarfile()
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget,
     QLabel, QPushButton, QProgressBar, QFileDialog, QTextEdit,
-    QCheckBox, QGroupBox, QMessageBox, QFrame, QSpinBox
+    QCheckBox, QGroupBox, QMessageBox, QSpinBox, QDialog
 )
-from PySide6.QtCore import Qt, QThread, Signal, QTimer
+from PySide6.QtCore import Qt, QThread, Signal, QTimer, QCoreApplication
 from PySide6.QtGui import QFont, QIcon
 
-try:
-    import pyzipper
-    PYZIPPER_AVAILABLE = True
-except ImportError:
-    PYZIPPER_AVAILABLE = False
+from engine import (PasswordEnhancer, CancellationToken, CrackingEngine, BatchEngine, COMPILE_SORT_ORDERS,
+                    LEGACY_ENCODINGS, compile_wordlist, load_candidate_sources, load_password_list)
+from sources import is_source_spec, parse_source_spec
+from wordlist import (WORDLIST_EXTENSION, COMPRESSED_EXTENSIONS, CountCancelled, compression_format,
+                      get_password_count, is_compiled_wordlist)
 
 
 class ResourceDetector:
@@ -99,306 +110,220 @@ class ResourceDetector:
         }
 
 
-class PasswordEnhancer:
-    """Enhances password lists by generating variations with common substitutions"""
-
-    # Common character substitutions used in passwords
-    SUBSTITUTIONS = {
-        'a': ['@', '4'],
-        'e': ['3'],
-        'i': ['1', '!'],
-        'o': ['0'],
-        's': ['$', '5'],
-        't': ['7'],
-        'l': ['1'],
-        'g': ['9'],
-        'b': ['6'],
-        'A': ['@', '4'],
-        'E': ['3'],
-        'I': ['1', '!'],
-        'O': ['0'],
-        'S': ['$', '5'],
-        'T': ['7'],
-        'L': ['1'],
-        'G': ['9'],
-        'B': ['6']
-    }
-
-    @staticmethod
-    def generate_variations(password, max_variations=10):
-        """Generate password variations using character substitutions"""
-        variations = set()
-        variations.add(password)  # Include original
-
-        # Single character substitutions
-        for i, char in enumerate(password):
-            if char in PasswordEnhancer.SUBSTITUTIONS:
-                for replacement in PasswordEnhancer.SUBSTITUTIONS[char]:
-                    new_password = password[:i] + replacement + password[i+1:]
-                    variations.add(new_password)
-                    if len(variations) >= max_variations:
-                        break
-                if len(variations) >= max_variations:
-                    break
-
-        # Common endings (years, numbers)
-        base_variations = list(variations)
-        for base_pwd in base_variations[:5]:  # Limit to avoid explosion
-            for suffix in ['123', '!', '1', '12', '2023', '2024', '01']:
-                variations.add(base_pwd + suffix)
-                if len(variations) >= max_variations:
-                    break
-            if len(variations) >= max_variations:
-                break
-
-        # Capitalize first letter variations
-        for base_pwd in list(variations)[:5]:
-            if base_pwd and base_pwd[0].islower():
-                variations.add(base_pwd.capitalize())
-            if len(variations) >= max_variations:
-                break
-
-        return list(variations)[:max_variations]
-
-    @staticmethod
-    def enhance_password_list(passwords, enhancement_factor=3):
-        """Enhance a list of passwords with variations added to the end"""
-        # Start with all original passwords
-        enhanced_passwords = list(passwords)
-
-        # Collect all variations
-        all_variations = []
-        for password in passwords:
-            variations = PasswordEnhancer.generate_variations(password, enhancement_factor)
-            for variation in variations:
-                if variation != password:  # Don't duplicate original
-                    all_variations.append(variation)
-
-        # Add variations to the end, removing duplicates
-        seen = set(enhanced_passwords)  # Track originals
-        for variation in all_variations:
-            if variation not in seen:
-                seen.add(variation)
-                enhanced_passwords.append(variation)
-
-        return enhanced_passwords
-
-
-class PasswordTestWorker(QThread):
-    """Individual worker thread for testing passwords"""
+class PasswordCrackingWorker(QThread):
+    """Main coordinator thread for multi-threaded password cracking"""
 
+    # Signals for communication with main thread
+    progress_updated = Signal(int, int, str)  # current, total, current_password
     password_found = Signal(str)  # successful password
+    finished_unsuccessfully = Signal()  # no password found
     error_occurred = Signal(str)  # error message
 
-    def __init__(self, archive_path, password_queue, result_queue):
+    def __init__(self, archive_path, password_list_path, enhance_passwords=True, worker_count=4, profiler=None,
+                 preload_limit=DEFAULT_PRELOAD_LIMIT, ledger_dir=None, processes=False, sources=None, budget=None,
+                 coverage=None, candidate_filter=None, legacy_encodings=LEGACY_ENCODINGS, report_dir=None,
+                 report_path=None, redact_report=False):
         super().__init__()
         self.archive_path = archive_path
-        self.password_queue = password_queue
-        self.result_queue = result_queue
+        self.archive_paths = [archive_path]
+        self.preload_limit = preload_limit
+        self.ledger_dir = ledger_dir
+        self.processes = processes
+        self.sources = sources  # source specs interleaved by priority instead of the single password list
+        self.budget = budget
+        self.coverage = coverage  # KeyspaceCoverage to resume from and extend
+        self.candidate_filter = candidate_filter  # CandidateFilter every tested candidate must pass
+        self.legacy_encodings = legacy_encodings  # tried on ZIP archives after UTF-8
+        self.result = None  # final EngineProgress, once the run is over
+        self.password_list_path = password_list_path
+        self.enhance_passwords = enhance_passwords
+        self.worker_count = worker_count
+        self.profiler = profiler
         self.should_stop = False
+        self.metrics = RunMetrics()
+        self.token = CancellationToken()
+        self.engine = None
+        self.current_password = ''  # latest candidate reported, read by the GUI's progress timer
+        self.report_dir = report_dir  # directory for the JSON run report; None writes none
+        self.report_path = report_path  # explicit report file, overriding report_dir
+        self.redact_report = redact_report  # leave found passwords out of the report
+        self.report_file = None  # where the report was written, once the run is over
+        self.errors = []  # every error reported during the run
+        self.started = time.time()
+        self.timeline = RateTimeline()
 
     def run(self):
-        """Main worker execution"""
-        archive_ext = Path(self.archive_path).suffix.lower()
+        """Main coordinator thread execution"""
+        self.started = time.time()
+        self.timeline = RateTimeline()
+        if self.profiler:
+            self.profiler.run("coordinator", self.coordinate)
+        else:
+            self.coordinate()
+        if self.report_dir is not None or self.report_path is not None:
+            self.save_report()
 
-        while not self.should_stop:
-            try:
-                # Get password from queue (timeout to check should_stop)
-                try:
-                    password = self.password_queue.get(timeout=0.1)
-                except queue.Empty:
-                    continue
+    def report_error(self, message):
+        """Send an error to the GUI thread and keep it for the run report"""
+        self.errors.append(message)
+        self.error_occurred.emit(message)
 
-                # Test the password
-                success = False
-                try:
-                    if archive_ext == '.zip':
-                        success = self.test_zip_password(password)
-                    elif archive_ext == '.rar':
-                        success = self.test_rar_password(password)
-                except Exception:
-                    # Continue with next password on error
-                    pass
-
-                # Report result
-                self.result_queue.put((password, success))
-                self.password_queue.task_done()
-
-                if success:
-                    break
-
-            except Exception as e:
-                self.error_occurred.emit(f"Worker error: {str(e)}")
-                break
+    def report_settings(self):
+        """The options of this run, as recorded in its report"""
+        return {
+            'wordlist': self.password_list_path,
+            'sources': self.sources,
+            'enhance': self.enhance_passwords,
+            'workers': self.worker_count,
+            'processes': self.processes,
+            'ledger': self.ledger_dir is not None,
+            'vectorized': self.engine.vectorize if self.engine is not None else False,
+            'budget': self.budget.to_dict() if self.budget else None,
+            'filter': self.candidate_filter.to_dict() if self.candidate_filter else None,
+            'legacy_encodings': list(self.legacy_encodings)
+        }
 
-    def test_zip_password(self, password):
-        """Test password against ZIP file"""
+    def save_report(self):
+        """Write the JSON report of the finished run"""
+        self.timeline.sample(self.result.tested if self.result is not None else self.metrics.tested, force=True)
         try:
-            if PYZIPPER_AVAILABLE:
-                try:
-                    with pyzipper.AESZipFile(self.archive_path, 'r') as zip_file:
-                        zip_file.setpassword(password.encode('utf-8'))
-                        zip_file.testzip()
-                        return True
-                except (pyzipper.BadZipFile, pyzipper.LargeZipFile, RuntimeError):
-                    return False
+            report = build_run_report(self.archive_paths, self.result, self.metrics, self.timeline, self.engine,
+                                      self.started, self.report_settings(),
+                                      self.errors[0] if self.errors else None, self.redact_report)
+            if self.report_path is not None:
+                self.report_file = write_report(report, self.report_path)
             else:
-                with zipfile.ZipFile(self.archive_path, 'r') as zip_file:
-                    zip_file.setpassword(password.encode('utf-8'))
-                    result = zip_file.testzip()
-                    return result is None
-        except (RuntimeError, zipfile.BadZipFile, zipfile.LargeZipFile, UnicodeEncodeError):
-            return False
-        except Exception:
-            return False
+                self.report_file = write_report(report, report_dir=self.report_dir)
+        except (OSError, TypeError, ValueError) as e:
+            self.error_occurred.emit(f"Could not write run report: {str(e)}")
 
-    def test_rar_password(self, password):
-        """Test password against RAR file"""
+    def coordinate(self):
+        """Load passwords and run them through the Qt-free engine"""
         try:
-            with rarfile.RarFile(self.archive_path, 'r') as rar_file:
-                try:
-                    rar_file.setpassword(password)
-                except:
-                    rar_file.setpassword(password.encode('utf-8'))
+            # Load passwords
+            passwords = self.load_passwords()
+            if not passwords:
+                self.report_error("No passwords found in the password list file.")
+                return
 
-                names = rar_file.namelist()
-                if not names:
-                    return False
+            self.engine = CrackingEngine(self.archive_path, passwords, self.worker_count, metrics=self.metrics,
+                                         profiler=self.profiler, preload_limit=self.preload_limit,
+                                         ledger_dir=self.ledger_dir, processes=self.processes, budget=self.budget,
+                                         coverage=self.coverage, candidate_filter=self.candidate_filter,
+                                         legacy_encodings=self.legacy_encodings)
+            result = self.engine.run_sync(self.token, self.report_progress)
+            self.result = result
+
+            if result.password is not None:
+                self.password_found.emit(result.password)
+            elif result.error:
+                self.report_error(result.error)
+            elif self.engine.errors:
+                self.report_error(self.engine.errors[0])
+            elif result.stop_reason == 'exhausted':
+                self.finished_unsuccessfully.emit()
 
-                try:
-                    with rar_file.open(names[0]) as f:
-                        f.read(1)
-                    return True
-                except:
-                    return False
+        except Exception as e:
+            self.token.cancel('error')
+            self.report_error(f"Unexpected error: {str(e)}")
 
-        except (rarfile.RarWrongPassword, rarfile.BadRarFile):
-            return False
-        except Exception:
-            return False
+    def report_progress(self, progress):
+        """Forward engine progress to the GUI thread"""
+        self.current_password = progress.current_password
+        self.timeline.sample(progress.tested)
+        self.progress_updated.emit(progress.tested, progress.total, progress.current_password)
+
+    def load_passwords(self):
+        """Load passwords from the password list file"""
+        try:
+            if self.sources:
+                return load_candidate_sources(self.sources, self.enhance_passwords, self.metrics)
+            # Worker threads or processes read and enhance their own ranges of a text list
+            return load_password_list(self.password_list_path, self.enhance_passwords, self.metrics, ranged=True)
+        except Exception as e:
+            self.report_error(f"Could not load password list: {str(e)}")
+            return []
 
     def stop(self):
-        """Signal the worker to stop"""
+        """Signal the coordinator and all workers to stop"""
         self.should_stop = True
+        self.token.cancel('stopped')
 
 
-class PasswordCrackingWorker(QThread):
-    """Main coordinator thread for multi-threaded password cracking"""
+class BatchCrackingWorker(PasswordCrackingWorker):
+    """Coordinator that streams one password list against several archives"""
 
-    # Signals for communication with main thread
-    progress_updated = Signal(int, int, str)  # current, total, current_password
-    password_found = Signal(str)  # successful password
-    finished_unsuccessfully = Signal()  # no password found
-    error_occurred = Signal(str)  # error message
+    archive_solved = Signal(str, str)  # archive path, password
+    batch_finished = Signal(list)  # archives left unsolved
 
-    def __init__(self, archive_path, password_list_path, enhance_passwords=True, worker_count=4):
-        super().__init__()
-        self.archive_path = archive_path
-        self.password_list_path = password_list_path
-        self.enhance_passwords = enhance_passwords
-        self.worker_count = worker_count
-        self.should_stop = False
-        self.workers = []
-        self.password_queue = queue.Queue()
-        self.result_queue = queue.Queue()
+    def __init__(self, archive_paths, password_list_path, enhance_passwords=True, worker_count=4, profiler=None,
+                 preload_limit=DEFAULT_PRELOAD_LIMIT, ledger_dir=None, processes=False, sources=None, budget=None,
+                 coverage=None, candidate_filter=None, legacy_encodings=LEGACY_ENCODINGS, report_dir=None,
+                 report_path=None, redact_report=False):
+        super().__init__(None, password_list_path, enhance_passwords, worker_count, profiler, preload_limit,
+                         ledger_dir, processes, sources, budget, coverage, candidate_filter, legacy_encodings,
+                         report_dir, report_path, redact_report)
+        self.archive_paths = list(archive_paths)
 
-    def run(self):
-        """Main coordinator thread execution"""
+    def coordinate(self):
+        """Load passwords once and test them against every archive in the engine"""
         try:
-            # Load passwords
             passwords = self.load_passwords()
             if not passwords:
-                self.error_occurred.emit("No passwords found in the password list file.")
+                self.report_error("No passwords found in the password list file.")
+                self.batch_finished.emit(list(dict.fromkeys(self.archive_paths)))
                 return
 
-            total_passwords = len(passwords)
-
-            # Fill password queue
-            for password in passwords:
-                self.password_queue.put(password)
+            self.engine = BatchEngine(self.archive_paths, passwords, self.worker_count, metrics=self.metrics,
+                                      profiler=self.profiler, preload_limit=self.preload_limit,
+                                      ledger_dir=self.ledger_dir, processes=self.processes, budget=self.budget,
+                                      coverage=self.coverage, candidate_filter=self.candidate_filter,
+                                      legacy_encodings=self.legacy_encodings)
+            result = self.engine.run_sync(self.token, self.report_progress)
+            self.result = result
 
-            # Start worker threads
-            for i in range(self.worker_count):
-                worker = PasswordTestWorker(self.archive_path, self.password_queue, self.result_queue)
-                worker.error_occurred.connect(self.error_occurred.emit)
-                self.workers.append(worker)
-                worker.start()
-
-            # Monitor progress and results
-            tested_count = 0
-            current_password = ""
-
-            while tested_count < total_passwords and not self.should_stop:
-                try:
-                    # Check for results (timeout to update progress)
-                    password, success = self.result_queue.get(timeout=0.1)
-                    tested_count += 1
-                    current_password = password
-
-                    # Update progress
-                    self.progress_updated.emit(tested_count, total_passwords, current_password)
-
-                    if success:
-                        # Password found! Stop all workers
-                        self.stop_workers()
-                        self.password_found.emit(password)
-                        return
-
-                except queue.Empty:
-                    # Update progress even if no new results
-                    if current_password:
-                        self.progress_updated.emit(tested_count, total_passwords, current_password)
-                    continue
-
-            # Stop all workers
-            self.stop_workers()
-
-            # If we get here, no password worked
-            if not self.should_stop:
-                self.finished_unsuccessfully.emit()
+            for error in self.engine.errors:
+                self.report_error(error)
+            if result.error:
+                self.report_error(result.error)
+            self.batch_finished.emit(result.unsolved)
 
         except Exception as e:
-            self.stop_workers()
-            self.error_occurred.emit(f"Unexpected error: {str(e)}")
-
-    def stop_workers(self):
-        """Stop all worker threads"""
-        for worker in self.workers:
-            worker.stop()
+            self.token.cancel('error')
+            self.report_error(f"Unexpected error: {str(e)}")
 
-        # Wait for workers to finish
-        for worker in self.workers:
-            worker.wait(1000)  # Wait up to 1 second
-            if worker.isRunning():
-                worker.terminate()
-                worker.wait()
+    def report_progress(self, progress):
+        """Forward engine progress and newly solved archives to the GUI thread"""
+        super().report_progress(progress)
+        for archive_path, password in progress.hits:
+            self.archive_solved.emit(archive_path, password)
 
-        self.workers.clear()
 
-    def load_passwords(self):
-        """Load passwords from the password list file"""
-        try:
-            with open(self.password_list_path, 'r', encoding='utf-8', errors='ignore') as f:
-                original_passwords = [line.strip() for line in f if line.strip()]
+class PasswordCountWorker(QThread):
+    """Background thread that counts the passwords in a wordlist"""
 
-            if not original_passwords:
-                return []
+    counted = Signal(str, int)  # password list path, password count
+    count_failed = Signal(str, str)  # password list path, error message
 
-            # Enhance passwords if enabled
-            if self.enhance_passwords:
-                enhanced_passwords = PasswordEnhancer.enhance_password_list(original_passwords)
-                return enhanced_passwords
-            else:
-                return original_passwords
+    def __init__(self, password_list_path):
+        super().__init__()
+        self.password_list_path = password_list_path
+        self.token = CancellationToken()
 
+    def run(self):
+        """Count (or fetch the cached count) without blocking the GUI thread"""
+        try:
+            count = get_password_count(self.password_list_path, self.token)
+        except CountCancelled:
+            return
         except Exception as e:
-            self.error_occurred.emit(f"Could not load password list: {str(e)}")
-            return []
+            self.count_failed.emit(self.password_list_path, str(e))
+            return
+        self.counted.emit(self.password_list_path, count)
 
     def stop(self):
-        """Signal the coordinator and all workers to stop"""
-        self.should_stop = True
-        self.stop_workers()
+        """Abandon the count at the next chunk"""
+        self.token.cancel('stopped')
 
 
 class ThemeManager:
@@ -440,9 +365,30 @@ class ThemeManager:
         'warning_bg': '#fff3cd'
     }
 
+    # Generated stylesheets by theme name; a theme's stylesheet never changes once built
+    _stylesheets = {}
+
+    @staticmethod
+    def get_theme_colors(theme_name):
+        """Return the colors of a theme by name"""
+        return ThemeManager.DARK_THEME if theme_name == 'dark' else ThemeManager.LIGHT_THEME
+
+    @staticmethod
+    def stylesheet_for(theme_name):
+        """Return the stylesheet of a theme, building it on first use"""
+        stylesheet = ThemeManager._stylesheets.get(theme_name)
+        if stylesheet is None:
+            stylesheet = ThemeManager.get_stylesheet(ThemeManager.get_theme_colors(theme_name))
+            ThemeManager._stylesheets[theme_name] = stylesheet
+        return stylesheet
+
     @staticmethod
     def get_stylesheet(theme_colors):
-        """Generate stylesheet for the given theme colors"""
+        """Generate stylesheet for the given theme colors
+
+        State-dependent widgets are styled here through object names and
+        dynamic properties, so a state change only repolishes that widget.
+        """
         return f"""
             QMainWindow {{
                 background-color: {theme_colors['background']};
@@ -556,17 +502,142 @@ class ThemeManager:
                 color: {theme_colors['secondary_text']};
                 border-top: 1px solid {theme_colors['surface_variant']};
             }}
+            QLabel#fileLabel {{
+                color: {theme_colors['secondary_text']};
+                font-style: italic;
+            }}
+            QLabel#fileLabel[selected="true"] {{
+                color: {theme_colors['primary_text']};
+                font-style: normal;
+                font-weight: 500;
+            }}
+            QPushButton#startButton, QPushButton#stopButton {{
+                color: white;
+                font-weight: bold;
+                padding: 10px;
+                border-radius: 6px;
+                min-width: 100px;
+            }}
+            QPushButton#startButton {{
+                background-color: {theme_colors['accent_green']};
+                border: 1px solid {theme_colors['accent_green']};
+            }}
+            QPushButton#startButton[running="true"] {{
+                background-color: {theme_colors['accent_orange']};
+                border: 1px solid {theme_colors['accent_orange']};
+            }}
+            QPushButton#stopButton {{
+                background-color: {theme_colors['error']};
+                border: 1px solid {theme_colors['error']};
+            }}
+            QLabel#currentPasswordLabel {{
+                font-family: monospace;
+                padding: 8px;
+                background-color: {theme_colors['surface']};
+                border: 1px solid {theme_colors['surface_variant']};
+                border-radius: 4px;
+                color: {theme_colors['primary_text']};
+            }}
+            QLabel#resultLabel {{
+                font-weight: bold;
+                padding: 12px;
+                color: {theme_colors['primary_text']};
+            }}
+            QLabel#resultLabel[state="found"] {{
+                color: {theme_colors['success']};
+                background-color: {theme_colors['success_bg']};
+                border: 1px solid {theme_colors['success']};
+                border-radius: 6px;
+            }}
+            QLabel#resultLabel[state="not_found"] {{
+                color: {theme_colors['error']};
+                background-color: {theme_colors['error_bg']};
+                border: 1px solid {theme_colors['error']};
+                border-radius: 6px;
+            }}
+            QLabel#resultLabel[state="error"] {{
+                color: {theme_colors['warning']};
+                background-color: {theme_colors['warning_bg']};
+                border: 1px solid {theme_colors['warning']};
+                border-radius: 6px;
+            }}
         """
 
 
+class MetricsDialog(QDialog):
+    """Live view of the engine metrics for the current or last run"""
+
+    def __init__(self, metrics_provider, parent=None):
+        super().__init__(parent)
+        self.metrics_provider = metrics_provider
+        self.setWindowTitle("Engine Metrics")
+        self.resize(420, 460)
+
+        layout = QVBoxLayout(self)
+        self.metrics_text = QTextEdit()
+        self.metrics_text.setReadOnly(True)
+        self.metrics_text.setStyleSheet("font-family: monospace;")
+        layout.addWidget(self.metrics_text)
+
+        # Refresh on a timer so the view never sits on the engine's hot path
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(1000)
+        self.refresh()
+
+    def refresh(self):
+        """Pull a fresh snapshot and render it"""
+        metrics = self.metrics_provider()
+        if metrics is None:
+            self.metrics_text.setPlainText("No run has been started yet.")
+            return
+
+        snapshot = metrics.snapshot()
+        lines = [
+            f"Tested:            {snapshot['tested']:,} / {snapshot['total']:,}",
+            f"Rate (instant):    {snapshot['rate_instant']:,.1f} /s",
+            f"Rate (EWMA):       {snapshot['rate_ewma']:,.1f} /s",
+            f"Rate (average):    {snapshot['rate_average']:,.1f} /s",
+            f"Fast rejects:      {snapshot['fast_rejects']:,} ({snapshot['fast_reject_ratio']:.1%})",
+            f"Already tried:     {snapshot['ledger_skips']:,}",
+            f"Filtered:          {snapshot['filtered']:,}",
+            f"Queue depth:       {snapshot['queue_depth']:,}",
+            f"Elapsed:           {snapshot['elapsed']:.1f} s",
+            "",
+            "Stage time (s):"
+        ]
+        for stage, seconds in snapshot['stages'].items():
+            lines.append(f"  {stage:<16} {seconds:.3f}")
+        lines.append("")
+        lines.append("Workers:")
+        for worker_id, worker in snapshot['workers'].items():
+            lines.append(f"  #{worker_id:<3} tested {worker['tested']:>8,}  utilization {worker['utilization']:.0%}")
+
+        self.metrics_text.setPlainText("\n".join(lines))
+
+
 class MainWindow(QMainWindow):
+    # How often the progress display pulls a metrics snapshot while a run is active
+    PROGRESS_REFRESH_MS = 250
+
     def __init__(self):
         super().__init__()
         self.archive_path = None
         self.password_list_path = None
+        self.password_count = None  # non-blank lines in the password list, once counted
+        self.count_workers = []
         self.worker_thread = None
+        self.run_metrics = None  # metrics of the current or last run
+        self.stop_requested = False
+        self.metrics_dialog = None
         self.is_cracking = False
         self.current_theme = 'light'  # Default to light theme
+        self.rendered_progress = None  # (percent, progress text, rate text, attempt text) on screen
+
+        # The progress display is refreshed from the metrics on a timer instead of per
+        # engine signal, so the GUI thread stays idle however fast candidates are tested
+        self.progress_timer = QTimer(self)
+        self.progress_timer.timeout.connect(self.refresh_progress)
 
         self.setWindowTitle("ZiRar - Archive Password Cracker")
         self.setMinimumSize(650, 700)  # Increased minimum height to ensure all content is visible
@@ -638,18 +709,22 @@ class MainWindow(QMainWindow):
         self.light_theme_action = light_action
         self.dark_theme_action = dark_action
 
-    def apply_theme(self):
-        """Apply the current theme"""
-        if self.current_theme == 'dark':
-            theme_colors = ThemeManager.DARK_THEME
-        else:
-            theme_colors = ThemeManager.LIGHT_THEME
+        # Engine metrics viewer
+        view_menu.addSeparator()
+        metrics_action = view_menu.addAction('Engine Metrics...')
+        metrics_action.triggered.connect(self.show_metrics_dialog)
 
-        stylesheet = ThemeManager.get_stylesheet(theme_colors)
-        self.setStyleSheet(stylesheet)
+    def show_metrics_dialog(self):
+        """Open the live engine metrics viewer"""
+        if self.metrics_dialog is None:
+            self.metrics_dialog = MetricsDialog(lambda: self.run_metrics, self)
+        self.metrics_dialog.show()
+        self.metrics_dialog.raise_()
 
-        # Update specific elements that need theme-aware colors
-        self.update_themed_elements(theme_colors)
+    def apply_theme(self):
+        """Apply the current theme"""
+        # Built once per theme; state styling lives in it, so this only runs on a theme switch
+        self.setStyleSheet(ThemeManager.stylesheet_for(self.current_theme))
 
     def switch_theme(self, theme_name):
         """Switch to the specified theme"""
@@ -665,89 +740,20 @@ class MainWindow(QMainWindow):
         # Apply the new theme
         self.apply_theme()
 
-    def update_themed_elements(self, theme_colors):
-        """Update elements that need specific theme colors"""
-        # Update file selection labels
-        if hasattr(self, 'archive_label'):
-            if self.archive_path:
-                self.archive_label.setStyleSheet(f"color: {theme_colors['primary_text']}; font-style: normal; font-weight: 500;")
-            else:
-                self.archive_label.setStyleSheet(f"color: {theme_colors['secondary_text']}; font-style: italic;")
+    def update_state_styles(self):
+        """Point the state properties of the file labels and start button at the current state"""
+        self.set_style_state(self.archive_label, 'selected', bool(self.archive_path))
+        self.set_style_state(self.password_label, 'selected', bool(self.password_list_path))
+        self.set_style_state(self.start_btn, 'running', self.is_cracking)
 
-        if hasattr(self, 'password_label'):
-            if self.password_list_path:
-                self.password_label.setStyleSheet(f"color: {theme_colors['primary_text']}; font-style: normal; font-weight: 500;")
-            else:
-                self.password_label.setStyleSheet(f"color: {theme_colors['secondary_text']}; font-style: italic;")
-
-        # Update action buttons with higher specificity
-        if hasattr(self, 'start_btn'):
-            if self.is_cracking:
-                self.start_btn.setStyleSheet(f"""
-                    QPushButton {{
-                        background-color: {theme_colors['accent_orange']} !important;
-                        color: white !important;
-                        font-weight: bold;
-                        padding: 10px;
-                        border: 1px solid {theme_colors['accent_orange']};
-                        border-radius: 6px;
-                        min-width: 100px;
-                    }}
-                    QPushButton:hover {{
-                        background-color: {theme_colors['accent_orange']};
-                        opacity: 0.8;
-                    }}
-                """)
-            else:
-                self.start_btn.setStyleSheet(f"""
-                    QPushButton {{
-                        background-color: {theme_colors['accent_green']} !important;
-                        color: white !important;
-                        font-weight: bold;
-                        padding: 10px;
-                        border: 1px solid {theme_colors['accent_green']};
-                        border-radius: 6px;
-                        min-width: 100px;
-                    }}
-                    QPushButton:hover {{
-                        background-color: {theme_colors['accent_green']};
-                        opacity: 0.8;
-                    }}
-                """)
-
-        if hasattr(self, 'stop_btn'):
-            self.stop_btn.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {theme_colors['error']} !important;
-                    color: white !important;
-                    font-weight: bold;
-                    padding: 10px;
-                    border: 1px solid {theme_colors['error']};
-                    border-radius: 6px;
-                    min-width: 100px;
-                }}
-                QPushButton:hover {{
-                    background-color: {theme_colors['error']};
-                    opacity: 0.8;
-                }}
-            """)
-
-        # Update current password display
-        if hasattr(self, 'current_password_label'):
-            self.current_password_label.setStyleSheet(f"font-family: monospace; padding: 8px; background-color: {theme_colors['surface']}; border: 1px solid {theme_colors['surface_variant']}; border-radius: 4px; color: {theme_colors['primary_text']};")
-
-        # Update result label
-        if hasattr(self, 'result_label'):
-            current_text = self.result_label.text()
-            if current_text and "✔ Password found:" in current_text:
-                self.result_label.setStyleSheet(f"font-weight: bold; padding: 12px; color: {theme_colors['success']}; background-color: {theme_colors['success_bg']}; border: 1px solid {theme_colors['success']}; border-radius: 6px;")
-            elif current_text and "❌ No password found" in current_text:
-                self.result_label.setStyleSheet(f"font-weight: bold; padding: 12px; color: {theme_colors['error']}; background-color: {theme_colors['error_bg']}; border: 1px solid {theme_colors['error']}; border-radius: 6px;")
-            elif current_text and "⚠ Error:" in current_text:
-                self.result_label.setStyleSheet(f"font-weight: bold; padding: 12px; color: {theme_colors['warning']}; background-color: {theme_colors['warning_bg']}; border: 1px solid {theme_colors['warning']}; border-radius: 6px;")
-            else:
-                # Default styling for empty or other content
-                self.result_label.setStyleSheet(f"font-weight: bold; padding: 12px; color: {theme_colors['primary_text']};")
+    def set_style_state(self, widget, name, value):
+        """Set a dynamic property the stylesheet selects on, repolishing the widget only if it changed"""
+        if widget.property(name) == value:
+            return
+        widget.setProperty(name, value)
+        # Qt does not re-evaluate property selectors by itself
+        widget.style().unpolish(widget)
+        widget.style().polish(widget)
 
     def setup_ui(self):
         """Set up the main user interface"""
@@ -775,6 +781,7 @@ class MainWindow(QMainWindow):
         archive_layout = QHBoxLayout()
         archive_layout.addWidget(QLabel("Archive File:"))
         self.archive_label = QLabel("No file selected")
+        self.archive_label.setObjectName("fileLabel")
         archive_layout.addWidget(self.archive_label, 1)
         
         self.browse_archive_btn = QPushButton("Browse...")
@@ -789,6 +796,7 @@ class MainWindow(QMainWindow):
         password_layout = QHBoxLayout()
         password_layout.addWidget(QLabel("Password List:"))
         self.password_label = QLabel("No file selected")
+        self.password_label.setObjectName("fileLabel")
         password_layout.addWidget(self.password_label, 1)
         
         self.browse_password_btn = QPushButton("Browse...")
@@ -807,9 +815,12 @@ class MainWindow(QMainWindow):
         # Start/Stop buttons
         button_layout = QHBoxLayout()
         self.start_btn = QPushButton("Start Password Testing")
+        self.start_btn.setObjectName("startButton")
         self.start_btn.setEnabled(False)
 
         self.stop_btn = QPushButton("Stop")
+
+        self.stop_btn.setObjectName("stopButton")
         self.stop_btn.setEnabled(False)
         
         button_layout.addWidget(self.start_btn)
@@ -822,9 +833,12 @@ class MainWindow(QMainWindow):
         self.progress_bar.setVisible(False)
         self.progress_label = QLabel("")
         self.progress_label.setAlignment(Qt.AlignCenter)
-        
+        self.rate_label = QLabel("")
+        self.rate_label.setAlignment(Qt.AlignCenter)
+
         progress_layout.addWidget(self.progress_bar)
         progress_layout.addWidget(self.progress_label)
+        progress_layout.addWidget(self.rate_label)
         controls_layout.addLayout(progress_layout)
         
         main_layout.addWidget(controls_group)
@@ -852,6 +866,31 @@ class MainWindow(QMainWindow):
         )
         feedback_layout.addWidget(self.enhance_passwords_cb)
 
+        # Already-tried ledger checkbox
+        self.skip_tried_cb = QCheckBox("Skip passwords already tried on this archive")
+        self.skip_tried_cb.setChecked(False)  # Opt-in: it writes to the home directory
+        self.skip_tried_cb.setToolTip(
+            "Remember every rejected password per archive and skip it in later runs,\n"
+            "even with a different password list or enhancement setting.\n"
+            f"Stored in {DEFAULT_LEDGER_DIR}"
+        )
+        feedback_layout.addWidget(self.skip_tried_cb)
+
+        # Run report checkboxes
+        self.write_report_cb = QCheckBox("Write a run report")
+        self.write_report_cb.setChecked(False)  # Opt-in: it writes to the home directory
+        self.write_report_cb.setToolTip(
+            "Write a JSON report of the run (archive fingerprint, verifier, keyspace covered,\n"
+            "rate over time, stage timings, hit and stop reason) to\n"
+            f"{DEFAULT_REPORT_DIR}"
+        )
+        feedback_layout.addWidget(self.write_report_cb)
+
+        self.redact_report_cb = QCheckBox("Leave found passwords out of the report")
+        self.redact_report_cb.setChecked(True)  # Only the password length is kept
+        self.redact_report_cb.setEnabled(False)
+        feedback_layout.addWidget(self.redact_report_cb)
+
         # Worker count configuration
         worker_layout = QHBoxLayout()
         worker_layout.addWidget(QLabel("Worker Threads:"))
@@ -899,10 +938,12 @@ class MainWindow(QMainWindow):
         
         # Current password display
         self.current_password_label = QLabel("Current attempt: (not started)")
+        self.current_password_label.setObjectName("currentPasswordLabel")
         feedback_layout.addWidget(self.current_password_label)
 
         # Result display
         self.result_label = QLabel("")
+        self.result_label.setObjectName("resultLabel")
         self.result_label.setAlignment(Qt.AlignCenter)
         feedback_layout.addWidget(self.result_label)
         
@@ -940,7 +981,8 @@ class MainWindow(QMainWindow):
         self.start_btn.clicked.connect(self.start_cracking)
         self.stop_btn.clicked.connect(self.stop_cracking)
         self.show_password_cb.toggled.connect(self.toggle_password_display)
-        self.enhance_passwords_cb.toggled.connect(self.update_password_count_display)
+        self.enhance_passwords_cb.toggled.connect(lambda: self.update_password_count_display())
+        self.write_report_cb.toggled.connect(self.redact_report_cb.setEnabled)
         
     def browse_archive_file(self):
         """Open file dialog to select archive file"""
@@ -975,8 +1017,7 @@ class MainWindow(QMainWindow):
             self.clear_archive_btn.setEnabled(True)
             self.check_ready_state()
             self.statusBar().showMessage(f"Archive selected: {filename}")
-            # Update theme-aware styling
-            self.update_themed_elements(self.get_current_theme_colors())
+            self.update_state_styles()
             
     def clear_archive_file(self):
         """Clear selected archive file"""
@@ -984,8 +1025,7 @@ class MainWindow(QMainWindow):
         self.archive_label.setText("No file selected")
         self.clear_archive_btn.setEnabled(False)
         self.check_ready_state()
-        # Update theme-aware styling
-        self.update_themed_elements(self.get_current_theme_colors())
+        self.update_state_styles()
         
     def browse_password_file(self):
         """Open file dialog to select password list file"""
@@ -993,7 +1033,8 @@ class MainWindow(QMainWindow):
             self,
             "Select Password List File",
             "",
-            "Text Files (*.txt);;All Files (*)"
+            f"Text Files (*.txt);;Compiled Wordlists (*{WORDLIST_EXTENSION});;"
+            f"Compressed Wordlists ({' '.join('*' + ext for ext in COMPRESSED_EXTENSIONS)});;All Files (*)"
         )
 
         if file_path:
@@ -1002,53 +1043,67 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "File Error", "Selected file does not exist.")
                 return
 
-            try:
-                # Try to read the file and count passwords
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    original_passwords = [line.strip() for line in f if line.strip()]
-                    original_count = len(original_passwords)
+            if not os.access(file_path, os.R_OK):
+                QMessageBox.critical(self, "File Error", "Could not read password file:\nPermission denied")
+                return
 
-                if original_count == 0:
-                    QMessageBox.warning(self, "File Error", "Password file appears to be empty.")
-                    return
+            self.password_list_path = file_path
+            self.password_count = None
+            self.password_label.setText(f"{Path(file_path).name} (counting passwords...)")
+            self.clear_password_btn.setEnabled(True)
+            self.check_ready_state()
+            self.statusBar().showMessage("Counting passwords...")
+            self.update_state_styles()
+            self.start_password_count(file_path)
+
+    def start_password_count(self, file_path):
+        """Count the passwords of a list in the background (cached per file version)"""
+        for count_worker in self.count_workers:
+            count_worker.stop()
+
+        count_worker = PasswordCountWorker(file_path)
+        count_worker.counted.connect(self.password_list_counted)
+        count_worker.count_failed.connect(self.password_count_failed)
+        count_worker.finished.connect(lambda: self.count_worker_finished(count_worker))
+        self.count_workers.append(count_worker)
+        count_worker.start()
+
+    def count_worker_finished(self, count_worker):
+        """Release a finished counter thread"""
+        if count_worker in self.count_workers:
+            self.count_workers.remove(count_worker)
+        count_worker.deleteLater()
+
+    def password_list_counted(self, file_path, count):
+        """Show the count of the selected list once the background count is done"""
+        if file_path != self.password_list_path:
+            return  # a different list was selected meanwhile
+
+        if count == 0:
+            self.clear_password_file()
+            QMessageBox.warning(self, "File Error", "Password file appears to be empty.")
+            return
 
-                # Calculate enhanced count if enhancement is enabled
-                if self.enhance_passwords_cb.isChecked():
-                    enhanced_passwords = PasswordEnhancer.enhance_password_list(original_passwords)
-                    enhanced_count = len(enhanced_passwords)
-                    count_text = f"{original_count:,} passwords → {enhanced_count:,} enhanced"
-                    status_text = f"Password list selected: {original_count:,} original + {enhanced_count - original_count:,} variations = {enhanced_count:,} total"
-                else:
-                    count_text = f"{original_count:,} passwords"
-                    status_text = f"Password list selected: {original_count:,} passwords loaded"
-
-                self.password_list_path = file_path
-                filename = Path(file_path).name
-                self.password_label.setText(f"{filename} ({count_text})")
-                self.clear_password_btn.setEnabled(True)
-                self.check_ready_state()
-                self.statusBar().showMessage(status_text)
-                # Update theme-aware styling
-                self.update_themed_elements(self.get_current_theme_colors())
+        self.password_count = count
+        self.update_password_count_display("Password list selected")
+
+    def password_count_failed(self, file_path, error_message):
+        """Report a list that could not be read"""
+        if file_path != self.password_list_path:
+            return
+        self.clear_password_file()
+        QMessageBox.critical(self, "File Error", f"Could not read password file:\n{error_message}")
 
-            except Exception as e:
-                QMessageBox.critical(self, "File Error", f"Could not read password file:\n{str(e)}")
-            
     def clear_password_file(self):
         """Clear selected password list file"""
+        for count_worker in self.count_workers:
+            count_worker.stop()
         self.password_list_path = None
+        self.password_count = None
         self.password_label.setText("No file selected")
         self.clear_password_btn.setEnabled(False)
         self.check_ready_state()
-        # Update theme-aware styling
-        self.update_themed_elements(self.get_current_theme_colors())
-
-    def get_current_theme_colors(self):
-        """Get the current theme colors"""
-        if self.current_theme == 'dark':
-            return ThemeManager.DARK_THEME
-        else:
-            return ThemeManager.LIGHT_THEME
+        self.update_state_styles()
 
     def check_ready_state(self):
         """Check if both files are selected and enable/disable start button"""
@@ -1080,17 +1135,18 @@ class MainWindow(QMainWindow):
 
         # Visual feedback for start
         self.start_btn.setText("Testing...")
-        # Update theme-aware styling
-        self.update_themed_elements(self.get_current_theme_colors())
 
         # Reset UI elements
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         self.progress_label.setText("Starting...")
+        self.rate_label.setText("")
         self.current_password_label.setText("Current attempt: (starting)")
         self.result_label.setText("")
-        # Update theme-aware styling
-        self.update_themed_elements(self.get_current_theme_colors())
+        self.rendered_progress = None
+        # Repolish once for the new state; nothing is restyled while the run is active
+        self.set_style_state(self.result_label, 'state', '')
+        self.update_state_styles()
 
         # Create and start worker thread
         enhance_passwords = self.enhance_passwords_cb.isChecked()
@@ -1099,72 +1155,123 @@ class MainWindow(QMainWindow):
             self.archive_path,
             self.password_list_path,
             enhance_passwords,
-            worker_count
+            worker_count,
+            ledger_dir=DEFAULT_LEDGER_DIR if self.skip_tried_cb.isChecked() else None,
+            report_dir=DEFAULT_REPORT_DIR if self.write_report_cb.isChecked() else None,
+            redact_report=self.redact_report_cb.isChecked()
         )
-        self.worker_thread.progress_updated.connect(self.update_progress)
+        self.run_metrics = self.worker_thread.metrics
         self.worker_thread.password_found.connect(self.password_found)
         self.worker_thread.finished_unsuccessfully.connect(self.password_not_found)
         self.worker_thread.error_occurred.connect(self.handle_error)
         self.worker_thread.finished.connect(self.cracking_finished)
 
         self.worker_thread.start()
+        self.progress_timer.start(self.PROGRESS_REFRESH_MS)
         self.statusBar().showMessage("Password testing in progress...")
 
     def stop_cracking(self):
         """Stop the password cracking process"""
         if self.worker_thread and self.worker_thread.isRunning():
+            # Cooperative stop: workers exit after their current candidate and
+            # the thread's finished signal resets the UI via cracking_finished
+            self.stop_requested = True
             self.worker_thread.stop()
-            self.worker_thread.wait(3000)  # Wait up to 3 seconds
-            if self.worker_thread.isRunning():
-                self.worker_thread.terminate()
-                self.worker_thread.wait()
+            self.stop_btn.setEnabled(False)
+            self.statusBar().showMessage("Stopping...")
+            return
 
         self.cracking_finished()
         self.statusBar().showMessage("Password testing stopped by user")
 
-    def update_progress(self, current, total, current_password):
-        """Update progress bar and current password display"""
-        progress_percent = int((current / total) * 100)
-        self.progress_bar.setValue(progress_percent)
-        self.progress_label.setText(f"{current:,} of {total:,} passwords tried ({progress_percent}%)")
+    def refresh_progress(self):
+        """Pull a metrics snapshot and render progress, rate and ETA"""
+        if self.run_metrics is None:
+            return
+        snapshot = self.run_metrics.snapshot()
+        tested = snapshot['tested']
+        total = max(snapshot['total'], tested)
+        # Text lists read by range only know an upper bound on their enhanced size, so the
+        # percentage and ETA are the most the run can still take
+        bound = "up to " if snapshot['total_upper_bound'] else ""
+        rate = snapshot['rate_ewma'] or snapshot['rate_average']
+        progress_percent = int(tested * 100 / total) if total else 0
+
+        if rate > 0 and self.is_cracking:
+            rate_text = f"{rate:,.0f} passwords/s · ETA {bound}{self.format_eta((total - tested) / rate)}"
+        elif rate > 0:
+            rate_text = f"{rate:,.0f} passwords/s"
+        else:
+            rate_text = "Measuring rate..." if self.is_cracking else ""
 
-        # Update current password display
-        if self.show_password_cb.isChecked():
-            self.current_password_label.setText(f"Current attempt: {current_password}")
+        if self.worker_thread is not None and self.worker_thread.current_password:
+            current_password = self.worker_thread.current_password
+            if not self.show_password_cb.isChecked():
+                current_password = '*' * len(current_password)
+            attempt_text = f"Current attempt: {current_password}"
         else:
-            self.current_password_label.setText(f"Current attempt: {'*' * len(current_password)}")
+            attempt_text = self.current_password_label.text()
+
+        rendered = (progress_percent, f"{tested:,} of {bound}{total:,} passwords tried ({progress_percent}%)",
+                    rate_text, attempt_text)
+        if rendered == self.rendered_progress:
+            return
+        # Only widgets whose text changed are touched, which keeps relayouts rare
+        previous = self.rendered_progress or (None, None, None, None)
+        self.rendered_progress = rendered
+        if rendered[0] != previous[0]:
+            self.progress_bar.setValue(progress_percent)
+        if rendered[1] != previous[1]:
+            self.progress_label.setText(rendered[1])
+        if rendered[2] != previous[2]:
+            self.rate_label.setText(rate_text)
+        if rendered[3] != previous[3]:
+            self.current_password_label.setText(attempt_text)
+
+    def format_eta(self, seconds):
+        """Render a remaining time as H:MM:SS or M:SS"""
+        seconds = int(seconds)
+        hours, remainder = divmod(seconds, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        if hours:
+            return f"{hours}:{minutes:02d}:{seconds:02d}"
+        return f"{minutes}:{seconds:02d}"
 
     def password_found(self, password):
         """Handle successful password discovery"""
         self.result_label.setText(f"✔ Password found: {password}")
+        self.set_style_state(self.result_label, 'state', 'found')
         self.statusBar().showMessage("Password found successfully!")
-        # Update theme-aware styling
-        self.update_themed_elements(self.get_current_theme_colors())
 
     def password_not_found(self):
         """Handle case where no password worked"""
         self.result_label.setText("❌ No password found")
+        self.set_style_state(self.result_label, 'state', 'not_found')
         self.statusBar().showMessage("Password testing completed - no password found")
-        # Update theme-aware styling
-        self.update_themed_elements(self.get_current_theme_colors())
 
     def handle_error(self, error_message):
         """Handle errors from worker thread"""
         self.result_label.setText(f"⚠ Error: {error_message}")
+        self.set_style_state(self.result_label, 'state', 'error')
         self.statusBar().showMessage("Error occurred during password testing")
         QMessageBox.critical(self, "Error", error_message)
-        # Update theme-aware styling
-        self.update_themed_elements(self.get_current_theme_colors())
 
     def cracking_finished(self):
         """Reset UI state when cracking is finished"""
         self.is_cracking = False
         self.update_ui_state()
 
+        # Render the final counts once, then stop polling
+        self.progress_timer.stop()
+        self.refresh_progress()
+
+        if self.stop_requested:
+            self.stop_requested = False
+            self.statusBar().showMessage("Password testing stopped by user")
+
         # Reset start button appearance
         self.start_btn.setText("Start Password Testing")
-        # Update theme-aware styling
-        self.update_themed_elements(self.get_current_theme_colors())
+        self.update_state_styles()
 
         # Clean up worker thread
         if self.worker_thread:
@@ -1254,46 +1361,345 @@ class MainWindow(QMainWindow):
 
         return msg.exec() == QMessageBox.Yes
 
-    def update_password_count_display(self):
+    def update_password_count_display(self, status_prefix=None):
         """Update the password count display when enhancement setting changes"""
-        if not self.password_list_path:
-            return
-
-        try:
-            # Re-read the password file to update count display
-            with open(self.password_list_path, 'r', encoding='utf-8', errors='ignore') as f:
-                original_passwords = [line.strip() for line in f if line.strip()]
-                original_count = len(original_passwords)
-
-            # Calculate enhanced count if enhancement is enabled
-            if self.enhance_passwords_cb.isChecked():
-                enhanced_passwords = PasswordEnhancer.enhance_password_list(original_passwords)
-                enhanced_count = len(enhanced_passwords)
-                count_text = f"{original_count:,} passwords → {enhanced_count:,} enhanced"
-                status_text = f"Enhancement enabled: {original_count:,} original + {enhanced_count - original_count:,} variations = {enhanced_count:,} total"
+        if not self.password_list_path or self.password_count is None:
+            return  # the background count updates the display when it finishes
+
+        # The enhanced size is estimated from the rule plan, never by generating the list
+        original_count = self.password_count
+        if is_compiled_wordlist(self.password_list_path):
+            # Compiled lists are used as compiled, enhancement happens at compile time
+            count_text = f"{original_count:,} compiled passwords"
+            status_text = f"{status_prefix or 'Compiled password list'}: {original_count:,} passwords"
+        elif self.enhance_passwords_cb.isChecked():
+            enhanced_count = PasswordEnhancer.estimate_enhanced_count(original_count)
+            count_text = f"{original_count:,} passwords → up to {enhanced_count:,} enhanced"
+            status_text = f"{status_prefix or 'Enhancement enabled'}: {original_count:,} original + up to {enhanced_count - original_count:,} variations = up to {enhanced_count:,} total"
+        else:
+            count_text = f"{original_count:,} passwords"
+            if status_prefix:
+                status_text = f"{status_prefix}: {original_count:,} passwords loaded"
             else:
-                count_text = f"{original_count:,} passwords"
                 status_text = f"Enhancement disabled: {original_count:,} passwords"
 
-            filename = Path(self.password_list_path).name
-            self.password_label.setText(f"{filename} ({count_text})")
-            self.statusBar().showMessage(status_text)
-
-        except Exception as e:
-            # If there's an error, just show a generic message
-            self.statusBar().showMessage(f"Error updating password count: {str(e)}")
+        filename = Path(self.password_list_path).name
+        self.password_label.setText(f"{filename} ({count_text})")
+        self.statusBar().showMessage(status_text)
 
     def toggle_password_display(self, checked):
         """Toggle password display visibility"""
-        # Update current display if we're currently running
+        # Re-render the current attempt now rather than on the next timer tick
         if self.worker_thread and self.worker_thread.isRunning():
-            current_text = self.current_password_label.text()
-            if "Current attempt:" in current_text:
-                # This will be updated on next progress signal
-                pass
+            self.refresh_progress()
+
+    def closeEvent(self, event):
+        """Stop the running crack and the background counters before the window goes away"""
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            # Workers stop after their current candidate; waiting lets the run close its ledgers and report
+            self.worker_thread.stop()
+            self.worker_thread.wait()
+        for count_worker in list(self.count_workers):
+            count_worker.stop()
+            count_worker.wait()
+        super().closeEvent(event)
+
+
+def add_run_arguments(parser):
+    """Add the options shared by all headless run commands"""
+    parser.add_argument('--workers', type=int, default=ResourceDetector.get_recommended_workers(),
+                        help="Number of worker threads (or processes with --processes)")
+    parser.add_argument('--processes', action='store_true',
+                        help="Run workers as separate processes fed through shared memory, so they "
+                             "use more than one CPU core")
+    parser.add_argument('--no-enhance', action='store_true', help="Disable password enhancement")
+    parser.add_argument('--source', action='append', default=[], metavar='SPEC',
+                        help="Another candidate source, interleaved with the wordlist by priority: "
+                             "list=PATH or mask=MASK (?l ?u ?d ?s ?a), optionally followed by ,priority=N "
+                             "(default 1), ,limit=CANDIDATES, ,seconds=S and for lists ,rules=on|off")
+    parser.add_argument('--min-length', type=int, default=0, metavar='N',
+                        help="Only test candidates of at least N characters")
+    parser.add_argument('--max-length', type=int, default=None, metavar='N',
+                        help="Only test candidates of at most N characters")
+    parser.add_argument('--require', default='', metavar='CLASSES',
+                        help="Only test candidates with at least one character of each class, comma-separated: "
+                             f"{', '.join(CHARACTER_CLASSES)}")
+    parser.add_argument('--forbid', default='', metavar='CLASSES',
+                        help="Only test candidates with no character of these classes")
+    parser.add_argument('--match', default=None, metavar='REGEX',
+                        help="Only test candidates REGEX is found in (anchor it with ^...$ to match whole candidates)")
+    parser.add_argument('--legacy-encodings', default=','.join(LEGACY_ENCODINGS), metavar='LIST',
+                        help="Code pages ZIP passwords are also tried in when they encode differently from UTF-8, "
+                             "comma-separated (default %(default)s; 'none' tries UTF-8 only)")
+    parser.add_argument('--max-time', type=float, default=None, metavar='SEC',
+                        help="Stop handing out work after SEC seconds of wall-clock time")
+    parser.add_argument('--max-candidates', type=int, default=None, metavar='N',
+                        help="Test at most N candidates in this run")
+    parser.add_argument('--max-cpu', type=float, default=None, metavar='SEC',
+                        help="Stop handing out work after SEC CPU-seconds across all workers")
+    parser.add_argument('--checkpoint', metavar='FILE', default=None,
+                        help="Skip the keyspace ranges recorded in FILE (if it exists) and write the "
+                             "ranges covered so far back to it when the run ends")
+    parser.add_argument('--metrics-interval', type=float, default=1.0,
+                        help="Seconds between JSON metrics lines on stdout (0 disables)")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve Prometheus-style metrics on 127.0.0.1:PORT")
+    parser.add_argument('--preload-limit', type=int, default=DEFAULT_PRELOAD_LIMIT // (1024 * 1024), metavar='MB',
+                        help="Load ZIP archives up to MB megabytes fully into memory; larger ones are mapped "
+                             "and only the verification member is kept")
+    parser.add_argument('--skip-tried', action='store_true',
+                        help=f"Skip and record candidates already tried on an archive, using ledgers in "
+                             f"{DEFAULT_LEDGER_DIR}")
+    parser.add_argument('--ledger-dir', metavar='DIR', default=None,
+                        help="Like --skip-tried, with the per-archive ledgers kept in DIR")
+    parser.add_argument('--report', metavar='FILE', default=None,
+                        help="Write a JSON run report to FILE")
+    parser.add_argument('--report-dir', metavar='DIR', default=None,
+                        help=f"Write a JSON run report as a new file in DIR (such as {DEFAULT_REPORT_DIR})")
+    parser.add_argument('--redact-report', action='store_true',
+                        help="Leave found passwords out of the run report (their length is kept)")
+    parser.add_argument('--profile', metavar='FILE', default=None,
+                        help="Profile every worker and write the merged result to FILE")
+    parser.add_argument('--profile-mode', choices=RunProfiler.MODES, default='cprofile',
+                        help="cprofile writes a pstats file, sample writes collapsed stacks")
+
+
+def emit_json(record):
+    """Print one JSON record per line on stdout"""
+    print(json.dumps(record, separators=(',', ':')), flush=True)
+
+
+def run_headless(args, worker, profiler, result):
+    """Run a coordinator thread to completion with CLI metrics and profiling"""
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = MetricsServer(lambda: worker.metrics, args.metrics_port)
+        metrics_server.start()
+
+    metrics_timer = QTimer()
+    metrics_timer.timeout.connect(lambda: print(RunMetrics.to_json_line(worker.metrics.snapshot()), flush=True))
+    if args.metrics_interval > 0:
+        metrics_timer.start(int(args.metrics_interval * 1000))
+
+    def on_error(message):
+        result['exit_code'] = 2
+        emit_json({'type': 'error', 'message': message})
+
+    def on_finished():
+        metrics_timer.stop()
+        print(RunMetrics.to_json_line(worker.metrics.snapshot()), flush=True)
+        if worker.result is not None:
+            # What this and earlier runs fully tested, as checkpointable ranges
+            emit_json({'type': 'coverage', 'reason': worker.result.stop_reason, 'tested': worker.result.tested,
+                       'ranges': worker.result.coverage})
+            if args.checkpoint:
+                try:
+                    worker.coverage.save(args.checkpoint, reason=worker.result.stop_reason)
+                except OSError as e:
+                    on_error(f"Could not write checkpoint: {str(e)}")
+        if worker.report_file:
+            emit_json({'type': 'report', 'path': worker.report_file})
+        app.quit()
+
+    worker.error_occurred.connect(on_error)
+    worker.finished.connect(on_finished)
+    worker.start()
+
+    app.exec()
+    if metrics_server:
+        metrics_server.stop()
+    if profiler:
+        profiler.write(args.profile)
+        print(profiler.summary(), file=sys.stderr)
+        emit_json({'type': 'profile', 'mode': args.profile_mode, 'path': args.profile})
+    return result['exit_code']
+
+
+def run_cli(argv):
+    """Run a headless password test from the command line"""
+    parser = argparse.ArgumentParser(prog='zirar', description="ZiRar headless password testing")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    crack_parser = subparsers.add_parser('crack', help="Test a password list against an archive")
+    crack_parser.add_argument('archive', help="Archive file (.zip or .rar)")
+    crack_parser.add_argument('wordlist', help="Password list file, one password per line, or a source spec "
+                                               "such as mask=?d?d?d?d (see --source)")
+    add_run_arguments(crack_parser)
+
+    batch_parser = subparsers.add_parser('batch', help="Test one password list against several archives")
+    batch_parser.add_argument('wordlist', help="Password list file, one password per line, or a source spec "
+                                               "such as mask=?d?d?d?d (see --source)")
+    batch_parser.add_argument('archives', nargs='+', help="Archive files (.zip or .rar)")
+    add_run_arguments(batch_parser)
+
+    compile_parser = subparsers.add_parser('compile-wordlist',
+                                           help="Compile a password list into the fast binary wordlist format")
+    compile_parser.add_argument('wordlist', help="Text password list, one password per line")
+    compile_parser.add_argument('output', nargs='?', default=None,
+                                help=f"Output file (defaults to the list name with {WORDLIST_EXTENSION})")
+    compile_parser.add_argument('--enhance', action='store_true',
+                                help="Add enhanced variations; compiled lists are not enhanced at run time")
+    compile_parser.add_argument('--sort', choices=COMPILE_SORT_ORDERS, default='input',
+                                help="Order of the original passwords: as in the file, most repeated "
+                                     "first, or shortest first")
+
+    serve_parser = subparsers.add_parser('serve', help="Coordinate a distributed run across worker nodes")
+    serve_parser.add_argument('archive', help="Archive file, used to confirm reported hits")
+    serve_parser.add_argument('wordlist', help="Password list file; every node needs an identical copy")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="Address to listen on")
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on")
+    serve_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE // 1024, metavar='KB',
+                              help="Size of each leased wordlist range")
+    serve_parser.add_argument('--lease-timeout', type=float, default=DEFAULT_LEASE_TIMEOUT,
+                              help="Seconds without a heartbeat before a lease is re-issued")
+    serve_parser.add_argument('--heartbeat', type=float, default=DEFAULT_HEARTBEAT_INTERVAL,
+                              help="Seconds between node heartbeats")
+    serve_parser.add_argument('--no-enhance', action='store_true', help="Disable password enhancement")
+    serve_parser.add_argument('--token', default=None, help="Shared secret nodes must present")
+
+    node_parser = subparsers.add_parser('node', help="Work on ranges leased by a coordinator")
+    node_parser.add_argument('coordinator', help="Coordinator address as HOST:PORT")
+    node_parser.add_argument('archive', help="Local copy of the archive file")
+    node_parser.add_argument('wordlist', help="Local copy of the password list file")
+    node_parser.add_argument('--workers', type=int, default=ResourceDetector.get_recommended_workers(),
+                             help="Number of worker threads, each holding its own lease")
+    node_parser.add_argument('--token', default=None, help="Shared secret expected by the coordinator")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'compile-wordlist':
+        output = args.output or str(Path(args.wordlist).with_suffix(WORDLIST_EXTENSION))
+        try:
+            count = compile_wordlist(args.wordlist, output, args.enhance, args.sort)
+        except (OSError, ValueError) as e:
+            emit_json({'type': 'error', 'message': f"Could not compile password list: {str(e)}"})
+            return 2
+        emit_json({'type': 'compiled', 'path': output, 'count': count})
+        return 0
+
+    if args.command in ('serve', 'node') and (is_compiled_wordlist(args.wordlist)
+                                              or compression_format(args.wordlist)):
+        parser.error("distributed mode leases byte ranges of a plain text password list; "
+                     "compiled and compressed wordlists are not supported")
+
+    if args.command == 'serve':
+        coordinator = LeaseCoordinator(args.archive, args.wordlist, host=args.host, port=args.port,
+                                       chunk_size=max(1, args.chunk_size) * 1024,
+                                       lease_timeout=args.lease_timeout, heartbeat_interval=args.heartbeat,
+                                       enhance_passwords=not args.no_enhance, token=args.token,
+                                       on_event=emit_json)
+        coordinator.start()
+        try:
+            password = coordinator.wait()
+        except KeyboardInterrupt:
+            password = None
+        coordinator.stop()
+        emit_json({'type': 'result', 'found': password is not None, 'password': password,
+                   'reason': coordinator.stop_reason, 'tested': coordinator.tested})
+        return 0 if password is not None else 1
+
+    if args.command == 'node':
+        host, _, port = args.coordinator.rpartition(':')
+        if not port.isdigit() or not 0 < int(port) < 65536:
+            parser.error(f"Coordinator address must be HOST:PORT, got {args.coordinator!r}")
+        archive_buffers = {}
+        buffer = load_archive_buffer(args.archive)
+        if buffer is not None:
+            archive_buffers[args.archive] = buffer
+        reasons = run_node(host or '127.0.0.1', int(port), args.archive, args.wordlist,
+                           threads=max(1, args.workers), token=args.token, archive_buffers=archive_buffers)
+        emit_json({'type': 'node_finished', 'reasons': reasons})
+        return 0 if 'found' in reasons else 1
+
+    if args.processes and args.profile:
+        parser.error("--profile covers worker threads only and cannot be combined with --processes")
+
+    # A single plain wordlist keeps its own loading path (text lists are read by range)
+    sources = [args.wordlist] + args.source if args.source or is_source_spec(args.wordlist) else None
+    if sources:
+        for spec in sources:
+            try:
+                parse_source_spec(spec)
+            except ValueError as e:
+                parser.error(str(e))
+
+    try:
+        candidate_filter = CandidateFilter(max(0, args.min_length), args.max_length, parse_classes(args.require),
+                                           parse_classes(args.forbid), args.match)
+    except ValueError as e:
+        parser.error(str(e))
+
+    legacy_encodings = tuple(name.strip() for name in args.legacy_encodings.split(',')
+                             if name.strip() and name.strip() != 'none')
+    for name in legacy_encodings:
+        try:
+            codecs.lookup(name)
+        except LookupError:
+            parser.error(f"Unknown encoding: {name}")
+
+    budget = RunBudget(args.max_time, args.max_candidates, args.max_cpu)
+    try:
+        if args.checkpoint:
+            specs = [parse_source_spec(spec, not args.no_enhance) for spec in sources or [args.wordlist]]
+            coverage = KeyspaceCoverage.load(args.checkpoint, keyspace_identity(specs, candidate_filter))
+        else:
+            coverage = KeyspaceCoverage()
+    except (OSError, ValueError) as e:
+        parser.error(f"Cannot read checkpoint: {str(e)}")
+
+    profiler = RunProfiler(args.profile_mode) if args.profile else None
+    worker_count = max(1, args.workers)
+    preload_limit = max(0, args.preload_limit) * 1024 * 1024
+    ledger_dir = args.ledger_dir or (DEFAULT_LEDGER_DIR if args.skip_tried else None)
+    report_options = {
+        'report_dir': args.report_dir,
+        'report_path': args.report,
+        'redact_report': args.redact_report
+    }
+
+    if args.command == 'batch':
+        result = {'exit_code': 1}
+        worker = BatchCrackingWorker(args.archives, args.wordlist, not args.no_enhance, worker_count,
+                                     profiler=profiler, preload_limit=preload_limit, ledger_dir=ledger_dir,
+                                     processes=args.processes, sources=sources, budget=budget, coverage=coverage,
+                                     candidate_filter=candidate_filter, legacy_encodings=legacy_encodings,
+                                     **report_options)
+
+        def on_solved(archive_path, password):
+            emit_json({'type': 'result', 'archive': archive_path, 'found': True, 'password': password})
+
+        def on_batch_finished(unsolved):
+            for archive_path in unsolved:
+                emit_json({'type': 'result', 'archive': archive_path, 'found': False})
+            if not unsolved and result['exit_code'] != 2:
+                result['exit_code'] = 0
+
+        worker.archive_solved.connect(on_solved)
+        worker.batch_finished.connect(on_batch_finished)
+        return run_headless(args, worker, profiler, result)
+
+    result = {'exit_code': 1}
+    worker = PasswordCrackingWorker(args.archive, args.wordlist, not args.no_enhance, worker_count,
+                                    profiler=profiler, preload_limit=preload_limit, ledger_dir=ledger_dir,
+                                    processes=args.processes, sources=sources, budget=budget, coverage=coverage,
+                                    candidate_filter=candidate_filter, legacy_encodings=legacy_encodings,
+                                    **report_options)
+
+    def on_found(password):
+        result['exit_code'] = 0
+        emit_json({'type': 'result', 'found': True, 'password': password})
+
+    worker.password_found.connect(on_found)
+    worker.finished_unsuccessfully.connect(lambda: emit_json({'type': 'result', 'found': False}))
+    return run_headless(args, worker, profiler, result)
 
 
 def main():
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+
     app = QApplication(sys.argv)
     app.setApplicationName("ZiRar")
     app.setApplicationVersion("1.0")
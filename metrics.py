@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Engine Metrics
+Thread-safe counters and timers for the password testing hot path, plus
+JSON and Prometheus-style text renderers. Has no Qt dependency so it can be
+used from the GUI, the CLI and background services alike.
+"""
+
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RunMetrics:
+    """Collects throughput, stage timings and worker statistics for one run"""
+
+    # Stages a candidate can spend time in, in pipeline order
+    STAGES = ('generation', 'enhancement', 'filtering', 'queueing', 'kdf', 'decrypt', 'decompress')
+
+    # Time constant (seconds) of the exponentially weighted rate average
+    EWMA_TAU = 5.0
+
+    # Minimum interval between rate samples so concurrent readers agree
+    SAMPLE_INTERVAL = 0.5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.start_time = time.monotonic()
+        self.total = 0
+        self.total_upper_bound = False  # True while total is an upper bound rather than a count
+        self.tested = 0
+        self.fast_rejects = 0
+        self.ledger_skips = 0
+        self.filtered = 0
+        self.stage_seconds = {stage: 0.0 for stage in self.STAGES}
+        self.workers = {}
+        self._queue_depth_fn = None
+
+        # Rate sampling state
+        self._last_sample_time = self.start_time
+        self._last_sample_tested = 0
+        self._rate_instant = 0.0
+        self._rate_ewma = None
+
+    def set_total(self, total, upper_bound=False):
+        """Set the total number of candidates planned for this run, or an upper bound on it"""
+        with self._lock:
+            self.total = total
+            self.total_upper_bound = upper_bound
+
+    def set_queue(self, work_queue):
+        """Attach the queue whose depth should be reported"""
+        self._queue_depth_fn = work_queue.qsize
+
+    def add_stage_time(self, stage, seconds):
+        """Add elapsed seconds to a pipeline stage"""
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def register_worker(self, worker_id):
+        """Register a worker so its utilization can be tracked"""
+        with self._lock:
+            self.workers[worker_id] = {
+                'started': time.monotonic(),
+                'tested': 0,
+                'busy': 0.0
+            }
+
+    def record_result(self, worker_id, busy_seconds, fast_reject=False, ledger_skip=False):
+        """Record one tested candidate for a worker"""
+        with self._lock:
+            self.tested += 1
+            if fast_reject:
+                self.fast_rejects += 1
+            if ledger_skip:
+                self.ledger_skips += 1
+            worker = self.workers.get(worker_id)
+            if worker is not None:
+                worker['tested'] += 1
+                worker['busy'] += busy_seconds
+
+    def record_batch(self, worker_id, count, busy_seconds, fast_rejects=0, ledger_skips=0):
+        """Record several candidates a worker rejected in one pass"""
+        with self._lock:
+            self.tested += count
+            self.fast_rejects += fast_rejects
+            self.ledger_skips += ledger_skips
+            worker = self.workers.get(worker_id)
+            if worker is not None:
+                worker['tested'] += count
+                worker['busy'] += busy_seconds
+
+    def record_filtered(self, count, seconds):
+        """Record candidates a filter dropped before verification; they count as tested"""
+        with self._lock:
+            self.tested += count
+            self.filtered += count
+            self.stage_seconds['filtering'] += seconds
+
+    def take_counts(self):
+        """Return and reset the candidate counters and stage times, for merging elsewhere
+
+        Worker processes keep their own RunMetrics and send these counts
+        to the coordinator after each batch.
+        """
+        with self._lock:
+            counts = {
+                'tested': self.tested,
+                'fast_rejects': self.fast_rejects,
+                'ledger_skips': self.ledger_skips,
+                'filtered': self.filtered,
+                'busy': sum(worker['busy'] for worker in self.workers.values()),
+                'stages': {stage: seconds for stage, seconds in self.stage_seconds.items() if seconds}
+            }
+            self.tested = self.fast_rejects = self.ledger_skips = self.filtered = 0
+            self.stage_seconds = {stage: 0.0 for stage in self.STAGES}
+            for worker in self.workers.values():
+                worker['tested'] = 0
+                worker['busy'] = 0.0
+            return counts
+
+    def add_counts(self, worker_id, counts):
+        """Merge counts returned by take_counts() into this run, credited to a worker"""
+        with self._lock:
+            self.tested += counts['tested']
+            self.fast_rejects += counts['fast_rejects']
+            self.ledger_skips += counts['ledger_skips']
+            self.filtered += counts['filtered']
+            for stage, seconds in counts['stages'].items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            worker = self.workers.get(worker_id)
+            if worker is not None:
+                worker['tested'] += counts['tested']
+                worker['busy'] += counts['busy']
+
+    def _sample_rate(self, now):
+        """Update instant and EWMA rates if the sample interval has elapsed"""
+        dt = now - self._last_sample_time
+        if dt < self.SAMPLE_INTERVAL:
+            return
+
+        delta = self.tested - self._last_sample_tested
+        self._rate_instant = delta / dt
+        if self._rate_ewma is None:
+            self._rate_ewma = self._rate_instant
+        else:
+            alpha = 1.0 - math.exp(-dt / self.EWMA_TAU)
+            self._rate_ewma += alpha * (self._rate_instant - self._rate_ewma)
+
+        self._last_sample_time = now
+        self._last_sample_tested = self.tested
+
+    def snapshot(self):
+        """Return a point-in-time copy of all metrics as a plain dict"""
+        now = time.monotonic()
+        queue_depth = 0
+        if self._queue_depth_fn is not None:
+            try:
+                queue_depth = self._queue_depth_fn()
+            except Exception:
+                queue_depth = 0
+
+        with self._lock:
+            self._sample_rate(now)
+            elapsed = now - self.start_time
+            workers = {}
+            for worker_id, worker in self.workers.items():
+                lifetime = max(now - worker['started'], 1e-9)
+                workers[str(worker_id)] = {
+                    'tested': worker['tested'],
+                    'busy_seconds': round(worker['busy'], 6),
+                    'utilization': round(min(1.0, worker['busy'] / lifetime), 4)
+                }
+
+            return {
+                'timestamp': time.time(),
+                'elapsed': round(elapsed, 3),
+                'tested': self.tested,
+                'total': self.total,
+                'total_upper_bound': self.total_upper_bound,
+                'rate_instant': round(self._rate_instant, 2),
+                'rate_ewma': round(self._rate_ewma or 0.0, 2),
+                'rate_average': round(self.tested / elapsed, 2) if elapsed > 0 else 0.0,
+                'fast_rejects': self.fast_rejects,
+                'fast_reject_ratio': round(self.fast_rejects / self.tested, 4) if self.tested else 0.0,
+                'ledger_skips': self.ledger_skips,
+                'filtered': self.filtered,
+                'queue_depth': queue_depth,
+                'stages': {stage: round(seconds, 6) for stage, seconds in self.stage_seconds.items()},
+                'workers': workers
+            }
+
+    @staticmethod
+    def to_json_line(snapshot):
+        """Render a snapshot as a single JSON line"""
+        return json.dumps(dict(snapshot, type='metrics'), separators=(',', ':'))
+
+    @staticmethod
+    def to_prometheus(snapshot):
+        """Render a snapshot in the Prometheus text exposition format"""
+        lines = [
+            '# TYPE zirar_candidates_tested_total counter',
+            f"zirar_candidates_tested_total {snapshot['tested']}",
+            '# TYPE zirar_candidates_planned gauge',
+            f"zirar_candidates_planned {snapshot['total']}",
+            '# TYPE zirar_rate_instant gauge',
+            f"zirar_rate_instant {snapshot['rate_instant']}",
+            '# TYPE zirar_rate_ewma gauge',
+            f"zirar_rate_ewma {snapshot['rate_ewma']}",
+            '# TYPE zirar_fast_rejects_total counter',
+            f"zirar_fast_rejects_total {snapshot['fast_rejects']}",
+            '# TYPE zirar_ledger_skips_total counter',
+            f"zirar_ledger_skips_total {snapshot['ledger_skips']}",
+            '# TYPE zirar_filtered_total counter',
+            f"zirar_filtered_total {snapshot['filtered']}",
+            '# TYPE zirar_queue_depth gauge',
+            f"zirar_queue_depth {snapshot['queue_depth']}",
+            '# TYPE zirar_stage_seconds_total counter'
+        ]
+        for stage, seconds in snapshot['stages'].items():
+            lines.append(f'zirar_stage_seconds_total{{stage="{stage}"}} {seconds}')
+
+        lines.append('# TYPE zirar_worker_utilization gauge')
+        for worker_id, worker in snapshot['workers'].items():
+            lines.append(f'zirar_worker_utilization{{worker="{worker_id}"}} {worker["utilization"]}')
+        lines.append('# TYPE zirar_worker_tested_total counter')
+        for worker_id, worker in snapshot['workers'].items():
+            lines.append(f'zirar_worker_tested_total{{worker="{worker_id}"}} {worker["tested"]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serves the current run's metrics as Prometheus text on a local port"""
+
+    def __init__(self, metrics_provider, port, host='127.0.0.1'):
+        # metrics_provider returns the active RunMetrics (or None between runs)
+        self.metrics_provider = metrics_provider
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start serving in a background daemon thread"""
+        provider = self.metrics_provider
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                metrics = provider()
+                body = RunMetrics.to_prometheus(metrics.snapshot()) if metrics else ''
+                payload = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                # Keep scrapes out of the console
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving and release the port"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Run Profiler
+Wraps engine workers in cProfile or a low-overhead stack sampler and merges
+the per-worker results into a single pstats or collapsed-stack file.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+# From Python 3.12 cProfile is built on sys.monitoring, which admits one
+# profiler per process; that profiler then sees the calls of every thread
+SHARED_PROFILE = sys.version_info >= (3, 12)
+
+
+class RunProfiler:
+    """Profiles every worker of a run and merges the results at the end"""
+
+    MODES = ('cprofile', 'sample')
+
+    def __init__(self, mode='cprofile', sample_interval=0.005):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiler mode: {mode}")
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._profiles = []      # cProfile.Profile objects from worker threads
+        self._shared = None      # the one process-wide profile while threads are profiled, see SHARED_PROFILE
+        self._shared_users = 0   # threads running under the shared profile
+        self._stacks = Counter()  # collapsed stack -> sample count
+        self._thread_names = {}  # thread ident -> worker name being sampled
+        self._sampler = None
+        self._sampler_stop = threading.Event()
+
+    def run(self, name, func, *args, **kwargs):
+        """Run func in the calling thread under the profiler"""
+        if self.mode == 'cprofile' and SHARED_PROFILE:
+            return self._run_shared(func, *args, **kwargs)
+        if self.mode == 'cprofile':
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(func, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self._profiles.append(profile)
+
+        ident = threading.get_ident()
+        with self._lock:
+            self._thread_names[ident] = name
+            self._ensure_sampler()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._thread_names.pop(ident, None)
+
+    def _run_shared(self, func, *args, **kwargs):
+        """Run func under a process-wide profile, enabled while any profiled thread runs"""
+        with self._lock:
+            if self._shared is None:
+                self._shared = cProfile.Profile()
+                self._shared.enable()
+            self._shared_users += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._shared_users -= 1
+                if not self._shared_users:
+                    self._shared.disable()
+                    self._profiles.append(self._shared)
+                    self._shared = None
+
+    def _ensure_sampler(self):
+        """Start the sampling thread on first use"""
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample_loop, name='zirar-sampler', daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self):
+        """Periodically record the stacks of all profiled threads"""
+        while not self._sampler_stop.wait(self.sample_interval):
+            with self._lock:
+                targets = dict(self._thread_names)
+            if not targets:
+                continue
+
+            frames = sys._current_frames()
+            samples = []
+            for ident, name in targets.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(name)
+                samples.append(';'.join(reversed(stack)))
+
+            with self._lock:
+                self._stacks.update(samples)
+
+    def stop(self):
+        """Stop background sampling"""
+        self._sampler_stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def write(self, path):
+        """Merge all collected profiles and write them to path"""
+        self.stop()
+
+        if self.mode == 'sample':
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            return path
+
+        sources = list(self._profiles)
+        if not sources:
+            return None
+
+        stats = pstats.Stats(sources[0])
+        for source in sources[1:]:
+            stats.add(source)
+        stats.dump_stats(path)
+        return path
+
+    def summary(self, limit=15):
+        """Return a short text report of the hottest functions or stacks"""
+        if self.mode == 'sample':
+            total = sum(self._stacks.values()) or 1
+            leaves = Counter()
+            for stack, count in self._stacks.items():
+                leaves[stack.rsplit(';', 1)[-1]] += count
+            return '\n'.join(f"{count / total:6.1%}  {frame}" for frame, count in leaves.most_common(limit))
+
+        sources = list(self._profiles)
+        if not sources:
+            return ''
+
+        stream = io.StringIO()
+        stats = pstats.Stats(sources[0], stream=stream)
+        for source in sources[1:]:
+            stats.add(source)
+        stats.sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Run Reports
+One JSON document per run with everything needed to compare runs across
+machines and releases or to feed a job scheduler: the archives and how
+they were verified, the keyspace covered, candidate counts, the rate over
+time, stage timings, hits (optionally redacted) and the stop reason.
+"""
+
+import datetime
+import json
+import os
+import platform
+import time
+
+from archive import archive_fingerprint
+from sources import SourceScheduler
+
+REPORT_VERSION = 1
+
+DEFAULT_REPORT_DIR = os.path.join(os.path.expanduser('~'), '.zirar', 'reports')
+
+# Seconds between rate samples at the start of a run
+RATE_SAMPLE_INTERVAL = 1.0
+
+# Samples kept per run; beyond this the timeline halves its resolution
+MAX_RATE_SAMPLES = 512
+
+
+class RateTimeline:
+    """Candidates tested over a run, sampled at most once per interval
+
+    Long runs stay bounded: when the timeline is full every other sample
+    is dropped and the interval doubles, so a run of any length keeps
+    between MAX_RATE_SAMPLES / 2 and MAX_RATE_SAMPLES evenly spaced points.
+    Fed from the coordinator thread only.
+    """
+
+    def __init__(self, interval=RATE_SAMPLE_INTERVAL, max_samples=MAX_RATE_SAMPLES):
+        self.interval = interval
+        self.max_samples = max(2, max_samples)
+        self.start_time = time.monotonic()
+        self.samples = [(0.0, 0)]  # (elapsed seconds, candidates tested)
+
+    def sample(self, tested, force=False):
+        """Record the tested count if the interval has passed since the last sample (or force is set)"""
+        elapsed = time.monotonic() - self.start_time
+        if not force and elapsed - self.samples[-1][0] < self.interval:
+            return
+        self.samples.append((elapsed, tested))
+        if len(self.samples) > self.max_samples:
+            latest = self.samples[-1]
+            self.samples = self.samples[::2]
+            if self.samples[-1] is not latest:
+                self.samples.append(latest)
+            self.interval *= 2
+
+    def to_list(self):
+        """Samples as dicts with the rate over the interval before each one"""
+        points = []
+        for (previous_elapsed, previous_tested), (elapsed, tested) in zip(self.samples, self.samples[1:]):
+            span = elapsed - previous_elapsed
+            points.append({
+                'elapsed': round(elapsed, 3),
+                'tested': tested,
+                'rate': round((tested - previous_tested) / span, 2) if span > 0 else 0.0
+            })
+        return points
+
+
+def safe_fingerprint(archive_path):
+    """Fingerprint of an archive, or None if it cannot be read"""
+    try:
+        return archive_fingerprint(archive_path)
+    except OSError:
+        return None
+
+
+def machine_info():
+    """The machine a run happened on, for comparing throughput"""
+    return {
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version()
+    }
+
+
+def iso_time(timestamp):
+    """Render a Unix timestamp as local ISO 8601 with its UTC offset"""
+    return datetime.datetime.fromtimestamp(timestamp).astimezone().isoformat(timespec='seconds')
+
+
+def build_run_report(archive_paths, result, metrics, timeline, engine=None, started=None, settings=None,
+                     error=None, redact=False):
+    """Assemble the report of a finished run as a plain dict
+
+    result is the engine's final EngineProgress, or None if the run
+    failed before the engine ran. With redact=True hits keep only their
+    password length.
+    """
+    snapshot = metrics.snapshot()
+    finished = time.time()
+    started = started if started is not None else snapshot['timestamp'] - snapshot['elapsed']
+    solved = result.solved if result is not None else {}
+    ciphers = engine.archive_ciphers if engine is not None else {}
+
+    archives = []
+    hits = []
+    for archive_path in dict.fromkeys(archive_paths):
+        archives.append({
+            'path': os.path.abspath(archive_path),
+            'fingerprint': safe_fingerprint(archive_path),
+            'verifier': ciphers.get(archive_path),
+            'solved': archive_path in solved
+        })
+        if archive_path in solved:
+            password = solved[archive_path]
+            hit = {'archive': os.path.abspath(archive_path), 'length': len(password)}
+            hit.update({'redacted': True} if redact else {'password': password})
+            hits.append(hit)
+
+    if result is not None:
+        stop_reason = result.stop_reason
+        error = error or result.error
+    else:
+        stop_reason = 'error'
+    if error is None and engine is not None and engine.errors:
+        error = engine.errors[0]
+
+    keyspace = {'planned': result.total if result is not None else snapshot['total'], 'resumed': 0,
+                'covered': 0, 'ranges': {}}
+    if engine is not None:
+        keyspace['resumed'] = engine.resumed
+        keyspace['covered'] = engine.coverage.count()
+        keyspace['ranges'] = engine.coverage.ranges()
+        if isinstance(engine.passwords, SourceScheduler):
+            # Budget, elapsed time and final state of every source of a multi-source run
+            keyspace['sources'] = engine.passwords.summary()
+
+    return {
+        'version': REPORT_VERSION,
+        'started': iso_time(started),
+        'finished': iso_time(finished),
+        'duration': round(finished - started, 3),
+        'stop_reason': stop_reason,
+        'error': error,
+        'machine': machine_info(),
+        'settings': settings or {},
+        'archives': archives,
+        'hits': hits,
+        'keyspace': keyspace,
+        'candidates': {
+            'tested': result.tested if result is not None else snapshot['tested'],
+            'fast_rejects': snapshot['fast_rejects'],
+            'ledger_skips': snapshot['ledger_skips'],
+            'filtered': snapshot['filtered']
+        },
+        'rate': {
+            'average': snapshot['rate_average'],
+            'samples': timeline.to_list()
+        },
+        'stages': snapshot['stages'],
+        'workers': snapshot['workers']
+    }
+
+
+def report_file_name(report):
+    """Default file name of a report: start time and the first archive's fingerprint"""
+    stamp = report['started'][:19].replace(':', '').replace('-', '').replace('T', '-')
+    fingerprint = next((archive['fingerprint'] for archive in report['archives'] if archive['fingerprint']), None)
+    return f"{stamp}-{(fingerprint or 'unknown')[:12]}.json"
+
+
+def write_report(report, path=None, report_dir=DEFAULT_REPORT_DIR):
+    """Write a report as JSON, to path or to a new file in report_dir; return the path written"""
+    if path is None:
+        os.makedirs(report_dir, exist_ok=True)
+        name = report_file_name(report)
+        path = os.path.join(report_dir, name)
+        counter = 1
+        while os.path.exists(path):
+            # Several runs on one archive within a second
+            counter += 1
+            path = os.path.join(report_dir, f"{name[:-5]}-{counter}.json")
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    os.replace(temp_path, path)
+    return path
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Shared Candidate Ring
+Fixed-size slots in one multiprocessing.shared_memory block that carry
+candidate batches from the coordinator to worker processes. A slot holds
+the candidate count, an offset table and the UTF-8 bytes of the candidates
+in one block, so only slot numbers and small result records cross the
+process boundary instead of pickled strings. Also holds the shared stop
+flag every worker process polls.
+"""
+
+import array
+import itertools
+import struct
+from multiprocessing import shared_memory
+
+# Slot layout: candidate count, count + 1 offsets into the data block, then the
+# data block: the candidates joined by SEPARATOR, so most slots decode with one split
+SEPARATOR = '\n'
+SLOT_HEADER_FORMAT = '<I'
+SLOT_HEADER_SIZE = struct.calcsize(SLOT_HEADER_FORMAT)
+OFFSET_SIZE = 4
+
+DEFAULT_SLOT_SIZE = 1 << 20
+
+# Reasons a StopFlag can carry, stored as their index + 1 (0 means not set)
+STOP_REASONS = ('found', 'stopped', 'error', 'cancelled')
+
+# Candidates are stored with lone surrogates intact so they decode back unchanged
+ENCODING_ERRORS = 'surrogatepass'
+
+
+class CandidateRing:
+    """Slots of packed candidate batches in one shared memory block
+
+    The coordinator creates the ring and owns the slot bookkeeping: a slot
+    is packed, its number is sent to a worker, and it is only reused after
+    that worker has returned its result record. Workers attach by name and
+    decode candidates straight out of the shared block.
+    """
+
+    def __init__(self, slot_count, slot_size=DEFAULT_SLOT_SIZE, name=None):
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.owner = name is None  # only the creator unlinks the block
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=slot_count * slot_size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+
+    @property
+    def name(self):
+        """Name worker processes attach to"""
+        return self.memory.name
+
+    def pack(self, slot, passwords):
+        """Pack as many passwords as fit into a slot; return how many were packed"""
+        count = len(passwords)
+        blob = SEPARATOR.join(passwords).encode('utf-8', ENCODING_ERRORS)
+        if len(blob) == sum(map(len, passwords)) + count - 1 or not count:
+            lengths = list(map(len, passwords))  # ASCII only: characters are bytes
+        else:
+            lengths = [len(password.encode('utf-8', ENCODING_ERRORS)) for password in passwords]
+        while count and SLOT_HEADER_SIZE + OFFSET_SIZE * (count + 1) + len(blob) > self.slot_size:
+            # Rare with megabyte slots: halve until the batch fits, the rest goes in the next slot
+            count //= 2
+            blob = SEPARATOR.join(passwords[:count]).encode('utf-8', ENCODING_ERRORS)
+        if passwords and not count:
+            raise ValueError(f"Candidate longer than a ring slot ({self.slot_size} bytes)")
+
+        # offsets[i] is where candidate i starts; one separator byte follows each
+        offsets = array.array('I', [0])
+        offsets.extend(itertools.accumulate(length + 1 for length in lengths[:count]))
+
+        buf = self.memory.buf
+        base = slot * self.slot_size
+        struct.pack_into(SLOT_HEADER_FORMAT, buf, base, count)
+        table_start = base + SLOT_HEADER_SIZE
+        data_start = table_start + OFFSET_SIZE * (count + 1)
+        buf[table_start:data_start] = offsets.tobytes()
+        buf[data_start:data_start + len(blob)] = blob
+        return count
+
+    def read(self, slot):
+        """Return the candidates in a slot, decoded straight from shared memory"""
+        buf = self.memory.buf
+        base = slot * self.slot_size
+        count = struct.unpack_from(SLOT_HEADER_FORMAT, buf, base)[0]
+        if not count:
+            return []
+        table_start = base + SLOT_HEADER_SIZE
+        data_start = table_start + OFFSET_SIZE * (count + 1)
+        with buf[table_start:data_start] as table, table.cast('I') as offsets:
+            bounds = offsets.tolist()
+        with buf[data_start:data_start + bounds[-1] - 1] as data:
+            passwords = str(data, 'utf-8', ENCODING_ERRORS).split(SEPARATOR)
+            if len(passwords) == count:
+                return passwords
+            # Some candidate contains the separator: fall back to the offset table
+            return [str(data[start:end - 1], 'utf-8', ENCODING_ERRORS) for start, end in zip(bounds, bounds[1:])]
+
+    def close(self):
+        """Detach from the block, removing it if this process created it"""
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class StopFlag:
+    """One shared byte that any process can set and every process can poll
+
+    Reading it is a plain memory access, several times cheaper than
+    multiprocessing.Event.is_set(), so workers can check it between
+    candidates. Once set it stays set; if two processes set it at the same
+    moment, either reason may be the one kept.
+    """
+
+    def __init__(self, name=None):
+        self.owner = name is None  # only the creator unlinks the block
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=1)
+            self.memory.buf[0] = 0
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.buf = self.memory.buf
+
+    @property
+    def name(self):
+        """Name worker processes attach to"""
+        return self.memory.name
+
+    def is_set(self):
+        """True once any process has set the flag"""
+        return self.buf[0] != 0
+
+    @property
+    def reason(self):
+        """Reason the flag was set with, or None"""
+        code = self.buf[0]
+        return STOP_REASONS[code - 1] if code else None
+
+    def set(self, reason='cancelled'):
+        """Set the flag unless it is already set"""
+        if not self.buf[0]:
+            code = STOP_REASONS.index(reason) + 1 if reason in STOP_REASONS else len(STOP_REASONS)
+            self.buf[0] = code
+
+    def close(self):
+        """Detach from the block, removing it if this process created it"""
+        self.buf.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Candidate Sources
+Masks and several wordlists in one run. Each source has a priority and an
+optional candidate or time budget; a weighted scheduler interleaves their
+batches, so small high-yield sources finish early while large ones fill
+the remaining capacity. Nothing is concatenated into one list up front.
+"""
+
+import string
+import time
+from collections import namedtuple
+
+# Mask placeholders (hashcat style); '??' is a literal question mark
+MASK_CHARSETS = {
+    'l': string.ascii_lowercase,
+    'u': string.ascii_uppercase,
+    'd': string.digits,
+    's': ' ' + string.punctuation,
+    'a': string.ascii_lowercase + string.ascii_uppercase + string.digits + ' ' + string.punctuation,
+    '?': '?'
+}
+
+# Source kinds a spec can name, and the options that may follow
+SOURCE_KINDS = ('list', 'mask')
+SOURCE_OPTIONS = ('priority', 'limit', 'seconds', 'rules')
+
+# What a --source spec parses into; limit and seconds are None when unbounded
+SourceSpec = namedtuple('SourceSpec', 'kind value priority limit seconds rules')
+
+# Candidates handed out by a streamed source: key names the source, start is the
+# position of the first candidate in it, so the batch covers [start, start + len)
+CandidateBatch = namedtuple('CandidateBatch', 'key start passwords')
+
+
+class MaskSource:
+    """Every candidate a mask describes, generated on demand by index
+
+    Positions vary like an odometer, the last one fastest, so a slice of
+    indices is one contiguous run of candidates and the engine can queue
+    index slices exactly as it does for a compiled wordlist.
+    """
+
+    def __init__(self, mask):
+        self.mask = mask
+        self.charsets = parse_mask(mask)
+        self.count = charset_product(self.charsets)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(self.count)
+            return self.generate(start, stop)
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("mask index out of range")
+        return self.generate(index, index + 1)[0]
+
+    def restrict(self, candidate_filter):
+        """Prune the charsets to what a CandidateFilter allows; return True if every candidate left passes it"""
+        self.charsets, exact = candidate_filter.restrict_charsets(self.charsets)
+        self.count = charset_product(self.charsets)
+        return exact
+
+    def generate(self, start, stop):
+        """Return the candidates with indices start to stop - 1"""
+        if start >= stop:
+            return []
+        # Decompose the first index into one digit per position, then count up
+        digits = []
+        value = start
+        for charset in reversed(self.charsets):
+            value, digit = divmod(value, len(charset))
+            digits.append(digit)
+        digits.reverse()
+
+        charsets = self.charsets
+        last = len(charsets) - 1
+        if last < 0:
+            return ['']
+        tail = charsets[last]
+        candidates = []
+        remaining = stop - start
+        while remaining:
+            prefix = ''.join(charset[digit] for charset, digit in zip(charsets, digits[:last]))
+            # Run through the rest of the fastest position in one go
+            run = tail[digits[last]:digits[last] + remaining]
+            candidates.extend(prefix + char for char in run)
+            remaining -= len(run)
+            digits[last] = 0
+            position = last - 1
+            while position >= 0:
+                digits[position] += 1
+                if digits[position] < len(charsets[position]):
+                    break
+                digits[position] = 0
+                position -= 1
+        return candidates
+
+
+def parse_mask(mask):
+    """Return one charset string per position of a mask"""
+    charsets = []
+    index = 0
+    while index < len(mask):
+        char = mask[index]
+        if char == '?':
+            if index + 1 >= len(mask) or mask[index + 1] not in MASK_CHARSETS:
+                raise ValueError(f"Unknown mask placeholder at position {index} of {mask!r}")
+            charsets.append(MASK_CHARSETS[mask[index + 1]])
+            index += 2
+        else:
+            charsets.append(char)
+            index += 1
+    return charsets
+
+
+def charset_product(charsets):
+    """Number of candidates a list of per-position charsets describes"""
+    count = 1
+    for charset in charsets:
+        count *= len(charset)
+    return count
+
+
+def is_source_spec(text):
+    """True if text is a key=value source spec rather than a plain wordlist path"""
+    return text.partition('=')[0] in SOURCE_KINDS
+
+
+def parse_source_spec(text, rules=True):
+    """Parse 'list=PATH' or 'mask=MASK' followed by ',priority=N', ',limit=N', ',seconds=S' or ',rules=on|off'
+
+    A plain path is a list with the defaults. rules is the default for
+    enhancing lists; masks are never enhanced.
+    """
+    if not is_source_spec(text):
+        return SourceSpec('list', text, 1.0, None, None, rules)
+
+    kind, _, rest = text.partition('=')
+    parts = rest.split(',')
+    value_parts = parts[:1]
+    options = {}
+    for part in parts[1:]:
+        option, separator, setting = part.partition('=')
+        if separator and option in SOURCE_OPTIONS:
+            options[option] = setting
+        elif options:
+            raise ValueError(f"Unknown source option {part!r} in {text}")
+        else:
+            value_parts.append(part)  # a comma inside the path or mask itself
+    value = ','.join(value_parts)
+    try:
+        priority = float(options.get('priority', 1.0))
+        limit = int(options['limit']) if 'limit' in options else None
+        seconds = float(options['seconds']) if 'seconds' in options else None
+    except ValueError:
+        raise ValueError(f"Invalid source spec: {text}")
+    if priority <= 0 or (limit is not None and limit < 0) or (seconds is not None and seconds < 0):
+        raise ValueError(f"Priority must be positive and budgets non-negative: {text}")
+    if 'rules' in options:
+        if options['rules'] not in ('on', 'off'):
+            raise ValueError(f"rules must be on or off: {text}")
+        rules = options['rules'] == 'on'
+    if not value:
+        raise ValueError(f"Source spec has no {kind}: {text}")
+    return SourceSpec(kind, value, priority, limit, seconds, rules and kind == 'list')
+
+
+class CandidateSource:
+    """One loaded source with its priority, budgets and progress
+
+    Wraps anything the engine can test on its own: a list, a
+    CompiledWordlist, a MaskSource (sliced by index) or a
+    StreamingWordlist (read through its own iter_batches).
+    """
+
+    def __init__(self, name, passwords, priority=1.0, limit=None, seconds=None):
+        self.name = name
+        self.passwords = passwords
+        self.priority = priority
+        self.limit = limit  # candidates this source may hand out at most
+        self.seconds = seconds  # wall-clock seconds after its first batch before it is dropped
+        self.produced = 0
+        self.started = None
+        self.finished = None  # when it left the rotation
+        self.state = 'pending'  # pending, active, exhausted, limit or time
+
+    def estimated_total(self):
+        """Candidates this source is expected to hand out in the run"""
+        if self.state not in ('pending', 'active'):
+            return self.produced
+        if hasattr(self.passwords, 'estimated_total'):
+            total = self.passwords.estimated_total()
+        else:
+            total = len(self.passwords)
+        return total if self.limit is None else min(total, self.limit)
+
+    def iter_batches(self, batch_size):
+        """Yield batches of at most batch_size candidates"""
+        if hasattr(self.passwords, 'iter_batches'):
+            yield from self.passwords.iter_batches(batch_size)
+            return
+        for start in range(0, len(self.passwords), batch_size):
+            yield self.passwords[start:start + batch_size]
+
+    def summary(self):
+        """Plain dict of this source's settings and progress"""
+        return {
+            'name': self.name,
+            'priority': self.priority,
+            'limit': self.limit,
+            'seconds': self.seconds,
+            'produced': self.produced,
+            'elapsed': round(self.elapsed(), 3),
+            'state': self.state
+        }
+
+    def elapsed(self):
+        """Seconds from the source's first batch until it left the rotation, or until now"""
+        if self.started is None:
+            return 0.0
+        return (self.finished if self.finished is not None else time.monotonic()) - self.started
+
+
+class SourceScheduler:
+    """Interleaves the batches of several sources by priority
+
+    Smooth weighted round robin: every turn each live source gains its
+    priority in credit, the one with the most credit hands out the next
+    batch and pays back the sum of all priorities. A source of priority 3
+    next to one of priority 1 thus gets three batches out of every four,
+    spread evenly, and the whole capacity once the other one is done. A
+    source leaves the rotation when it runs dry or hits its budget.
+
+    The engine reads it like a streaming wordlist, from its feeder thread;
+    each batch is keyed by its source so coverage is tracked per source.
+    """
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+
+    def __len__(self):
+        return len(self.sources)
+
+    def estimated_total(self):
+        """Sum of what every source is expected to hand out"""
+        return sum(source.estimated_total() for source in self.sources)
+
+    def iter_batches(self, batch_size):
+        """Yield CandidateBatch items of all sources, interleaved, until every one is done"""
+        live = [(source, source.iter_batches(batch_size)) for source in self.sources]
+        credit = {id(source): 0.0 for source in self.sources}
+        try:
+            while live:
+                total_priority = sum(source.priority for source, _ in live)
+                for source, _ in live:
+                    credit[id(source)] += source.priority
+                turn = max(range(len(live)), key=lambda index: credit[id(live[index][0])])
+                source, batches = live[turn]
+                credit[id(source)] -= total_priority
+
+                start = source.produced
+                batch = self.next_batch(source, batches)
+                if batch is None:
+                    batches.close()
+                    del live[turn]
+                    credit.pop(id(source))
+                    continue
+                yield CandidateBatch(source.name, start, batch)
+        finally:
+            for source, batches in live:
+                batches.close()
+
+    def next_batch(self, source, batches):
+        """Return the source's next batch within its budgets, or None once it is done"""
+        now = time.monotonic()
+        if source.started is None:
+            source.started = now
+            source.state = 'active'
+        if source.seconds is not None and now - source.started >= source.seconds:
+            source.state, source.finished = 'time', now
+            return None
+        if source.limit is not None and source.produced >= source.limit:
+            source.state, source.finished = 'limit', now
+            return None
+        batch = next(batches, None)
+        if batch is None:
+            source.state, source.finished = 'exhausted', time.monotonic()
+            return None
+        if source.limit is not None and source.produced + len(batch) > source.limit:
+            batch = batch[:source.limit - source.produced]
+        source.produced += len(batch)
+        return batch
+
+    def summary(self):
+        """Settings and progress of every source, in the order given"""
+        return [source.summary() for source in self.sources]
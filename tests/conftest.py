@@ -0,0 +1,60 @@
+"""Shared fixtures: the repository modules on sys.path and small ZipCrypto archives built on the fly"""
+
+import os
+import struct
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zipcrypto  # noqa: E402
+
+CENTRAL_HEADER_FORMAT = '<4s6HI2I5H2I'
+END_RECORD_FORMAT = '<4s4H2IH'
+
+
+def encrypt(password, data):
+    """Encrypt bytes with the ZipCrypto stream cipher keyed by password"""
+    keys = zipcrypto.derive_keys(password)
+    encrypted = bytearray()
+    for byte in data:
+        temp = keys[2] | 2
+        encrypted.append(byte ^ (((temp * (temp ^ 1)) >> 8) & 0xFF))
+        keys = zipcrypto.update_keys(keys, (byte,))
+    return bytes(encrypted)
+
+
+def write_zipcrypto(path, password, members):
+    """Write a ZIP archive of deflated members encrypted with ZipCrypto (zipfile can only read these)"""
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    local = bytearray()
+    central = bytearray()
+    for index, (name, data) in enumerate(members.items()):
+        name = name.encode('utf-8')
+        crc = zlib.crc32(data)
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        # Eleven arbitrary bytes, then the check byte a password is verified against
+        header = bytes((index * 31 + offset) & 0xFF for offset in range(11)) + bytes([crc >> 24])
+        payload = encrypt(password, header + compressed)
+        fields = (1, 8, 0, 0x21, crc, len(payload), len(data), len(name), 0)
+        central += struct.pack(CENTRAL_HEADER_FORMAT, b'PK\x01\x02', 20, 20, *fields, 0, 0, 0, 0, len(local))
+        central += name
+        local += struct.pack(zipcrypto.LOCAL_HEADER_FORMAT, b'PK\x03\x04', 20, *fields) + name + payload
+    end = struct.pack(END_RECORD_FORMAT, b'PK\x05\x06', 0, 0, len(members), len(members), len(central),
+                      len(local), 0)
+    with open(path, 'wb') as f:
+        f.write(bytes(local) + bytes(central) + end)
+    return str(path)
+
+
+@pytest.fixture
+def zipcrypto_archive(tmp_path):
+    """Factory for ZipCrypto archives in the test's temporary directory"""
+    def make(password, members=None, name='archive.zip'):
+        members = members or {'secret.txt': b'The archive was opened with the right password.\n' * 20}
+        return write_zipcrypto(tmp_path / name, password, members)
+    return make
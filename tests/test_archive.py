@@ -0,0 +1,40 @@
+"""Passwords are verified from the archive buffer, whole in memory or a member mapped from disk"""
+
+import mmap
+import os
+
+from archive import ArchiveBuffer
+from engine import ArchiveVerifier
+
+PASSWORD = 'k7q'
+MEMBERS = {f"file{index}.txt": b'contents %d\n' % index * 50 for index in range(3)}
+
+
+def test_a_mapped_member_is_read_through_the_mapping(zipcrypto_archive):
+    archive_path = zipcrypto_archive(PASSWORD, MEMBERS)
+    buffer = ArchiveBuffer(archive_path, preload_limit=0)
+    assert buffer.mode == 'member' and buffer.partial
+    local_record = buffer.segments[0]
+    assert isinstance(local_record, memoryview) and isinstance(local_record.obj, mmap.mmap)
+
+    verifier = ArchiveVerifier({archive_path: buffer})
+    try:
+        assert verifier.test_password(PASSWORD, archive_path)
+        assert not verifier.test_password('wrong', archive_path)
+    finally:
+        verifier.close()
+
+
+def test_an_archive_in_memory_confirms_hits_without_the_file(zipcrypto_archive):
+    archive_path = zipcrypto_archive(PASSWORD, MEMBERS)
+    buffer = ArchiveBuffer(archive_path)
+    assert buffer.mode == 'memory' and buffer.others and not buffer.partial
+    # Every member is checked on a hit, and none of them is read from disk
+    os.remove(archive_path)
+
+    verifier = ArchiveVerifier({archive_path: buffer})
+    try:
+        assert verifier.test_password(PASSWORD, archive_path)
+        assert not verifier.test_password('wrong', archive_path)
+    finally:
+        verifier.close()
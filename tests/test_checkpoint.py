@@ -0,0 +1,123 @@
+"""Keyspace coverage: merging ranges, finding gaps and resuming a run from a checkpoint"""
+
+import pytest
+
+from checkpoint import CANDIDATES_KEY, KeyspaceCoverage, RunBudget, keyspace_identity
+from engine import BatchEngine, load_password_list
+from filters import CandidateFilter
+from sources import parse_source_spec
+
+PASSWORD = 'not-in-the-list'
+
+
+def test_ranges_merge_in_any_order():
+    coverage = KeyspaceCoverage()
+    coverage.add('list', 20, 30)
+    coverage.add('list', 0, 10)
+    coverage.add('list', 40, 50)
+    coverage.add('list', 10, 20)  # touches both neighbours
+    coverage.add('list', 45, 48)  # already covered
+    coverage.add('list', 5, 5)  # empty
+    coverage.add('mask', 0, 7)
+
+    assert coverage.ranges() == {'list': [[0, 30], [40, 50]], 'mask': [[0, 7]]}
+    assert coverage.count('list') == 40
+    assert coverage.count() == 47
+    assert coverage.uncovered('list', 0, 60) == [(30, 40), (50, 60)]
+    assert coverage.uncovered('list', 25, 45) == [(30, 40)]
+    assert coverage.uncovered('list', 0, 30) == []
+    assert coverage.uncovered('other', 3, 9) == [(3, 9)]
+
+
+def test_overlapping_range_absorbs_several():
+    coverage = KeyspaceCoverage({'list': [[0, 5], [10, 15], [20, 25]]})
+    coverage.add('list', 3, 22)
+    assert coverage.ranges() == {'list': [[0, 25]]}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'run.ckpt')
+    assert KeyspaceCoverage.load(path).ranges() == {}
+    coverage = KeyspaceCoverage()
+    coverage.add(CANDIDATES_KEY, 100, 200)
+    coverage.add(CANDIDATES_KEY, 0, 50)
+    coverage.save(path, reason='candidate_limit')
+
+    loaded = KeyspaceCoverage.load(path)
+    assert loaded.ranges() == {CANDIDATES_KEY: [[0, 50], [100, 200]]}
+    assert loaded.uncovered(CANDIDATES_KEY, 0, 250) == [(50, 100), (200, 250)]
+
+
+def test_load_rejects_another_checkpoint_version(tmp_path):
+    path = tmp_path / 'run.ckpt'
+    path.write_text('{"version": 99, "ranges": {}}', encoding='utf-8')
+    with pytest.raises(ValueError):
+        KeyspaceCoverage.load(str(path))
+
+
+@pytest.mark.parametrize('ranged', [False, True], ids=['list', 'ranged'])
+def test_budgeted_runs_resume_from_the_checkpoint(tmp_path, zipcrypto_archive, ranged):
+    archive_path = zipcrypto_archive(PASSWORD)
+    wordlist_path = tmp_path / 'words.txt'
+    words = [f"w{index:05d}" for index in range(30001)]
+    wordlist_path.write_text('\n'.join(words) + '\n', encoding='utf-8')
+    checkpoint_path = str(tmp_path / 'run.ckpt')
+
+    results = []
+    for _ in range(6):
+        coverage = KeyspaceCoverage.load(checkpoint_path)
+        passwords = load_password_list(str(wordlist_path), False, ranged=ranged)
+        engine = BatchEngine([archive_path], passwords, worker_count=2, budget=RunBudget(candidates=8000),
+                             coverage=coverage)
+        result = engine.run_sync()
+        coverage.save(checkpoint_path, reason=result.stop_reason)
+        results.append(result)
+        if result.stop_reason != 'candidate_limit':
+            break
+
+    # Every window tests new candidates only, so the windows add up to the list exactly
+    assert [result.stop_reason for result in results] == ['candidate_limit'] * 3 + ['exhausted']
+    assert [result.tested for result in results] == [8000, 8000, 8000, len(words) - 24000]
+
+    engine = BatchEngine([archive_path], load_password_list(str(wordlist_path), False, ranged=ranged),
+                         coverage=KeyspaceCoverage.load(checkpoint_path))
+    result = engine.run_sync()
+    assert (result.stop_reason, result.tested) == ('exhausted', 0)
+
+
+def test_load_refuses_a_checkpoint_of_other_sources_or_settings(tmp_path):
+    wordlist_path = tmp_path / 'words.txt'
+    wordlist_path.write_text('alpha\nbeta\n', encoding='utf-8')
+    path = str(tmp_path / 'run.ckpt')
+    specs = [parse_source_spec(str(wordlist_path))]
+    identity = keyspace_identity(specs, CandidateFilter(min_length=4))
+    coverage = KeyspaceCoverage.load(path, identity)
+    coverage.add(CANDIDATES_KEY, 0, 2)
+    coverage.save(path)
+
+    assert KeyspaceCoverage.load(path, identity).ranges() == {CANDIDATES_KEY: [[0, 2]]}
+    for other in (keyspace_identity([parse_source_spec(str(wordlist_path), False)], CandidateFilter(min_length=4)),
+                  keyspace_identity(specs, CandidateFilter(min_length=5)),
+                  keyspace_identity(specs + [parse_source_spec('mask=?d?d')], CandidateFilter(min_length=4))):
+        with pytest.raises(ValueError):
+            KeyspaceCoverage.load(path, other)
+
+    # Editing the list changes its size and modification time
+    wordlist_path.write_text('alpha\nbeta\ngamma\n', encoding='utf-8')
+    with pytest.raises(ValueError):
+        KeyspaceCoverage.load(path, keyspace_identity(specs, CandidateFilter(min_length=4)))
+
+
+def test_ranges_given_out_again_under_a_budget_are_counted_once(tmp_path, zipcrypto_archive):
+    archive_path = zipcrypto_archive(PASSWORD)
+    wordlist_path = tmp_path / 'words.txt'
+    # A few long lines then many short ones, so the first range returns budget the cut-short second range gets
+    lines = ['y' * 200 + str(index) for index in range(300)] + [f"x{index}" for index in range(9000)]
+    wordlist_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    passwords = load_password_list(str(wordlist_path), True, ranged=True)
+    engine = BatchEngine([archive_path], passwords, worker_count=2, processes=True, budget=RunBudget(candidates=5000))
+    result = engine.run_sync()
+
+    assert (result.stop_reason, result.tested) == ('candidate_limit', 5000)
+    size = wordlist_path.stat().st_size
+    assert all(covered <= size for covered in passwords.covered.values())
@@ -0,0 +1,60 @@
+"""Coordinator and node processes on localhost, with a node lost in the middle of a lease"""
+
+import multiprocessing
+import time
+
+from distributed import LeaseCoordinator, run_node
+
+PASSWORD = 'zz-found'
+
+
+def wait_until(condition, timeout=30.0):
+    """Poll condition until it holds; fail the test after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_killed_node_lease_is_reissued_and_counted_once(tmp_path, zipcrypto_archive):
+    archive_path = zipcrypto_archive(PASSWORD)
+    wordlist_path = tmp_path / 'words.txt'
+    words = [f"w{index:06d}" for index in range(48000)] + [PASSWORD]
+    wordlist_path.write_text('\n'.join(words) + '\n', encoding='utf-8')
+
+    events = []
+    coordinator = LeaseCoordinator(archive_path, str(wordlist_path), port=0, chunk_size=64 * 1024,
+                                   lease_timeout=1.0, heartbeat_interval=0.05, enhance_passwords=False,
+                                   on_event=events.append)
+    coordinator.start()
+    context = multiprocessing.get_context('spawn')
+    nodes = []
+    try:
+        # The first node is killed as soon as it has reported progress on a lease
+        first = context.Process(target=run_node, args=('127.0.0.1', coordinator.port, archive_path,
+                                                       str(wordlist_path)), daemon=True)
+        first.start()
+        nodes.append(first)
+        wait_until(lambda: coordinator.tested > 0)
+        first.kill()
+        first.join()
+        wait_until(lambda: any(event['type'] == 'lease_expired' for event in events))
+        assert coordinator.tested == sum(coordinator.completed.values())
+
+        second = context.Process(target=run_node, args=('127.0.0.1', coordinator.port, archive_path,
+                                                        str(wordlist_path)), daemon=True)
+        second.start()
+        nodes.append(second)
+        assert coordinator.wait(60) == PASSWORD
+        second.join(30)
+    finally:
+        coordinator.stop()
+        for node in nodes:
+            if node.is_alive():
+                node.kill()
+
+    # The password is the last line, so every other chunk was finished exactly once
+    # and every candidate up to the hit was counted once, including the expired lease's
+    assert coordinator.stop_reason == 'found'
+    assert sorted(coordinator.completed) == list(range(len(coordinator.chunks) - 1))
+    assert coordinator.tested == len(words)
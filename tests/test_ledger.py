@@ -0,0 +1,78 @@
+"""The already-tried ledger survives closing and reopening its file"""
+
+import pytest
+
+from ledger import PasswordLedger, candidate_hash
+
+
+def test_added_candidates_are_found_after_reopen(tmp_path):
+    path = str(tmp_path / 'archive.ledger')
+    ledger = PasswordLedger(path)
+    for password in ('alpha', 'beta', 'pässwörd'):
+        ledger.add(password)
+    ledger.add('pässwörd'.encode('cp437'))
+    assert 'alpha' not in ledger  # buffered until the next flush
+    ledger.close()
+
+    reopened = PasswordLedger(path)
+    try:
+        assert len(reopened) == 4
+        assert 'alpha' in reopened and 'beta' in reopened and 'pässwörd' in reopened
+        assert 'pässwörd'.encode('cp437') in reopened
+        assert 'gamma' not in reopened
+        assert 'pässwörd'.encode('cp1252') not in reopened
+    finally:
+        reopened.close()
+
+
+def test_flushes_merge_with_the_file_without_duplicates(tmp_path):
+    path = str(tmp_path / 'archive.ledger')
+    first = PasswordLedger(path)
+    first.add('alpha')
+    first.add('beta')
+    first.close()
+
+    second = PasswordLedger(path)
+    second.add('beta')
+    second.add('gamma')
+    second.flush()
+    assert len(second) == 3
+    second.close()
+
+    reopened = PasswordLedger(path)
+    try:
+        assert [password in reopened for password in ('alpha', 'beta', 'gamma', 'delta')] == [True] * 3 + [False]
+    finally:
+        reopened.close()
+
+
+def test_hashes_taken_from_one_ledger_are_recorded_by_another(tmp_path):
+    # Worker processes look candidates up in their own view and hand the hashes to the coordinator
+    path = str(tmp_path / 'archive.ledger')
+    worker = PasswordLedger(path)
+    worker.add('alpha')
+    worker.add(b'caf\x82')
+    hashes = worker.take_pending()
+    worker.close()
+    assert list(hashes) == [candidate_hash('alpha'), candidate_hash(b'caf\x82')]
+
+    coordinator = PasswordLedger(path)
+    coordinator.add_hashes(hashes)
+    coordinator.close()
+    reopened = PasswordLedger(path)
+    try:
+        assert 'alpha' in reopened and b'caf\x82' in reopened
+    finally:
+        reopened.close()
+
+
+def test_str_candidates_hash_as_their_utf8_bytes():
+    assert candidate_hash('pässwörd') == candidate_hash('pässwörd'.encode('utf-8'))
+    assert candidate_hash('pässwörd') != candidate_hash('pässwörd'.encode('cp437'))
+
+
+def test_rejects_a_file_that_is_not_a_ledger(tmp_path):
+    path = tmp_path / 'archive.ledger'
+    path.write_bytes(b'not a ledger at all')
+    with pytest.raises(ValueError):
+        PasswordLedger(str(path))
@@ -0,0 +1,60 @@
+"""Candidate batches survive a trip through the shared-memory ring"""
+
+import pytest
+
+from sharedring import SEPARATOR, CandidateRing
+
+
+@pytest.fixture
+def ring():
+    ring = CandidateRing(2, 256)
+    yield ring
+    ring.close()
+
+
+def test_candidates_with_the_separator_read_back_unchanged(ring):
+    passwords = ['plain', f"two{SEPARATOR}lines", '', 'pässwörd', f"{SEPARATOR}", 'lone \udcff surrogate']
+    assert ring.pack(0, passwords) == len(passwords)
+    assert ring.read(0) == passwords
+
+
+def test_empty_batch(ring):
+    assert ring.pack(1, []) == 0
+    assert ring.read(1) == []
+
+
+def test_slots_are_reused_round_the_ring(ring):
+    # More batches than slots, each packed into the next slot and read before it comes round again
+    batches = [[f"batch{index}-{position}" for position in range(5)] for index in range(7)]
+    for index, batch in enumerate(batches):
+        slot = index % ring.slot_count
+        assert ring.pack(slot, batch) == len(batch)
+        assert ring.read(slot) == batch
+
+
+def test_a_batch_larger_than_a_slot_wraps_into_the_next(ring):
+    passwords = [f"candidate-{index:04d}" for index in range(40)]
+    read = []
+    slot = 0
+    rest = passwords
+    while rest:
+        count = ring.pack(slot, rest)
+        assert 0 < count < len(passwords)
+        read.extend(ring.read(slot))
+        rest = rest[count:]
+        slot = (slot + 1) % ring.slot_count
+    assert read == passwords
+
+
+def test_a_candidate_longer_than_a_slot_is_rejected(ring):
+    with pytest.raises(ValueError):
+        ring.pack(0, ['x' * 300])
+
+
+def test_workers_read_through_their_own_attachment(ring):
+    ring.pack(1, ['shared', 'memory'])
+    attached = CandidateRing(ring.slot_count, ring.slot_size, name=ring.name)
+    try:
+        assert attached.read(1) == ['shared', 'memory']
+    finally:
+        attached.close()
@@ -0,0 +1,67 @@
+"""Masks generate by index and are pruned by candidate filters"""
+
+import pytest
+
+from filters import CandidateFilter
+from sources import MaskSource
+
+
+def full_mask(mask):
+    """Every candidate of a mask, unpruned"""
+    return MaskSource(mask)[:]
+
+
+def test_indices_count_like_an_odometer():
+    mask = MaskSource('a?d?l')
+    assert len(mask) == 260
+    assert mask[0] == 'a0a' and mask[1] == 'a0b' and mask[26] == 'a1a' and mask[-1] == 'a9z'
+    assert mask[25:28] == ['a0z', 'a1a', 'a1b']
+    assert mask.generate(0, 260) == [f"a{digit}{letter}" for digit in '0123456789'
+                                     for letter in 'abcdefghijklmnopqrstuvwxyz']
+
+
+def test_forbidding_a_class_prunes_the_charsets_exactly():
+    candidate_filter = CandidateFilter(forbid=('upper', 'special'))
+    mask = MaskSource('?a?d')
+    assert mask.restrict(candidate_filter)
+    assert len(mask) == 36 * 10
+    assert mask[:] == [password for password in full_mask('?a?d') if candidate_filter.accepts(password)]
+
+
+def test_a_required_class_one_position_guarantees_is_exact():
+    candidate_filter = CandidateFilter(require=('digit',))
+    mask = MaskSource('?l?d')
+    assert mask.restrict(candidate_filter)
+    assert mask[:] == full_mask('?l?d')
+
+
+def test_a_required_class_no_position_guarantees_needs_the_batch_check():
+    candidate_filter = CandidateFilter(require=('digit',), forbid=('special',))
+    mask = MaskSource('?a?a')
+    assert not mask.restrict(candidate_filter)
+    generated = mask[:]
+    assert len(generated) == 62 * 62
+    # The pruned mask still produces everything that passes; the per-batch check drops the rest
+    expected = [password for password in full_mask('?a?a') if candidate_filter.accepts(password)]
+    assert candidate_filter.apply(generated) == expected
+
+
+def test_a_pattern_is_never_exact():
+    candidate_filter = CandidateFilter(pattern='^a')
+    mask = MaskSource('?l?d')
+    assert not mask.restrict(candidate_filter)
+    assert len(mask) == 260
+    assert candidate_filter.apply(mask[:]) == [f"a{digit}" for digit in '0123456789']
+
+
+@pytest.mark.parametrize('candidate_filter', [
+    CandidateFilter(min_length=4),
+    CandidateFilter(max_length=2),
+    CandidateFilter(require=('upper',)),
+    CandidateFilter(forbid=('digit',)),
+], ids=['too-short', 'too-long', 'missing-class', 'forbidden-position'])
+def test_a_mask_no_candidate_can_pass_produces_nothing(candidate_filter):
+    mask = MaskSource('?l?d?d')
+    assert mask.restrict(candidate_filter)
+    assert len(mask) == 0
+    assert mask[:] == []
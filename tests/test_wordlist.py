@@ -0,0 +1,57 @@
+"""Text lists read by range give the candidates of the whole list enhanced at once"""
+
+from collections import Counter
+
+from engine import PasswordEnhancer, load_password_list
+from wordlist import RangedWordlist, get_password_count
+
+# 'admin' appears in two ranges, so the variations it adds are generated by both
+WORDS = ['password', 'letmein', 'admin', 'summer', 'dragon', 'Password', 'admin', 'monkey', 'sunshine', 'trust']
+
+
+def ranged_candidates(wordlist):
+    """Every candidate the ranges of a RangedWordlist generate, in testing order"""
+    return [password for descriptor in wordlist.plan() for password in wordlist.generate(descriptor)]
+
+
+def test_ranges_repeat_only_variations_another_range_also_gives(tmp_path):
+    path = tmp_path / 'words.txt'
+    path.write_text('\n'.join(WORDS) + '\n', encoding='utf-8')
+    whole = load_password_list(str(path), True)
+    wordlist = RangedWordlist(str(path), PasswordEnhancer.enhance_password_list, range_size=40)
+    assert len(wordlist.plan()) > 2
+    ranged = ranged_candidates(wordlist)
+
+    # Originals come first either way, then the same set of variations
+    assert ranged[:len(WORDS)] == whole[:len(WORDS)] == WORDS
+    assert set(ranged) == set(whole)
+    # Only the variations two ranges both add come up twice
+    repeats = Counter(ranged) - Counter(whole)
+    assert set(repeats) == set(PasswordEnhancer.enhance_password_list(['admin'])[1:])
+    assert all(count == 1 for count in repeats.values())
+
+
+def test_without_enhancement_ranges_read_the_list_as_is(tmp_path):
+    path = tmp_path / 'words.txt'
+    path.write_text('\n'.join(WORDS) + '\n', encoding='utf-8')
+    wordlist = load_password_list(str(path), False, ranged=True)
+    assert ranged_candidates(wordlist) == load_password_list(str(path), False) == WORDS
+
+
+def test_the_estimated_total_is_an_upper_bound_once_the_list_is_counted(tmp_path):
+    path = tmp_path / 'words.txt'
+    path.write_text('\n'.join(WORDS) + '\n', encoding='utf-8')
+    wordlist = RangedWordlist(str(path), PasswordEnhancer.enhance_password_list, range_size=40)
+    wordlist.estimated_total()
+    assert not wordlist.bounded  # nothing counted yet, so only an extrapolation
+    get_password_count(str(path))
+    wordlist.estimated_total()
+    assert wordlist.bounded
+
+    produced = len(ranged_candidates(wordlist))
+    totals = []
+    for descriptor in wordlist.plan():
+        totals.append(wordlist.estimated_total())
+        wordlist.record_range(descriptor, len(wordlist.generate(descriptor)))
+    assert all(total >= produced for total in totals)
+    assert wordlist.estimated_total() == produced and not wordlist.bounded
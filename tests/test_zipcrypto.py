@@ -0,0 +1,83 @@
+"""The NumPy header check agrees with the scalar PrefixKeyCache path candidate for candidate"""
+
+import pytest
+
+import zipcrypto
+from engine import ArchiveVerifier, BatchEngine
+from sources import MaskSource
+
+numpy = pytest.importorskip('numpy')
+
+PASSWORD = 'k7q'
+
+
+def scalar_results(passwords, headers):
+    """Key states and header verdicts the per-candidate path computes, in sorted order as batches run"""
+    cache = zipcrypto.PrefixKeyCache()
+    results = {}
+    for password in sorted(passwords):
+        keys = cache.derive(password)
+        results[password] = (keys, zipcrypto.check_headers(keys, headers))
+    return results
+
+
+@pytest.mark.parametrize('members', [1, 3], ids=['one-header', 'three-headers'])
+def test_array_check_matches_scalar_check(zipcrypto_archive, members):
+    archive_path = zipcrypto_archive(PASSWORD, {f"file{index}.txt": b'contents %d\n' % index * 50
+                                                for index in range(members)})
+    headers = zipcrypto.read_headers(archive_path)
+    assert len(headers) == members
+    passwords = [candidate.encode('utf-8') for candidate in MaskSource('?l?d?l')]
+
+    k0, k1, k2 = zipcrypto.derive_keys_array(passwords, 3)
+    passed = zipcrypto.check_headers_array((k0, k1, k2), headers)
+    expected = scalar_results(passwords, headers)
+
+    for index, password in enumerate(passwords):
+        keys, verdict = expected[password]
+        assert (int(k0[index]), int(k1[index]), int(k2[index])) == keys
+        assert bool(passed[index]) == verdict
+    assert passed[passwords.index(PASSWORD.encode('utf-8'))]
+    if members == 1:
+        # One header lets about 1 in 256 wrong passwords through, so both paths saw some
+        assert 10 < int(passed.sum()) < 100
+
+
+def test_engine_finds_the_same_password_with_and_without_numpy(zipcrypto_archive, monkeypatch):
+    archive_path = zipcrypto_archive(PASSWORD)
+    results = []
+    for available in (True, False):
+        monkeypatch.setattr(zipcrypto, 'NUMPY_AVAILABLE', available)
+        engine = BatchEngine([archive_path], MaskSource('?l?d?l'), worker_count=1)
+        result = engine.run_sync()
+        results.append((engine.vectorize, result.stop_reason, result.solved))
+    assert results == [(True, 'found', {archive_path: PASSWORD}), (False, 'found', {archive_path: PASSWORD})]
+
+
+class CancelledAfter:
+    """Token that reads as cancelled once it has been checked a given number of times"""
+
+    def __init__(self, checks):
+        self.checks = checks
+
+    @property
+    def cancelled(self):
+        self.checks -= 1
+        return self.checks < 0
+
+
+def test_a_cancelled_precheck_leaves_the_unchecked_length_groups(zipcrypto_archive):
+    archive_path = zipcrypto_archive(PASSWORD)
+    engine = BatchEngine([archive_path], None, worker_count=1)
+    engine.prepare_archives()
+    engine.metrics.register_worker(0)
+    short = MaskSource('?l?d?l')[:]
+    long = MaskSource('?l?d?l?d')[:]
+
+    remaining = engine.precheck_batch(0, ArchiveVerifier(), short + long, CancelledAfter(1))
+    # The first group is checked and mostly rejected; the second is handed back untested
+    unchecked = set(long) if set(long) <= set(remaining) else set(short)
+    assert unchecked <= set(remaining)
+    assert len(remaining) - len(unchecked) < 100
+
+    assert engine.precheck_batch(0, ArchiveVerifier(), short + long, CancelledAfter(0)) == short + long
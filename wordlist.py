@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""
+ZiRar - Wordlist Helpers
+Counts the passwords in a wordlist without decoding it, by scanning a memory
+map in large chunks, and caches the result per file version. Also reads and
+writes compiled wordlists: deduplicated UTF-8 entries with an offset index,
+memory-mapped so any range of entries can be fetched in O(1). Compressed
+wordlists (gzip, xz, bz2 and, with the zstandard package, zstd) are read
+as streams without a temporary file. Plain text wordlists can be split into
+byte ranges that workers read and enhance themselves.
+"""
+
+import array
+import bz2
+import gzip
+import lzma
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Bytes scanned per step; large enough to keep the per-chunk overhead negligible
+COUNT_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Lines holding only these bytes are skipped when a list is loaded
+BLANK_BYTES = b' \t\r\x0b\x0c'
+BLANK_LINE = re.compile(rb'(?m)^[ \t\r\x0b\x0c]*\n')
+
+# A chunk without a match (and not starting with one of these) has no blank line
+BLANK_MARKER = re.compile(rb'\n[\n \t\r\x0b\x0c]')
+BLANK_PREFIXES = (b'\n',) + tuple(bytes([byte]) for byte in BLANK_BYTES)
+
+# Compiled wordlist layout: header, entry bytes, then count + 1 little-endian
+# uint64 offsets (entry i spans offsets i to i + 1)
+WORDLIST_MAGIC = b'ZRWORDS1'
+WORDLIST_HEADER_FORMAT = '<8sQQ'  # magic, entry count, index offset
+WORDLIST_HEADER_SIZE = struct.calcsize(WORDLIST_HEADER_FORMAT)
+WORDLIST_EXTENSION = '.zrw'
+
+# Leading bytes of the supported compressed formats
+COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'BZh', 'bz2'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+COMPRESSED_EXTENSIONS = ('.gz', '.xz', '.bz2', '.zst')
+
+# Decompressed bytes read per step from a compressed wordlist
+STREAM_READ_SIZE = 1024 * 1024
+
+# Passwords enhanced together when streaming; variations are deduplicated per block
+STREAM_BLOCK_LINES = 4096
+
+# Bytes of a text wordlist covered by one work descriptor
+RANGE_SIZE = 64 * 1024
+
+# Most variations PasswordEnhancer adds per original password (see estimate_enhanced_count)
+VARIATION_RATIO = 2.0
+
+_count_cache = {}  # (path, size, mtime_ns) -> password count
+_count_cache_lock = threading.Lock()
+
+
+class CountCancelled(Exception):
+    """Raised when a line count is abandoned through its cancellation token"""
+
+
+def plan_chunks(total_size, chunk_size):
+    """Split a file of total_size bytes into (start, end) byte ranges"""
+    return [(start, min(start + chunk_size, total_size)) for start in range(0, total_size, chunk_size)]
+
+
+def iter_wordlist_range(wordlist_path, start, end):
+    """Yield the passwords whose lines start inside the byte range [start, end)"""
+    with open(wordlist_path, 'rb') as f:
+        if start > 0:
+            # A line belongs to the range it starts in, so skip a partial first line
+            f.seek(start - 1)
+            if f.read(1) != b'\n':
+                f.readline()
+        position = f.tell()
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            password = line.decode('utf-8', errors='ignore').strip()
+            if password:
+                yield password
+
+
+def file_key(path):
+    """Return the (path, size, mtime) key identifying one version of a file"""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def count_chunk_lines(chunk):
+    """Count the non-blank lines in a chunk that ends on a line boundary"""
+    lines = chunk.count(b'\n')
+    # Blank lines are rare, so only run the regex when one may be present
+    if chunk.startswith(BLANK_PREFIXES) or BLANK_MARKER.search(chunk):
+        lines -= len(BLANK_LINE.findall(chunk))
+    return lines
+
+
+def count_passwords(path, token=None, chunk_size=COUNT_CHUNK_SIZE):
+    """Count the non-blank lines of a wordlist by scanning a memory map
+
+    The file is never decoded, so this matches load_password_list() except
+    for lines made only of undecodable bytes or non-ASCII whitespace. If a
+    token is given, the count stops with CountCancelled once it is cancelled.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            size = len(mapped)
+            count = 0
+            start = 0
+            while start < size:
+                if token is not None and token.cancelled:
+                    raise CountCancelled(path)
+                end = min(start + chunk_size, size)
+                if end < size:
+                    # Cut after the last newline so no line spans two chunks
+                    cut = mapped.rfind(b'\n', start, end)
+                    if cut != -1:
+                        end = cut + 1
+                count += count_chunk_lines(mapped[start:end])
+                start = end
+
+            # A last line without a trailing newline still counts
+            last_newline = mapped.rfind(b'\n')
+            if mapped[last_newline + 1:].strip(BLANK_BYTES):
+                count += 1
+            return count
+
+
+def count_stream_passwords(path, token=None):
+    """Count the non-blank lines of a compressed wordlist while decompressing it"""
+    count = 0
+    remainder = b''
+    with open(path, 'rb') as raw, open_decompressed(raw, compression_format(path)) as stream:
+        while True:
+            if token is not None and token.cancelled:
+                raise CountCancelled(path)
+            block = stream.read(STREAM_READ_SIZE)
+            if not block:
+                break
+            # Count whole lines only and carry the partial last line over
+            cut = block.rfind(b'\n')
+            if cut == -1:
+                remainder += block
+                continue
+            count += count_chunk_lines(remainder + block[:cut + 1])
+            remainder = block[cut + 1:]
+    if remainder.strip(BLANK_BYTES):
+        count += 1
+    return count
+
+
+def cached_password_count(path):
+    """Return the cached count for the current version of a file, or None"""
+    try:
+        key = file_key(path)
+    except OSError:
+        return None
+    with _count_cache_lock:
+        return _count_cache.get(key)
+
+
+def get_password_count(path, token=None):
+    """Count the passwords in a wordlist, reusing the result while the file is unchanged"""
+    if is_compiled_wordlist(path):
+        return read_compiled_header(path)[0]
+
+    key = file_key(path)
+    with _count_cache_lock:
+        if key in _count_cache:
+            return _count_cache[key]
+
+    if compression_format(path):
+        count = count_stream_passwords(path, token)
+    else:
+        count = count_passwords(path, token)
+    with _count_cache_lock:
+        _count_cache[key] = count
+    return count
+
+
+def is_compiled_wordlist(path):
+    """Return True if a file starts with the compiled wordlist magic"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(WORDLIST_MAGIC)) == WORDLIST_MAGIC
+    except OSError:
+        return False
+
+
+def read_compiled_header(path):
+    """Return the (entry count, index offset) of a compiled wordlist"""
+    with open(path, 'rb') as f:
+        header = f.read(WORDLIST_HEADER_SIZE)
+    if len(header) < WORDLIST_HEADER_SIZE:
+        raise ValueError(f"Truncated compiled wordlist: {path}")
+    magic, count, index_offset = struct.unpack(WORDLIST_HEADER_FORMAT, header)
+    if magic != WORDLIST_MAGIC:
+        raise ValueError(f"Not a compiled wordlist: {path}")
+    return count, index_offset
+
+
+def write_compiled_wordlist(passwords, output_path):
+    """Write passwords to a compiled wordlist in the given order, dropping duplicates
+
+    Returns the number of entries written. Only the offsets are held in
+    memory besides the set used for deduplication.
+    """
+    offsets = array.array('Q')
+    seen = set()
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(struct.pack(WORDLIST_HEADER_FORMAT, WORDLIST_MAGIC, 0, 0))
+        position = WORDLIST_HEADER_SIZE
+        for password in passwords:
+            entry = password.encode('utf-8', 'surrogatepass')
+            if not entry or entry in seen:
+                continue
+            seen.add(entry)
+            offsets.append(position)
+            f.write(entry)
+            position += len(entry)
+        offsets.append(position)
+
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        offsets.tofile(f)
+        f.seek(0)
+        f.write(struct.pack(WORDLIST_HEADER_FORMAT, WORDLIST_MAGIC, len(offsets) - 1, position))
+    os.replace(temp_path, output_path)
+    return len(offsets) - 1
+
+
+class CompiledWordlist:
+    """Read-only, memory-mapped compiled wordlist
+
+    Behaves like a list of passwords for len(), indexing and slicing, so
+    the engine can hand out index ranges and workers decode only their own
+    entries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count, self.index_offset = read_compiled_header(path)
+        with open(path, 'rb') as f:
+            self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.index_offset + (self.count + 1) * 8 > len(self._mapped):
+            self._mapped.close()
+            raise ValueError(f"Truncated compiled wordlist: {path}")
+
+    def __len__(self):
+        return self.count
+
+    def offsets(self, start, stop):
+        """Return the byte offsets of entries start..stop (inclusive of stop)"""
+        return struct.unpack_from(f'<{stop - start + 1}Q', self._mapped, self.index_offset + start * 8)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.count)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if start >= stop:
+                return []
+            offsets = self.offsets(start, stop)
+            mapped = self._mapped
+            return [mapped[offsets[i]:offsets[i + 1]].decode('utf-8', 'surrogatepass')
+                    for i in range(len(offsets) - 1)]
+
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("compiled wordlist index out of range")
+        begin, end = self.offsets(index, index + 1)
+        return self._mapped[begin:end].decode('utf-8', 'surrogatepass')
+
+    def __iter__(self):
+        for start in range(0, self.count, 4096):
+            yield from self[start:start + 4096]
+
+    def close(self):
+        """Release the file mapping"""
+        self._mapped.close()
+
+
+def compression_format(path):
+    """Return 'gzip', 'xz', 'bz2' or 'zstd' for a compressed file, or None"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(8)
+    except OSError:
+        return None
+    for magic, name in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def open_decompressed(raw, compression):
+    """Wrap an open binary file in a streaming decompressor"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw)
+    if compression == 'xz':
+        return lzma.LZMAFile(raw)
+    if compression == 'bz2':
+        return bz2.BZ2File(raw)
+    if compression == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise ValueError("zstd wordlists need the zstandard package (pip install zstandard)")
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+class StreamingWordlist:
+    """Password source that decompresses a wordlist as it is consumed
+
+    Iterating iter_batches() reads the file in STREAM_READ_SIZE steps, so
+    only a bounded amount is ever held in memory. The engine drains it
+    from a feeder thread; the decompressors release the GIL, so
+    decompression overlaps with verification. If enhance is given, it is
+    applied to each block of STREAM_BLOCK_LINES passwords, which keeps
+    variations close to their originals. A candidate_filter set by the
+    engine drops candidates from each block right after enhancement.
+    """
+
+    def __init__(self, path, enhance=None):
+        self.path = path
+        self.compression = compression_format(path)
+        if self.compression is None:
+            raise ValueError(f"Not a compressed wordlist: {path}")
+        self.size = os.path.getsize(path)
+        self.enhance = enhance
+        self.candidate_filter = None  # CandidateFilter applied to every block
+        self.produced = 0  # candidates handed out so far
+        self.consumed = 0  # compressed bytes read so far
+        self.lines_read = 0  # lines decompressed so far (read ahead of produced)
+        self.block_ratio = 1.0  # candidates per password after enhancement
+        self.finished = False
+
+    def estimated_total(self):
+        """Extrapolate the candidate count from the share of the file read so far"""
+        if self.finished or not self.consumed:
+            return self.produced
+        expected_lines = self.lines_read * self.size / self.consumed
+        return max(self.produced, int(expected_lines * self.block_ratio))
+
+    def iter_passwords(self):
+        """Yield the stripped, non-blank lines of the decompressed file"""
+        remainder = b''
+        with open(self.path, 'rb') as raw, open_decompressed(raw, self.compression) as stream:
+            while True:
+                block = stream.read(STREAM_READ_SIZE)
+                if not block:
+                    break
+                self.consumed = raw.tell()
+                lines = (remainder + block).split(b'\n')
+                remainder = lines.pop()
+                self.lines_read += len(lines)
+                for line in lines:
+                    password = line.decode('utf-8', errors='ignore').strip()
+                    if password:
+                        yield password
+        password = remainder.decode('utf-8', errors='ignore').strip()
+        if password:
+            yield password
+
+    def iter_batches(self, batch_size):
+        """Yield lists of at most batch_size candidates"""
+        block = []
+        for password in self.iter_passwords():
+            block.append(password)
+            if len(block) >= STREAM_BLOCK_LINES:
+                yield from self.split_block(block, batch_size)
+                block = []
+        if block:
+            yield from self.split_block(block, batch_size)
+        self.finished = True
+
+    def split_block(self, block, batch_size):
+        """Enhance and filter a block of passwords if requested and cut it into batches"""
+        originals = len(block)
+        if self.enhance:
+            block = self.enhance(block)
+        if self.candidate_filter is not None:
+            block = self.candidate_filter.apply(block)
+        self.block_ratio = len(block) / originals
+        for start in range(0, len(block), batch_size):
+            batch = block[start:start + batch_size]
+            self.produced += len(batch)
+            yield batch
+
+
+# Work descriptor: passwords whose lines start in [start, end), as read ('original')
+# or as the variations enhancement adds to them ('variations'), less the first skip
+# candidates, which an earlier run that was cut short already tested
+WordlistRange = namedtuple('WordlistRange', 'start end rules skip', defaults=(0,))
+
+
+class RangedWordlist:
+    """Plain text wordlist handed to workers as byte ranges instead of candidates
+
+    The engine queues WordlistRange descriptors only; each worker reads its
+    range and generates the candidates itself, so decoding and enhancement
+    scale with the workers instead of running up front in the coordinator.
+    With enhance given, every range is queued twice, first for its original
+    passwords and then for their variations, so originals are still tested
+    before any variation. Variations are deduplicated within a range only,
+    so one that also comes from another range is generated there again: the
+    candidates are the set enhance_password_list() gives for the whole list,
+    plus those repeats.
+    A candidate_filter is applied to what each range generates.
+    """
+
+    def __init__(self, path, enhance=None, range_size=RANGE_SIZE, candidate_filter=None):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.enhance = enhance
+        self.range_size = range_size
+        self.candidate_filter = candidate_filter
+        self.lock = threading.Lock()
+        self.produced = {'original': 0, 'variations': 0}  # candidates generated per pass
+        self.covered = {'original': 0, 'variations': 0}  # bytes of the file those came from
+        self.range_originals = {}  # (start, end) -> passwords of an original range, until its variations are made
+        self.varied_originals = 0  # passwords whose variations have been generated, where known
+        self.bounded = False  # True if the last estimated_total() was an upper bound
+
+    def plan(self):
+        """Return the work descriptors covering the whole list, in testing order"""
+        chunks = plan_chunks(self.size, self.range_size)
+        ranges = [WordlistRange(start, end, 'original') for start, end in chunks]
+        if self.enhance is not None:
+            ranges.extend(WordlistRange(start, end, 'variations') for start, end in chunks)
+        return ranges
+
+    def generate(self, descriptor, metrics=None):
+        """Return the candidates a descriptor stands for, recording stage times"""
+        started = time.perf_counter()
+        passwords = list(iter_wordlist_range(self.path, descriptor.start, descriptor.end))
+        if metrics:
+            metrics.add_stage_time('generation', time.perf_counter() - started)
+        if descriptor.rules == 'variations':
+            started = time.perf_counter()
+            # Enhancement returns the originals followed by their new variations
+            passwords = self.enhance(passwords)[len(passwords):]
+            if metrics:
+                metrics.add_stage_time('enhancement', time.perf_counter() - started)
+        if self.candidate_filter is not None:
+            started = time.perf_counter()
+            passwords = self.candidate_filter.apply(passwords)
+            if metrics:
+                metrics.add_stage_time('filtering', time.perf_counter() - started)
+        return passwords[descriptor.skip:]
+
+    def record_range(self, descriptor, produced):
+        """Note how many candidates a descriptor produced, for estimated_total()"""
+        with self.lock:
+            self.produced[descriptor.rules] += produced
+            self.covered[descriptor.rules] += descriptor.end - descriptor.start
+            if descriptor.rules == 'original':
+                self.range_originals[(descriptor.start, descriptor.end)] = produced
+            else:
+                # Ranges whose originals were tested by an earlier run are not known here
+                self.varied_originals += self.range_originals.pop((descriptor.start, descriptor.end), 0)
+
+    def estimated_total(self):
+        """Return the candidate count, as an upper bound where the line count is known
+
+        With the count cached and no filter, the originals are exact and the
+        variations are the ones made so far plus VARIATION_RATIO per original
+        not varied yet, which is never less than the real total. Otherwise
+        both passes are extrapolated from the ranges generated so far.
+        """
+        with self.lock:
+            # The cached line count says nothing about how many lines pass a filter
+            originals = cached_password_count(self.path) if self.candidate_filter is None else None
+            counted = originals is not None
+            self.bounded = False
+            if originals is None:
+                originals = self.extrapolate('original')
+            if self.enhance is None:
+                return originals
+            if counted:
+                # Exact once every original has been varied
+                left = max(0, originals - self.varied_originals)
+                self.bounded = left > 0
+                return originals + self.produced['variations'] + int(left * VARIATION_RATIO)
+            if self.covered['variations']:
+                return originals + self.extrapolate('variations')
+            return originals + int(originals * VARIATION_RATIO)
+
+    def extrapolate(self, rules):
+        """Scale the candidates one pass produced to the whole file"""
+        covered = self.covered[rules]
+        if not covered:
+            return 0
+        return int(self.produced[rules] * self.size / covered)
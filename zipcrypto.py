@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+ZiRar - ZipCrypto Helpers
+Pure-Python implementation of the traditional PKWARE (ZipCrypto) key schedule
+and 12-byte encryption header check. The key state depends only on the
+password, so one derivation can be checked against many archives. With
+NumPy installed, equal-length passwords can also be run through the key
+schedule and header check as whole arrays.
+"""
+
+import io
+import mmap
+import struct
+import zipfile
+
+try:
+    import numpy
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Standard CRC-32 table (polynomial 0xEDB88320) as used by the key schedule
+CRC_TABLE = []
+for _n in range(256):
+    _c = _n
+    for _ in range(8):
+        _c = (_c >> 1) ^ 0xEDB88320 if _c & 1 else _c >> 1
+    CRC_TABLE.append(_c)
+del _n, _c
+
+# Initial key state defined by the ZIP specification
+INITIAL_KEYS = (0x12345678, 0x23456789, 0x34567890)
+
+# Smallest group of equal-length passwords worth an array pass; below this
+# the per-call NumPy overhead costs more than the scalar loop
+VECTOR_MIN_GROUP = 32
+
+# Size of the encryption header that precedes every ZipCrypto member
+HEADER_SIZE = 12
+
+# Local file header layout: signature ... filename length, extra length
+LOCAL_HEADER_FORMAT = '<4s5HI2I2H'
+LOCAL_HEADER_SIZE = struct.calcsize(LOCAL_HEADER_FORMAT)
+
+
+def update_keys(keys, data):
+    """Feed bytes through the key schedule and return the new key state"""
+    k0, k1, k2 = keys
+    crc_table = CRC_TABLE
+    for byte in data:
+        k0 = (k0 >> 8) ^ crc_table[(k0 ^ byte) & 0xFF]
+        k1 = (k1 + (k0 & 0xFF)) & 0xFFFFFFFF
+        k1 = (k1 * 134775813 + 1) & 0xFFFFFFFF
+        k2 = (k2 >> 8) ^ crc_table[(k2 ^ (k1 >> 24)) & 0xFF]
+    return k0, k1, k2
+
+
+def derive_keys(password_bytes):
+    """Return the key state after processing the password"""
+    return update_keys(INITIAL_KEYS, password_bytes)
+
+
+def shared_prefix_length(first, second):
+    """Return the number of leading bytes two byte strings have in common"""
+    limit = min(len(first), len(second))
+    if not limit:
+        return 0
+    # XOR as big-endian integers: the highest set bit marks the first difference
+    difference = int.from_bytes(first[:limit], 'big') ^ int.from_bytes(second[:limit], 'big')
+    return limit - (difference.bit_length() + 7) // 8
+
+
+class PrefixKeyCache:
+    """Derives key states for a run of passwords, reusing the state of each shared prefix
+
+    The key schedule consumes the password one byte at a time, so the state
+    after a prefix is the same for every password that starts with it. The
+    cache keeps the state after each byte of the previous password; a new
+    password only runs the bytes after the prefix they share. Feeding
+    passwords in sorted order (as engine batches are) makes the
+    shared prefixes as long as possible.
+    """
+
+    def __init__(self):
+        self.prefix = b''
+        self.states = [INITIAL_KEYS]  # states[i] is the key state after prefix[:i]
+
+    def derive(self, password_bytes):
+        """Return the key state after processing the password"""
+        common = shared_prefix_length(self.prefix, password_bytes)
+        states = self.states
+        del states[common + 1:]
+        k0, k1, k2 = states[common]
+        crc_table = CRC_TABLE
+        for byte in password_bytes[common:]:
+            k0 = (k0 >> 8) ^ crc_table[(k0 ^ byte) & 0xFF]
+            k1 = (k1 + (k0 & 0xFF)) & 0xFFFFFFFF
+            k1 = (k1 * 134775813 + 1) & 0xFFFFFFFF
+            k2 = (k2 >> 8) ^ crc_table[(k2 ^ (k1 >> 24)) & 0xFF]
+            states.append((k0, k1, k2))
+        self.prefix = password_bytes
+        return k0, k1, k2
+
+
+def check_header(keys, header, check_byte):
+    """Decrypt a 12-byte encryption header and compare its check byte"""
+    k0, k1, k2 = keys
+    crc_table = CRC_TABLE
+    plain = 0
+    for byte in header:
+        temp = k2 | 2
+        plain = byte ^ (((temp * (temp ^ 1)) >> 8) & 0xFF)
+        k0 = (k0 >> 8) ^ crc_table[(k0 ^ plain) & 0xFF]
+        k1 = (k1 + (k0 & 0xFF)) & 0xFFFFFFFF
+        k1 = (k1 * 134775813 + 1) & 0xFFFFFFFF
+        k2 = (k2 >> 8) ^ crc_table[(k2 ^ (k1 >> 24)) & 0xFF]
+    return plain == check_byte
+
+
+def check_headers(keys, headers):
+    """Return True if the key state passes every (header, check byte) pair"""
+    for header, check_byte in headers:
+        if not check_header(keys, header, check_byte):
+            return False
+    return True
+
+
+def group_by_length(passwords, min_group=VECTOR_MIN_GROUP):
+    """Split password bytes into index groups of equal length worth vectorizing
+
+    Returns (groups, rest): groups maps a length to the indices of at least
+    min_group passwords of that length, rest lists the remaining indices.
+    """
+    by_length = {}
+    for index, password in enumerate(passwords):
+        by_length.setdefault(len(password), []).append(index)
+    groups = {}
+    rest = []
+    for length, indices in by_length.items():
+        if length and len(indices) >= min_group:
+            groups[length] = indices
+        else:
+            rest.extend(indices)
+    return groups, rest
+
+
+def derive_keys_array(passwords, length):
+    """Return the key states of equal-length passwords as three uint32 arrays"""
+    matrix = numpy.frombuffer(b''.join(passwords), dtype=numpy.uint8).reshape(len(passwords), length)
+    k0 = numpy.full(len(passwords), INITIAL_KEYS[0], dtype=numpy.uint32)
+    k1 = numpy.full(len(passwords), INITIAL_KEYS[1], dtype=numpy.uint32)
+    k2 = numpy.full(len(passwords), INITIAL_KEYS[2], dtype=numpy.uint32)
+    for column in matrix.T:
+        k0, k1, k2 = update_keys_array(k0, k1, k2, column.astype(numpy.uint32))
+    return k0, k1, k2
+
+
+def update_keys_array(k0, k1, k2, data):
+    """Feed one byte per password through the key schedule; uint32 arithmetic wraps like the & masks"""
+    crc_table = CRC_ARRAY
+    k0 = (k0 >> 8) ^ crc_table[(k0 ^ data) & 0xFF]
+    k1 = (k1 + (k0 & 0xFF)) * KEY_MULTIPLIER + ONE
+    k2 = (k2 >> 8) ^ crc_table[(k2 ^ (k1 >> 24)) & 0xFF]
+    return k0, k1, k2
+
+
+def check_headers_array(keys, headers):
+    """Return a boolean array: which key states pass every (header, check byte) pair"""
+    k0, k1, k2 = keys
+    passed = numpy.ones(len(k0), dtype=bool)
+    survivors = numpy.arange(len(k0))
+    for header, check_byte in headers:
+        # Later headers only run for the few states that passed the earlier ones
+        s0, s1, s2 = k0[survivors], k1[survivors], k2[survivors]
+        plain = None
+        for byte in bytes(header):
+            temp = s2 | 2
+            plain = byte ^ (((temp * (temp ^ 1)) >> 8) & 0xFF)
+            s0, s1, s2 = update_keys_array(s0, s1, s2, plain)
+        matched = plain == check_byte
+        passed[survivors[~matched]] = False
+        survivors = survivors[matched]
+        if not len(survivors):
+            break
+    return passed
+
+
+if NUMPY_AVAILABLE:
+    CRC_ARRAY = numpy.array(CRC_TABLE, dtype=numpy.uint32)
+    KEY_MULTIPLIER = numpy.uint32(134775813)
+    ONE = numpy.uint32(1)
+
+
+def is_zipcrypto(info):
+    """Return True if a ZipInfo entry uses traditional PKWARE encryption"""
+    # Bit 0 marks encryption; bit 6 is strong encryption; method 99 is WinZip AES
+    return bool(info.flag_bits & 0x1) and not info.flag_bits & 0x40 and info.compress_type != 99
+
+
+def check_byte_for(info):
+    """Return the byte the decrypted header must end with for this entry"""
+    if info.flag_bits & 0x8:
+        # Data descriptor present: the check byte comes from the DOS time
+        return (info._raw_time >> 8) & 0xFF
+    return (info.CRC >> 24) & 0xFF
+
+
+def read_headers(archive_path, limit=3, data=None):
+    """Read the encryption headers of up to limit ZipCrypto members
+
+    Each extra header cuts the false-positive rate of the quick check by
+    a factor of 256. If data holds the archive bytes, headers are returned
+    as zero-copy memoryview slices of it instead of reading the file.
+    Returns an empty list if the archive has no ZipCrypto members.
+    """
+    if data is None:
+        # Map the file and copy out just the headers so the mapping can close
+        with open(archive_path, 'rb') as f:
+            with zipfile.ZipFile(f) as zip_file:
+                members = zip_file.infolist()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    return [(bytes(header), check_byte) for header, check_byte in slice_headers(view, members, limit)]
+
+    # BytesIO shares the bytes object instead of copying it
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        members = zip_file.infolist()
+    return slice_headers(memoryview(data), members, limit)
+
+
+def slice_headers(view, members, limit):
+    """Return (header view, check byte) pairs for ZipCrypto members of an archive view"""
+    headers = []
+    for info in members:
+        if len(headers) >= limit:
+            break
+        if info.is_dir() or not is_zipcrypto(info):
+            continue
+        fields = struct.unpack_from(LOCAL_HEADER_FORMAT, view, info.header_offset)
+        if fields[0] != b'PK\x03\x04':
+            continue
+        start = info.header_offset + LOCAL_HEADER_SIZE + fields[-2] + fields[-1]
+        header = view[start:start + HEADER_SIZE]
+        if len(header) == HEADER_SIZE:
+            headers.append((header, check_byte_for(info)))
+    return headers